@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import json
 from pathlib import Path
 from decouple import config, Csv
 
@@ -176,3 +177,78 @@ CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
 # Email defaults for scheduled tasks
 DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default='noreply@example.com')
 ADMIN_EMAIL = config('ADMIN_EMAIL', default='admin@example.com')
+
+# Translation
+# Maximum characters packed into a single provider request (GoogleTranslator rejects > 5000)
+TRANSLATION_MAX_REQUEST_CHARS = config('TRANSLATION_MAX_REQUEST_CHARS', cast=int, default=4500)
+# Keep-alive connections to the provider shared by the translators of a worker process
+TRANSLATION_HTTP_POOL_SIZE = config('TRANSLATION_HTTP_POOL_SIZE', cast=int, default=16)
+TRANSLATION_HTTP_TIMEOUT = config('TRANSLATION_HTTP_TIMEOUT', cast=float, default=30)
+# Provider pacing shared by all workers (Redis; each process falls back to local limits without it)
+TRANSLATION_LIMITER_REDIS_URL = config('TRANSLATION_LIMITER_REDIS_URL', default='')
+# Translation backends as "name" or "name:weight" (google, echo, or any name given a "class" below)
+TRANSLATION_BACKENDS = config('TRANSLATION_BACKENDS', default='google', cast=Csv())
+# Per-backend options (JSON): rate, burst, max_concurrency, daily_chars, class, constructor arguments
+TRANSLATION_BACKEND_OPTIONS = config('TRANSLATION_BACKEND_OPTIONS', default='{}', cast=json.loads)
+# Requests per second across the cluster (0 = unlimited) and burst size; set just under the provider's limit
+TRANSLATION_PROVIDER_RATE = config('TRANSLATION_PROVIDER_RATE', cast=float, default=0)
+TRANSLATION_PROVIDER_BURST = config('TRANSLATION_PROVIDER_BURST', cast=int, default=10)
+# Ceiling of the AIMD concurrency limit per process (0 = TRANSLATION_MAX_WORKERS)
+TRANSLATION_PROVIDER_MAX_CONCURRENCY = config('TRANSLATION_PROVIDER_MAX_CONCURRENCY', cast=int, default=0)
+# Circuit breaker: opens after this many consecutive 429/5xx/timeouts, for the cooldown, for every worker
+TRANSLATION_BREAKER_THRESHOLD = config('TRANSLATION_BREAKER_THRESHOLD', cast=int, default=5)
+TRANSLATION_BREAKER_COOLDOWN_SECONDS = config('TRANSLATION_BREAKER_COOLDOWN_SECONDS', cast=int, default=30)
+# Calls wait at most this long for the breaker to close before the chapter fails (and is retried later)
+TRANSLATION_BREAKER_MAX_WAIT_SECONDS = config('TRANSLATION_BREAKER_MAX_WAIT_SECONDS', cast=int, default=120)
+
+# Translation memory: segment-level cache checked before any provider call
+TRANSLATION_MEMORY_ENABLED = config('TRANSLATION_MEMORY_ENABLED', cast=bool, default=True)
+TRANSLATION_MEMORY_REDIS_URL = config('TRANSLATION_MEMORY_REDIS_URL', default='')
+TRANSLATION_MEMORY_TTL_DAYS = config('TRANSLATION_MEMORY_TTL_DAYS', cast=int, default=180)
+TRANSLATION_MEMORY_MAX_ENTRIES = config('TRANSLATION_MEMORY_MAX_ENTRIES', cast=int, default=2000000)
+# Numbers, URLs and protected names are masked before segments are hashed and translated
+TRANSLATION_MASKING_ENABLED = config('TRANSLATION_MASKING_ENABLED', cast=bool, default=True)
+# Proper nouns (character names, places) kept as is and never sent to the provider
+TRANSLATION_PROTECTED_TERMS = config('TRANSLATION_PROTECTED_TERMS', default='', cast=Csv())
+# Provider requests in flight per worker process (chapters or request batches)
+TRANSLATION_MAX_WORKERS = config('TRANSLATION_MAX_WORKERS', cast=int, default=4)
+# Full-book jobs with at least this many chapters are fanned out as per-chapter Celery subtasks
+TRANSLATION_FANOUT_MIN_CHAPTERS = config('TRANSLATION_FANOUT_MIN_CHAPTERS', cast=int, default=2)
+# Fair-share scheduler: chapters in flight overall (match the bulk workers' concurrency) and per user
+TRANSLATION_SCHEDULER_CAPACITY = config('TRANSLATION_SCHEDULER_CAPACITY', cast=int, default=8)
+TRANSLATION_USER_MAX_IN_FLIGHT = config('TRANSLATION_USER_MAX_IN_FLIGHT', cast=int, default=2)
+# A chapter whose worker was lost is dispatched again after this long
+TRANSLATION_SCHEDULER_LEASE_SECONDS = config('TRANSLATION_SCHEDULER_LEASE_SECONDS', cast=int, default=1800)
+# Reader (single-chapter) translations and full-book jobs run on separate queues and workers
+TRANSLATION_INTERACTIVE_QUEUE = config('TRANSLATION_INTERACTIVE_QUEUE', default='translate_interactive')
+TRANSLATION_BULK_QUEUE = config('TRANSLATION_BULK_QUEUE', default='translate_bulk')
+# Bulk chapters wait this long while interactive jobs are pending, at most TRANSLATION_BULK_MAX_YIELDS times
+TRANSLATION_BULK_YIELD_SECONDS = config('TRANSLATION_BULK_YIELD_SECONDS', cast=int, default=5)
+TRANSLATION_BULK_MAX_YIELDS = config('TRANSLATION_BULK_MAX_YIELDS', cast=int, default=60)
+TRANSLATION_INTERACTIVE_STALE_SECONDS = config('TRANSLATION_INTERACTIVE_STALE_SECONDS', cast=int, default=300)
+# Prefetch: translate the next chapters while the user reads (per-user caps on jobs in flight and per day)
+TRANSLATION_PREFETCH_ENABLED = config('TRANSLATION_PREFETCH_ENABLED', cast=bool, default=True)
+TRANSLATION_PREFETCH_CHAPTERS = config('TRANSLATION_PREFETCH_CHAPTERS', cast=int, default=2)
+TRANSLATION_PREFETCH_MAX_IN_FLIGHT = config('TRANSLATION_PREFETCH_MAX_IN_FLIGHT', cast=int, default=4)
+TRANSLATION_PREFETCH_DAILY_CHAPTERS = config('TRANSLATION_PREFETCH_DAILY_CHAPTERS', cast=int, default=100)
+# Empty: prefetch jobs share the bulk queue
+TRANSLATION_PREFETCH_QUEUE = config('TRANSLATION_PREFETCH_QUEUE', default='')
+# Single-flight: identical extractions/translation requests run once; other callers wait up to this long
+SINGLE_FLIGHT_WAIT_SECONDS = config('SINGLE_FLIGHT_WAIT_SECONDS', cast=int, default=60)
+# A lock not released within this time (lost worker) can be taken over
+SINGLE_FLIGHT_LOCK_SECONDS = config('SINGLE_FLIGHT_LOCK_SECONDS', cast=int, default=600)
+# Responses of upload/translate POSTs kept for retries with the same Idempotency-Key
+IDEMPOTENCY_KEY_TTL_HOURS = config('IDEMPOTENCY_KEY_TTL_HOURS', cast=int, default=24)
+CELERY_TASK_ROUTES = {
+    'uploads.translate_epub_task': {'queue': TRANSLATION_BULK_QUEUE},
+    'uploads.translate_chapter_task': {'queue': TRANSLATION_BULK_QUEUE},
+    'uploads.assemble_translation_task': {'queue': TRANSLATION_BULK_QUEUE},
+    'uploads.dispatch_translations_task': {'queue': TRANSLATION_BULK_QUEUE},
+}
+CELERY_BEAT_SCHEDULE = {
+    'dispatch-translations': {'task': 'uploads.dispatch_translations_task', 'schedule': 60.0},
+    'prune-idempotency-keys': {'task': 'uploads.prune_idempotency_keys', 'schedule': 3600.0},
+    'prune-translation-memory': {'task': 'uploads.prune_translation_memory', 'schedule': 86400.0},
+}
+# Long translation tasks: don't let one worker reserve work another could start
+CELERY_WORKER_PREFETCH_MULTIPLIER = config('CELERY_WORKER_PREFETCH_MULTIPLIER', cast=int, default=1)
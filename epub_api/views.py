@@ -6,6 +6,8 @@ from django.http import JsonResponse, HttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from uploads.models import UploadedFile, ExtractedEpub, ReadingProgress
+from uploads.chapters import chapter_dicts, get_chapter
+from uploads.prefetch import prefetch_after_progress
 import json
 import re
 from .forms import RegistrationForm
@@ -135,7 +137,7 @@ def library_view(request):
                 'current_chapter': progress.current_chapter if progress else 0,
                 'translation_available': extracted.translations.exists(),
                 'translation_progress': 0,  # Calculate based on available translations
-                'chapters': extracted.chapters or [],
+                'chapters': chapter_dicts(extracted, fields=('index', 'title')),
                 'created_at': uploaded_file.uploaded_at,
             }
             books.append(book_data)
@@ -181,8 +183,8 @@ def reader_view(request, book_id):
     # Get current chapter from query parameter
     current_chapter = int(request.GET.get('chapter', 0))
     
-    # Get chapters from extracted epub
-    chapters = extracted_epub.chapters or []
+    # Titles for the chapter list; only the current chapter's content is loaded
+    chapters = chapter_dicts(extracted_epub, fields=('index', 'title'))
     
     # Ensure chapter is within bounds
     if current_chapter < 0:
@@ -219,7 +221,8 @@ def reader_view(request, book_id):
         return re.sub(img_pattern, replace_img_src, content)
     
     # Get current chapter data and fix image URLs
-    current_chapter_data = chapters[current_chapter] if chapters else {
+    current_chapter_data = get_chapter(extracted_epub, current_chapter, fields=('index', 'title', 'content')) if chapters else None
+    current_chapter_data = current_chapter_data or {
         'title': 'Capítulo 1', 
         'content': 'Conteúdo não disponível.'
     }
@@ -318,11 +321,17 @@ def api_save_progress_view(request):
             }
         )
         
+        previous_chapter = None
         if not created:
+            previous_chapter = progress_obj.current_chapter
             progress_obj.current_chapter = chapter_index
             progress_obj.progress_percentage = progress
             progress_obj.save()
         
+        prefetch_after_progress(
+            request.user, extracted_epub, previous_chapter, chapter_index, data.get('target_lang')
+        )
+        
         return JsonResponse({'success': True})
     except (json.JSONDecodeError, ValueError):
         return JsonResponse({'error': 'Invalid data'}, status=400)
@@ -55,9 +55,10 @@ def test_translation():
     
     for epub in extracted_epubs:
         print(f"- ID: {epub.pk}, Título: {epub.title}")
-        print(f"  Capítulos: {len(epub.chapters or [])}")
-        if epub.chapters:
-            print(f"  Primeiro capítulo: {epub.chapters[0].get('title', 'Sem título')[:50]}...")
+        first = epub.chapters.first()
+        print(f"  Capítulos: {epub.chapters.count()}")
+        if first:
+            print(f"  Primeiro capítulo: {(first.title or 'Sem título')[:50]}...")
     
     # Tentar traduzir o primeiro EPUB
     if extracted_epubs:
@@ -79,7 +80,7 @@ def test_translation():
         
         print(f"Tradução criada com sucesso! ID: {translation.pk}")
         print(f"Título traduzido: {translation.translated_title}")
-        print(f"Capítulos traduzidos: {len(translation.translated_chapters or [])}")
+        print(f"Capítulos traduzidos: {translation.chapters.filter(status='done').count()}")
         
     except Exception as e:
         print(f"ERRO na tradução: {str(e)}")
@@ -5,16 +5,7 @@ from typing import Dict, Any, List
 import bleach
 from ebooklib import epub
 from .cover_utils import generate_ao3_cover_bytes
-
-ALLOWED_TAGS = [
-    'p','div','span','strong','em','b','i','u','a','ul','ol','li','br','hr','h1','h2','h3','h4','h5','h6',
-    'img','blockquote','code','pre','table','thead','tbody','tr','td','th'
-]
-ALLOWED_ATTRS = {
-    '*': ['class','id','style'],
-    'a': ['href','title','target','rel'],
-    'img': ['src','alt','title']
-}
+from .html_pipeline import ALLOWED_TAGS, ALLOWED_ATTRS, clean_html  # noqa: F401
 
 WORK_URL_REGEX = re.compile(r'^https://(?:www\.)?archiveofourown.org/works/(\d+)')
 
@@ -25,7 +16,7 @@ def extract_work_id(url: str) -> str | None:
 
 
 def sanitize_html(html: str) -> str:
-    return bleach.clean(html, tags=ALLOWED_TAGS, attributes=ALLOWED_ATTRS, strip=True)
+    return clean_html(html)
 
 
 def fetch_ao3_work(work_id: str) -> Dict[str, Any]:
@@ -0,0 +1,82 @@
+"""
+Extracted chapters, one Chapter row each.
+
+Extraction builds the chapters as dicts ({'title', 'content', 'hash',
+'skeleton', 'texts', 'skipped'}) and stores them with replace_chapters.
+Code that works on chapters reads them back as dicts of the same shape,
+loading only the indexes and fields it needs: showing one chapter reads
+one row and counting chapters reads none.
+"""
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from django.db import transaction
+
+from .content_hashes import source_chapter_hash
+from .html_pipeline import plain_text, strip_placeholders
+from .models import Chapter
+
+CHAPTER_FIELDS = ('index', 'title', 'content', 'hash', 'skeleton', 'texts', 'skipped')
+# What the API exposes of a chapter
+PUBLIC_FIELDS = ('index', 'title', 'content', 'hash', 'size', 'word_count')
+
+
+def word_count(chapter: Dict) -> int:
+    """Words of translatable text; the skeleton texts spare a parse."""
+    texts = chapter.get('texts')
+    if isinstance(texts, list) and chapter.get('skeleton'):
+        return sum(len(strip_placeholders(text).split()) for text in texts)
+    return len(plain_text(chapter.get('content') or '').split())
+
+
+def _row(extracted_epub, index: int, chapter: Dict) -> Chapter:
+    content = chapter.get('content') or ''
+    return Chapter(
+        extracted_epub=extracted_epub,
+        index=index,
+        title=chapter.get('title') or '',
+        content=content,
+        size=len(content),
+        word_count=word_count(chapter),
+        hash=source_chapter_hash(chapter),
+        skeleton=chapter.get('skeleton') or '',
+        texts=chapter.get('texts') or [],
+        skipped=chapter.get('skipped') or {},
+    )
+
+
+def replace_chapters(extracted_epub, chapters: List[Dict]) -> None:
+    """Store the chapters of a book, replacing any stored before."""
+    with transaction.atomic():
+        Chapter.objects.filter(extracted_epub=extracted_epub).delete()
+        Chapter.objects.bulk_create(
+            [_row(extracted_epub, index, chapter) for index, chapter in enumerate(chapters)], batch_size=200
+        )
+
+
+def update_chapter(row: Chapter, **fields) -> None:
+    """Save changed fields of a chapter row, keeping size, word count and hash in step with the content."""
+    for name, value in fields.items():
+        setattr(row, name, value)
+    chapter = {name: getattr(row, name) for name in CHAPTER_FIELDS}
+    chapter['hash'] = ''
+    row.size = len(row.content)
+    row.word_count = word_count(chapter)
+    row.hash = source_chapter_hash(chapter)
+    row.save(update_fields=[*fields, 'size', 'word_count', 'hash'])
+
+
+def chapter_count(extracted_epub) -> int:
+    return Chapter.objects.filter(extracted_epub=extracted_epub).count()
+
+
+def chapter_dicts(extracted_epub, indexes: Optional[Iterable[int]] = None,
+                  fields: Sequence[str] = CHAPTER_FIELDS) -> List[Dict]:
+    """Chapters of a book as dicts in index order, optionally only some indexes and fields."""
+    qs = Chapter.objects.filter(extracted_epub=extracted_epub)
+    if indexes is not None:
+        qs = qs.filter(index__in=list(indexes))
+    return list(qs.order_by('index').values(*fields))
+
+
+def get_chapter(extracted_epub, index: int, fields: Sequence[str] = CHAPTER_FIELDS) -> Optional[Dict]:
+    return Chapter.objects.filter(extracted_epub=extracted_epub, index=index).values(*fields).first()
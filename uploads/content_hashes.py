@@ -0,0 +1,128 @@
+"""
+Content hashes for incremental re-translation.
+
+Extracted chapters carry a 'hash' of their HTML. Translated chapter rows keep
+the 'source_hash' they were produced from plus a {segment_hash: translation}
+map, so re-translating a book only sends the segments whose text changed.
+
+Books carry a content_hash over everything that gets translated (title,
+prose metadata, chapter titles and contents). A finished translation of a
+book with the same content_hash and language pair, e.g. the same AO3 work
+imported by another user, is cloned instead of being translated again.
+The clone belongs to the requesting user's book; the other book is never
+exposed.
+"""
+import hashlib
+import json
+from typing import Dict, List, Optional, Tuple
+
+from django.db.models import Q
+
+from .models import TranslatedChapter, TranslatedEpub
+from .segment_utils import translatable_metadata_keys
+
+
+def chapter_hash(content: str) -> str:
+    return hashlib.sha256((content or '').encode('utf-8')).hexdigest()
+
+
+def annotate_chapters(chapters: List[Dict]) -> List[Dict]:
+    """Set the content 'hash' of every extracted chapter in place."""
+    for chapter in chapters or []:
+        if isinstance(chapter, dict):
+            chapter['hash'] = chapter_hash(chapter.get('content', ''))
+    return chapters
+
+
+def source_chapter_hash(chapter: Dict) -> str:
+    """Stored hash of an extracted chapter; computed for books extracted before hashing."""
+    return chapter.get('hash') or chapter_hash(chapter.get('content', ''))
+
+
+def previous_translated_chapter(job, chapter_index: int) -> Optional[Dict]:
+    """The chapter as stored by the last translation of the same book and language pair, if any."""
+    return previous_translated_chapters(job, [job.target_lang], chapter_index).get(job.target_lang)
+
+
+def previous_translated_chapters(job, target_langs: List[str], chapter_index: int) -> Dict[str, Dict]:
+    """previous_translated_chapter for several target languages of the job's book, in one query."""
+    rows = TranslatedChapter.objects.filter(
+        extracted_epub_id=job.extracted_epub_id, source_lang=job.source_lang, target_lang__in=target_langs,
+        chapter_index=chapter_index, status='done'
+    ).values('target_lang', 'content', 'source_hash', 'segments')
+    return {row.pop('target_lang'): row for row in rows}
+
+
+def book_content_hash(title: str, metadata, chapters) -> str:
+    metadata = metadata if isinstance(metadata, dict) else {}
+    payload = {
+        'title': title or '',
+        'metadata': {key: metadata[key] for key in translatable_metadata_keys(metadata)},
+        'chapters': [
+            [ch.get('title') or '', source_chapter_hash(ch)] for ch in chapters or [] if isinstance(ch, dict)
+        ],
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def annotate_book(extracted_epub, chapters: Optional[List[Dict]] = None) -> None:
+    """
+    Set the chapter hashes and the book content_hash of an extracted book in
+    place. Without chapters, the stored Chapter rows are used.
+    """
+    if chapters is None:
+        chapters = list(extracted_epub.chapters.order_by('index').values('title', 'hash'))
+    else:
+        annotate_chapters(chapters)
+    extracted_epub.content_hash = book_content_hash(extracted_epub.title, extracted_epub.metadata, chapters)
+
+
+def _is_complete(translation) -> bool:
+    """Translations whose last job left chapters untranslated are not shared."""
+    latest = translation.jobs.order_by('-created_at').values_list('status', flat=True).first()
+    return latest is None or latest == 'completed'
+
+
+def shared_translation(extracted_epub, source_lang: str, target_lang: str,
+                       chapter_index: Optional[int] = None) -> Optional[Tuple[TranslatedEpub, Dict]]:
+    """
+    A finished translation of another book with identical content and the
+    same language pair, with the fields to clone for this request, or None.
+    """
+    if not extracted_epub.content_hash:
+        return None
+    candidates = TranslatedEpub.objects.filter(
+        extracted_epub__content_hash=extracted_epub.content_hash,
+        source_lang__in=[source_lang, 'auto'],
+        target_lang=target_lang,
+    ).exclude(extracted_epub=extracted_epub)
+    if chapter_index is None:
+        candidates = candidates.filter(chapter_index__isnull=True)
+    else:
+        candidates = candidates.filter(Q(chapter_index=chapter_index) | Q(chapter_index__isnull=True))
+    # Same-chapter translations first, then full books; newest first
+    ordered = sorted(candidates, key=lambda tr: (tr.chapter_index is None, -tr.translated_at.timestamp()))
+    for donor in ordered:
+        if not _is_complete(donor):
+            continue
+        rows = TranslatedChapter.objects.filter(
+            extracted_epub_id=donor.extracted_epub_id, source_lang=donor.source_lang, target_lang=target_lang,
+            status='done'
+        )
+        if chapter_index is not None:
+            rows = rows.filter(chapter_index=chapter_index)
+        chapters = {
+            row['chapter_index']: row
+            for row in rows.values('chapter_index', 'title', 'content', 'source_hash', 'segments')
+        }
+        if not chapters:
+            continue
+        metadata = dict(extracted_epub.metadata) if isinstance(extracted_epub.metadata, dict) else {}
+        for key in translatable_metadata_keys(metadata):
+            metadata[key] = (donor.translated_metadata or {}).get(key, metadata[key])
+        return donor, {
+            'translated_title': donor.translated_title,
+            'translated_metadata': metadata,
+            'translated_chapters': chapters,
+        }
+    return None
@@ -0,0 +1,526 @@
+"""
+Single-pass HTML pipeline for chapter documents.
+
+Each document is parsed once with lxml and the same tree yields the
+sanitized body HTML, the chapter title and the chapter skeleton: the body
+with every translatable text slot replaced by a numbered marker, plus the
+list of texts. Translating a chapter maps that list and substitutes the
+results into the skeleton, so no HTML is parsed on the translation path.
+
+Paragraph-like blocks (p, li, h1-h6, blockquote, ...) holding only text and
+inline markup are one slot each: their inline tags become numbered
+placeholders ([[1]]...[[/1]], [[2/]] for empty ones) that the provider
+carries through, and the tags themselves are kept in the slot marker of
+the skeleton. A paragraph with a few <em>/<a> runs is then one sentence-
+complete segment instead of a fragment per text node.
+Well-formed XHTML (the EPUB norm) goes through the XML parser so that
+self-closing tags such as <a id="p1"/> keep their meaning; anything else
+falls back to the lenient HTML parser.
+
+Two levels of sanitizing are applied:
+- sanitize: drops scripts, embedded objects, styles, comments, event
+  handler attributes and unsafe URLs (extraction, translation, the reader);
+- clean: also keeps only ALLOWED_TAGS / ALLOWED_ATTRS, like
+  bleach.clean(strip=True) did (AO3 imports).
+"""
+import html as html_lib
+import re
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from lxml import etree, html as lxml_html
+
+from .segment_utils import SKIP_PARENT_TAGS, record_skipped
+
+ALLOWED_TAGS = [
+    'p','div','span','strong','em','b','i','u','a','ul','ol','li','br','hr','h1','h2','h3','h4','h5','h6',
+    'img','blockquote','code','pre','table','thead','tbody','tr','td','th'
+]
+# No 'style': without a CSS sanitizer bleach emptied its values anyway
+ALLOWED_ATTRS = {
+    '*': ['class','id'],
+    'a': ['href','title','target','rel'],
+    'img': ['src','alt','title']
+}
+ALLOWED_PROTOCOLS = ('http', 'https', 'mailto')
+URL_ATTRS = ('href', 'src', 'action', 'formaction', 'poster', 'background')
+
+DANGEROUS_TAGS = (
+    'script', 'iframe', 'object', 'embed', 'style', 'link', 'meta', 'base', 'frame', 'frameset', 'applet'
+)
+HEADING_TAGS = ('h1', 'h2', 'h3', 'h4', 'h5', 'h6')
+# Blocks translated as one unit when everything inside them is inline
+UNIT_TAGS = HEADING_TAGS + (
+    'p', 'li', 'blockquote', 'div', 'dt', 'dd', 'td', 'th', 'caption', 'figcaption', 'summary'
+)
+INLINE_TAGS = {
+    'a', 'abbr', 'b', 'bdi', 'bdo', 'big', 'br', 'cite', 'del', 'dfn', 'em', 'font', 'i', 'img', 'ins', 'mark',
+    'q', 'rp', 'rt', 'ruby', 's', 'small', 'span', 'strike', 'strong', 'sub', 'sup', 'time', 'tt', 'u', 'wbr',
+}
+
+_XML_DECLARATION = re.compile(r'^\s*<\?xml[^>]*?>', re.IGNORECASE)
+_DOCTYPE = re.compile(r'<!DOCTYPE[^>]*?>', re.IGNORECASE)
+_DOCUMENT_TAG = re.compile(r'<(?:html|body)[\s>/]', re.IGNORECASE)
+_URL_SCHEME = re.compile(r'^([a-zA-Z][a-zA-Z0-9+.-]*):')
+_URL_IGNORED_CHARS = re.compile(r'[\x00-\x20]+')
+_XML_LANG = '{http://www.w3.org/XML/1998/namespace}lang'
+_XLINK_HREF = '{http://www.w3.org/1999/xlink}href'
+# Inline raster images; SVG is left out as it can carry scripts
+_DATA_IMAGE = re.compile(r'^data:image/(?!svg)[a-z0-9.+-]+[;,]', re.IGNORECASE)
+_XML_PARSER = etree.XMLParser(resolve_entities=False, no_network=True, huge_tree=True, remove_blank_text=False)
+
+# Private-use characters around a slot number; they never occur in book text
+SLOT_OPEN = '\ue000'
+SLOT_CLOSE = '\ue001'
+# Inside the marker of a unit slot: one TAG_SEP per placeholder, followed by
+# its opening tag, INNER_SEP and closing tag (or the whole empty element)
+TAG_SEP = '\ue002'
+INNER_SEP = '\ue003'
+_PRIVATE = re.compile('[\ue000-\ue003]')
+_SLOT = re.compile(SLOT_OPEN + r'(\d+)((?:' + TAG_SEP + '[^\ue000-\ue002]*)*)' + SLOT_CLOSE)
+# Inline placeholders; providers sometimes add spaces inside the brackets
+_TOKEN = re.compile(r'\[\[\s*(/?)\s*(\d+)\s*(/?)\s*\]\]')
+
+
+class ParsedDocument(NamedTuple):
+    html: str
+    title: str
+    skeleton: str
+    texts: List[str]
+    skipped: Dict[str, int]
+
+
+# --- parsing -------------------------------------------------------------
+
+def _to_text(raw) -> str:
+    if isinstance(raw, bytes):
+        raw = raw.decode('utf-8', errors='replace')
+    text = _XML_DECLARATION.sub('', raw or '', count=1)
+    return _DOCTYPE.sub('', text)
+
+
+def _local_name(name: str) -> str:
+    return name.split('}', 1)[1] if name.startswith('{') else name
+
+
+def _strip_namespaces(root) -> None:
+    """
+    Turn an XHTML tree into plain HTML names. Namespaced attributes (epub:type)
+    are dropped, except xml:lang and xlink:href (SVG covers, links), which
+    become lang and href.
+    """
+    renamed = {_XML_LANG: 'lang', _XLINK_HREF: 'href'}
+    for el in root.iter():
+        if not isinstance(el.tag, str):
+            continue
+        el.tag = _local_name(el.tag)
+        for key in [k for k in el.attrib if k.startswith('{')]:
+            value = el.attrib.pop(key)
+            if key in renamed and renamed[key] not in el.attrib:
+                el.attrib[renamed[key]] = value
+    etree.cleanup_namespaces(root)
+
+
+def parse_tree(raw):
+    """
+    Root element of a full document, or None when there is no content.
+    Fragments (stored chapter bodies) are returned inside a <div> container
+    so that bare text is not wrapped in a paragraph.
+    """
+    text = _to_text(raw)
+    if not text.strip():
+        return None
+    if not _DOCUMENT_TAG.search(text):
+        return lxml_html.fragment_fromstring(text, create_parent='div')
+    try:
+        root = etree.fromstring(text.encode('utf-8'), _XML_PARSER)
+        _strip_namespaces(root)
+        if root.tag == 'html':
+            return root
+    except etree.XMLSyntaxError:
+        pass
+    return lxml_html.document_fromstring(text)
+
+
+def parse_fragment(raw):
+    """A stored chapter body wrapped in a <div> container."""
+    return lxml_html.fragment_fromstring(_to_text(raw), create_parent='div')
+
+
+def body_of(root):
+    body = root.find('body')
+    return body if body is not None else root
+
+
+# --- tree editing --------------------------------------------------------
+
+def _append_text(parent, previous, text: Optional[str]) -> None:
+    if not text:
+        return
+    if previous is not None:
+        previous.tail = (previous.tail or '') + text
+    else:
+        parent.text = (parent.text or '') + text
+
+
+def drop_tree(el) -> None:
+    """Remove an element and its content, keeping the text that follows it."""
+    parent = el.getparent()
+    if parent is None:
+        return
+    _append_text(parent, el.getprevious(), el.tail)
+    parent.remove(el)
+
+
+def drop_tag(el) -> None:
+    """Remove an element but keep its content in place."""
+    parent = el.getparent()
+    if parent is None:
+        return
+    previous = el.getprevious()
+    _append_text(parent, previous, el.text)
+    index = parent.index(el)
+    children = list(el)
+    for offset, child in enumerate(children):
+        parent.insert(index + offset, child)
+    _append_text(parent, children[-1] if children else previous, el.tail)
+    parent.remove(el)
+
+
+def _safe_url(value: str) -> bool:
+    value = _URL_IGNORED_CHARS.sub('', value or '')
+    match = _URL_SCHEME.match(value)
+    if match is None or match.group(1).lower() in ALLOWED_PROTOCOLS:
+        return True
+    return _DATA_IMAGE.match(value) is not None
+
+
+def sanitize(root) -> None:
+    """Drop scripts, embedded objects, styles, comments, event handlers and unsafe URLs."""
+    for el in list(root.iter()):
+        if not isinstance(el.tag, str) or el.tag in DANGEROUS_TAGS:
+            drop_tree(el)
+            continue
+        for key in list(el.attrib):
+            if key.lower().startswith('on') or (key in URL_ATTRS and not _safe_url(el.attrib[key])):
+                del el.attrib[key]
+
+
+def clean(container) -> None:
+    """Whitelist sanitizing of everything below container; disallowed tags are unwrapped."""
+    for el in list(container.iterdescendants()):
+        if not isinstance(el.tag, str) or el.tag in DANGEROUS_TAGS:
+            drop_tree(el)
+            continue
+        if el.tag not in ALLOWED_TAGS:
+            drop_tag(el)
+            continue
+        allowed = ALLOWED_ATTRS['*'] + ALLOWED_ATTRS.get(el.tag, [])
+        for key in list(el.attrib):
+            if key not in allowed or (key in URL_ATTRS and not _safe_url(el.attrib[key])):
+                del el.attrib[key]
+
+
+def inner_html(el) -> str:
+    parts = [html_lib.escape(el.text, quote=False)] if el.text else []
+    parts.extend(etree.tostring(child, encoding='unicode', method='html') for child in el)
+    return ''.join(parts)
+
+
+# --- text ----------------------------------------------------------------
+
+def iter_text_slots(root) -> Iterator[Tuple[object, str, bool]]:
+    """
+    (element, 'text' | 'tail', skipped) for every non-blank text slot below
+    root, in document order. skipped is True inside SKIP_PARENT_TAGS.
+    """
+    root_skip = root.tag in SKIP_PARENT_TAGS
+    if root.text and root.text.strip():
+        yield root, 'text', root_skip
+    # (element, child iterator, skip inside element, skip of the enclosing element)
+    stack = [(root, iter(root), root_skip, None)]
+    while stack:
+        el, children, skip, parent_skip = stack[-1]
+        child = next(children, None)
+        if child is None:
+            stack.pop()
+            if parent_skip is not None and el.tail and el.tail.strip():
+                yield el, 'tail', parent_skip
+            continue
+        if not isinstance(child.tag, str):
+            if child.tail and child.tail.strip():
+                yield child, 'tail', skip
+            continue
+        child_skip = skip or child.tag in SKIP_PARENT_TAGS
+        if child.text and child.text.strip():
+            yield child, 'text', child_skip
+        stack.append((child, iter(child), child_skip, skip))
+
+
+def text_segments(html_content: str) -> List[str]:
+    """Translatable segments (text slots and units) of a stored chapter body, in document order."""
+    if not html_content:
+        return []
+    return _skeleton(parse_fragment(html_content))[1]
+
+
+def plain_text(html_content: str, limit: Optional[int] = None) -> str:
+    """Whitespace-normalized text of a stored chapter body."""
+    if not html_content:
+        return ''
+    text = ' '.join(' '.join(parse_fragment(html_content).itertext()).split())
+    return text[:limit] if limit is not None else text
+
+
+def _unit_elements(container) -> set:
+    """
+    Blocks below container translated as one unit: nothing but text and
+    inline tags inside, not in a code block, and no text that looks like a
+    placeholder.
+    """
+    units = set()
+    for el in container.iterdescendants(*UNIT_TAGS):
+        if not len(el) or any(not isinstance(d.tag, str) or d.tag not in INLINE_TAGS for d in el.iterdescendants()):
+            continue
+        text = ''.join(el.itertext())
+        if not text.strip() or '[[' in text or ']]' in text:
+            continue
+        if any(a.tag in SKIP_PARENT_TAGS for a in el.iterancestors()):
+            continue
+        units.add(el)
+    return units
+
+
+def _unit_owner(el, attr, units):
+    """The unit holding a text slot, if any."""
+    node = el if attr == 'text' else el.getparent()
+    while node is not None:
+        if node in units:
+            return node
+        node = node.getparent()
+    return None
+
+
+def _open_tag(el) -> str:
+    attrs = ''.join(f' {key}="{html_lib.escape(value, quote=True)}"' for key, value in el.attrib.items())
+    return _PRIVATE.sub('', f'<{el.tag}{attrs}>')
+
+
+def _unit_text(unit) -> Tuple[str, List[str]]:
+    """Text of a unit with inline placeholders, and the tag of every placeholder."""
+    parts = [unit.text or '']
+    tags: List[str] = []
+
+    def walk(el):
+        for child in el:
+            tags.append('')
+            number = len(tags)
+            if not len(child) and not child.text:
+                tail, child.tail = child.tail, None
+                tags[number - 1] = _PRIVATE.sub('', etree.tostring(child, encoding='unicode', method='html'))
+                child.tail = tail
+                parts.append(f'[[{number}/]]')
+            else:
+                tags[number - 1] = f'{_open_tag(child)}{INNER_SEP}</{child.tag}>'
+                parts.append(f'[[{number}]]{child.text or ""}')
+                walk(child)
+                parts.append(f'[[/{number}]]')
+            parts.append(child.tail or '')
+
+    walk(unit)
+    return _PRIVATE.sub('', ''.join(parts)), tags
+
+
+def _skeleton(container) -> Tuple[str, List[str], Dict[str, int]]:
+    """
+    (skeleton, texts, skipped) of a sanitized container. Every translatable
+    slot becomes a numbered marker; its surrounding whitespace stays in the
+    skeleton. Units (see _unit_elements) are one slot whose marker also
+    holds their inline tags. Text in code blocks stays in place and is
+    counted in skipped. The tree is modified.
+    """
+    texts: List[str] = []
+    skipped: Dict[str, int] = {}
+    units = _unit_elements(container)
+    unit_slots = {}
+    for el, attr, is_skipped in list(iter_text_slots(container)):
+        unit = _unit_owner(el, attr, units) if units else None
+        if unit is not None:
+            if unit not in unit_slots:
+                value, tags = _unit_text(unit)
+                unit_slots[unit] = (len(texts), value, tags)
+                texts.append(value.strip())
+            continue
+        value = _PRIVATE.sub('', getattr(el, attr))
+        if is_skipped:
+            setattr(el, attr, value)
+            record_skipped(skipped, [value])
+            continue
+        leading = value[:len(value) - len(value.lstrip())]
+        trailing = value[len(value.rstrip()):]
+        setattr(el, attr, f"{leading}{SLOT_OPEN}{len(texts)}{SLOT_CLOSE}{trailing}")
+        texts.append(value.strip())
+    markers = {}
+    for unit, (number, value, tags) in unit_slots.items():
+        for child in list(unit):
+            unit.remove(child)
+        leading = value[:len(value) - len(value.lstrip())]
+        trailing = value[len(value.rstrip()):]
+        unit.text = f"{leading}{SLOT_OPEN}{number}{SLOT_CLOSE}{trailing}"
+        markers[str(number)] = ''.join(TAG_SEP + tag for tag in tags)
+    skeleton = inner_html(container).strip()
+    if markers:
+        skeleton = _SLOT.sub(lambda m: f"{SLOT_OPEN}{m.group(1)}{markers.get(m.group(1), '')}{SLOT_CLOSE}", skeleton)
+    return skeleton, texts, skipped
+
+
+def _placeholders_match(tokens, tags: List[str]) -> bool:
+    """Every placeholder exactly once, of the right kind and properly nested."""
+    seen = set()
+    stack: List[int] = []
+    for closing, number, empty in tokens:
+        if not 1 <= number <= len(tags) or (closing and empty):
+            return False
+        paired = INNER_SEP in tags[number - 1]
+        if closing:
+            if not stack or stack.pop() != number:
+                return False
+            continue
+        if number in seen or paired == bool(empty):
+            return False
+        seen.add(number)
+        if paired:
+            stack.append(number)
+    return not stack and len(seen) == len(tags)
+
+
+def render_unit(text: str, tags: List[str]) -> str:
+    """
+    HTML of a (translated) unit text, its placeholders replaced by the
+    inline tags. When the provider lost or reordered placeholders beyond
+    repair the text is kept without its inline formatting; empty elements
+    (images, line breaks) are still restored.
+    """
+    matches = list(_TOKEN.finditer(text))
+    tokens = [(bool(m.group(1)), int(m.group(2)), bool(m.group(3))) for m in matches]
+    valid = _placeholders_match(tokens, tags)
+    out = []
+    position = 0
+    restored = set()
+    for match, (closing, number, empty) in zip(matches, tokens):
+        out.append(html_lib.escape(text[position:match.start()], quote=False))
+        position = match.end()
+        tag = tags[number - 1] if 1 <= number <= len(tags) else ''
+        if valid:
+            opening, _, end = tag.partition(INNER_SEP)
+            out.append(end if closing else opening)
+        elif empty and tag and INNER_SEP not in tag and number not in restored:
+            restored.add(number)
+            out.append(tag)
+    out.append(html_lib.escape(text[position:], quote=False))
+    if not valid:
+        out.extend(
+            tag for number, tag in enumerate(tags, 1) if INNER_SEP not in tag and number not in restored
+        )
+    return ''.join(out)
+
+
+def strip_placeholders(text: str) -> str:
+    """A unit text without its placeholders (empty elements count as a space)."""
+    return _TOKEN.sub(lambda m: ' ' if m.group(3) else '', text or '')
+
+
+def render_skeleton(skeleton: str, texts: List[str]) -> str:
+    """Chapter HTML from its skeleton and a list of (translated) texts."""
+    def slot(match):
+        text = texts[int(match.group(1))]
+        if not match.group(2):
+            return html_lib.escape(text, quote=False)
+        return render_unit(text, match.group(2).split(TAG_SEP)[1:])
+
+    return _SLOT.sub(slot, skeleton or '')
+
+
+def _text_of(el) -> str:
+    return ''.join(el.itertext()).strip()
+
+
+def _find_title(root, body) -> str:
+    """h1..h6, then <title> unless it is a file name, then the first sentence, then the first words."""
+    for name in HEADING_TAGS:
+        heading = next(body.iter(name), None)
+        if heading is not None and _text_of(heading):
+            return _text_of(heading)
+    title_el = root.find('.//title')
+    if title_el is not None:
+        text = _text_of(title_el)
+        if text and not text.endswith('.html') and not text.endswith('.xhtml'):
+            return text
+    for el in body.iter('p', 'div', 'span'):
+        if len(el) or not el.text:
+            continue
+        text = el.text.strip()
+        if len(text) > 5:
+            first_sentence = re.split(r'[.!?]', text)[0].strip()
+            if 5 < len(first_sentence) <= 100:
+                return first_sentence + ('...' if len(first_sentence) < len(text.split('.')[0]) else '')
+    words = ' '.join(body.itertext()).split()
+    if words:
+        return ' '.join(words[:10]) + ('...' if len(words) > 10 else '')
+    return ''
+
+
+# --- entry points --------------------------------------------------------
+
+def parse_document(raw, fallback_title: str = '') -> ParsedDocument:
+    """Sanitized body HTML, title and skeleton of an EPUB document, from one parse."""
+    root = parse_tree(raw)
+    if root is None:
+        return ParsedDocument('', fallback_title, '', [], {})
+    sanitize(root)
+    body = body_of(root)
+    title = _find_title(root, body) or fallback_title
+    html = inner_html(body).strip()
+    skeleton, texts, skipped = _skeleton(body)
+    return ParsedDocument(html, title, skeleton, texts, skipped)
+
+
+def has_skeleton(chapter) -> bool:
+    return isinstance(chapter, dict) and bool(chapter.get('skeleton')) and isinstance(chapter.get('texts'), list)
+
+
+def chapter_html(chapter) -> str:
+    """
+    Sanitized HTML of a source chapter. Chapters with a skeleton were
+    sanitized at extraction; older ones are sanitized here.
+    """
+    chapter = chapter if isinstance(chapter, dict) else {}
+    if chapter.get('skeleton'):
+        return chapter.get('content') or render_skeleton(chapter['skeleton'], chapter.get('texts') or [])
+    return sanitize_html(chapter.get('content', ''))
+
+
+def chapter_fields(html_content: str) -> Dict:
+    """Stored fields of a chapter body: sanitized content, skeleton, texts and skipped counters."""
+    container = parse_fragment(html_content or '')
+    sanitize(container)
+    content = inner_html(container).strip()
+    skeleton, texts, skipped = _skeleton(container)
+    return {'content': content, 'skeleton': skeleton, 'texts': texts, 'skipped': skipped}
+
+
+def sanitize_html(raw) -> str:
+    """Body HTML without scripts, embedded objects, styles and comments."""
+    root = parse_tree(raw)
+    if root is None:
+        return ''
+    sanitize(root)
+    return inner_html(body_of(root)).strip()
+
+
+def clean_html(raw) -> str:
+    """Whitelisted HTML (ALLOWED_TAGS / ALLOWED_ATTRS) of a fragment."""
+    if not raw:
+        return ''
+    container = parse_fragment(raw)
+    clean(container)
+    return inner_html(container)
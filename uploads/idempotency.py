@@ -0,0 +1,101 @@
+"""
+Idempotency-Key support for POST endpoints that start expensive work.
+
+A client that sends the same Idempotency-Key again (a retry after a
+timeout, a double click) gets the response of the first request instead
+of a second upload or translation. Keys are scoped to the user; a retry
+arriving while the first request still runs waits for it (single_flight).
+A key reused on another endpoint or with another body is rejected (422),
+since it asks for different work. Only successful (2xx) responses are
+stored; a failed request leaves the key free. Stored responses expire after
+IDEMPOTENCY_KEY_TTL_HOURS.
+"""
+import functools
+import hashlib
+import json
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+from .single_flight import Busy, single_flight
+
+log = logging.getLogger(__name__)
+
+HEADER = 'Idempotency-Key'
+
+
+def _cutoff():
+    return timezone.now() - timedelta(hours=getattr(settings, 'IDEMPOTENCY_KEY_TTL_HOURS', 24))
+
+
+def _body_value(value):
+    # Uploaded files are identified by name and size rather than read again
+    if isinstance(value, UploadedFile):
+        return [value.name, value.size]
+    return value
+
+
+def fingerprint(request) -> str:
+    """SHA-256 of the parsed request body, independent of field order."""
+    data = request.data
+    if hasattr(data, 'lists'):
+        data = {key: [_body_value(value) for value in values] for key, values in data.lists()}
+    body = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.sha256(body.encode('utf-8')).hexdigest()
+
+
+def idempotent(view_method):
+    """Decorate a view's post/create so requests repeating an Idempotency-Key replay the stored response."""
+
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = (request.headers.get(HEADER) or '').strip()
+        if not key or not request.user.is_authenticated:
+            return view_method(self, request, *args, **kwargs)
+        key = key[:255]
+        scope = f"{request.method} {request.path}"[:255]
+        request_hash = fingerprint(request)
+        try:
+            with single_flight(f'idempotency:{request.user.pk}:{key}'):
+                IdempotencyKey.objects.filter(user=request.user, key=key, created_at__lt=_cutoff()).delete()
+                stored = IdempotencyKey.objects.filter(user=request.user, key=key).first()
+                if stored is not None:
+                    if stored.scope != scope:
+                        return Response(
+                            {'error': 'Idempotency-Key already used for a different request'},
+                            status=status.HTTP_422_UNPROCESSABLE_ENTITY
+                        )
+                    if stored.request_hash and stored.request_hash != request_hash:
+                        return Response(
+                            {'error': 'Idempotency-Key already used with a different request body'},
+                            status=status.HTTP_422_UNPROCESSABLE_ENTITY
+                        )
+                    log.info(f"[Idempotency] Repetindo resposta da chave {key} ({scope})")
+                    return Response(stored.response, status=stored.status_code, headers={'Idempotent-Replayed': 'true'})
+                response = view_method(self, request, *args, **kwargs)
+                # Only successes are stored: after a 4xx (e.g. a conflict) or a server error the
+                # key stays free, so a corrected or later retry runs again
+                if status.is_success(response.status_code) and isinstance(getattr(response, 'data', None), (dict, list)):
+                    IdempotencyKey.objects.create(
+                        user=request.user, key=key, scope=scope, request_hash=request_hash,
+                        status_code=response.status_code, response=response.data
+                    )
+                return response
+        except Busy:
+            return Response(
+                {'error': 'A request with this Idempotency-Key is still being processed'},
+                status=status.HTTP_409_CONFLICT
+            )
+
+    return wrapper
+
+
+def prune() -> int:
+    deleted, _ = IdempotencyKey.objects.filter(created_at__lt=_cutoff()).delete()
+    return deleted
@@ -0,0 +1,206 @@
+"""
+Offline source-language detection, run once per book at extraction time.
+
+Books written in a non-Latin script are classified by the share of each
+script's characters. Latin-script text is scored by how many of its words
+and character trigrams are covered by a small corpus of frequent words for
+every supported language. Storing the result lets translations use a
+concrete source language instead of asking the provider to re-detect 'auto'
+on every call.
+"""
+import logging
+import re
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from .html_pipeline import plain_text
+
+log = logging.getLogger(__name__)
+
+# Characters sampled per book: spread over the chapters, enough to be stable
+SAMPLE_CHARS = 20000
+MIN_SAMPLE_CHARS = 40
+MIN_CONFIDENCE = 0.05
+# Language codes accepted as translation source or target
+SUPPORTED_LANGUAGES = frozenset({'en', 'pt', 'es', 'fr', 'de', 'it', 'ja', 'ko', 'zh', 'ru', 'ar'})
+
+_SEED_TEXT = {
+    'en': (
+        "the of and to in is that it was for on are as with his they at be this have from or one had by "
+        "word but not what all were we when your can said there use each which she do how their if will "
+        "up other about out many then them these so some her would make like him into time has look two "
+        "more write go see number no way could people my than first water been call who its now find long "
+        "down day did get come made may part over new after know just little where said before through "
+        "back much should very thought nothing something everything"
+    ),
+    'pt': (
+        "de que não o a do da em um para é com uma os no se na por mais as dos como mas foi ao ele das tem "
+        "à seu sua ou ser quando muito há nos já está eu também só pelo pela até isso ela entre era depois "
+        "sem mesmo aos ter seus quem nas me esse eles estão você tinha foram essa num nem suas meu às minha "
+        "têm numa pelos elas havia seja qual será nós tenho lhe deles essas esses pelas este fosse dele "
+        "então coração ação não são irmão mãe pão também muito obrigado"
+    ),
+    'es': (
+        "de la que el en y a los se del las un por con no una su para es al lo como más pero sus le ya o "
+        "este sí porque esta entre cuando muy sin sobre también me hasta hay donde quien desde todo nos "
+        "durante todos uno les ni contra otros ese eso ante ellos e esto mí antes algunos qué unos yo otro "
+        "otras otra él tanto esa estos mucho quienes nada muchos cual poco ella estar estas algunas algo "
+        "nosotros mañana señor corazón niño año llegó dijo"
+    ),
+    'fr': (
+        "de la le et les des en un du une que est pour qui dans par plus pas au sur ne se ce il sont avec "
+        "ils son mais comme on été ou aux elle nous leur vous lui même aussi bien tout sans peut ces faire "
+        "deux dont très cette entre été après être avait fait ses sous encore tous chez avant où je tu "
+        "mon ma mes ton ta tes notre votre leurs quelque chose jamais toujours rien beaucoup cœur garçon "
+        "déjà voilà peut-être aujourd'hui qu'il c'est n'est"
+    ),
+    'de': (
+        "der die und in den von zu das mit sich des auf für ist im dem nicht ein die eine als auch es an "
+        "werden aus er hat dass sie nach wird bei einer um am sind noch wie einem über einen so zum war "
+        "haben nur oder aber vor zur bis mehr durch man sein wurde sei ich du wir ihr mich dich uns euch "
+        "schon wenn kann hatte diese dieser gegen nichts etwas immer wieder zwischen müssen können größe "
+        "straße mädchen schön für über"
+    ),
+    'it': (
+        "di e il la che in a per un è del non una con le si da sono al i della come lo più ma anche dei "
+        "nel questo alla gli ha se delle o ci essere suo sua nella cui tra mi fra ne loro ho io tu noi voi "
+        "lui lei quello questa quando molto sempre ancora poi già dove perché cosa niente qualcosa fatto "
+        "stato stata fare detto cuore ragazzo così però perché città più può"
+    ),
+}
+
+# (language, regex of the script's characters); checked before n-gram scoring
+_SCRIPTS = (
+    ('ja', re.compile(r'[぀-ヿ]')),
+    ('ko', re.compile(r'[가-힯ᄀ-ᇿ]')),
+    ('zh', re.compile(r'[一-鿿]')),
+    ('ru', re.compile(r'[Ѐ-ӿ]')),
+    ('ar', re.compile(r'[؀-ۿ]')),
+)
+_LATIN = re.compile(r'[a-zà-ÿ]', re.IGNORECASE)
+_NON_WORD = re.compile(r"[^\w']+|\d+|_")
+
+_profiles: Dict[str, Tuple[FrozenSet[str], FrozenSet[str]]] = {}
+
+
+def _words(text: str) -> List[str]:
+    return _NON_WORD.sub(' ', text.lower()).split()
+
+
+def _trigrams(words: Iterable[str]) -> Iterable[str]:
+    for word in words:
+        padded = f' {word} '
+        for i in range(len(padded) - 2):
+            yield padded[i:i + 3]
+
+
+def _build_profiles() -> Dict[str, Tuple[FrozenSet[str], FrozenSet[str]]]:
+    """(frequent words, their character trigrams) per language."""
+    if not _profiles:
+        for lang, seed in _SEED_TEXT.items():
+            words = _words(seed)
+            _profiles[lang] = (frozenset(words), frozenset(_trigrams(words)))
+    return _profiles
+
+
+def _script_language(text: str) -> Optional[Tuple[str, float]]:
+    letters = sum(1 for ch in text if ch.isalpha())
+    if not letters:
+        return None
+    counts = {lang: len(pattern.findall(text)) for lang, pattern in _SCRIPTS}
+    # Japanese text mixes kana with Han characters
+    if counts['ja'] and counts['ja'] + counts['zh'] > letters * 0.3:
+        return 'ja', round(min(1.0, (counts['ja'] + counts['zh']) / letters), 3)
+    lang, count = max(counts.items(), key=lambda kv: kv[1])
+    if count > letters * 0.3:
+        return lang, round(count / letters, 3)
+    return None
+
+
+def detect_language(text: str) -> Optional[Tuple[str, float]]:
+    """
+    Return (language code, confidence in [0, 1]) for plain text, or None when
+    the sample is too short or too ambiguous to decide.
+    """
+    text = (text or '').strip()
+    if len(text) < MIN_SAMPLE_CHARS:
+        return None
+    by_script = _script_language(text)
+    if by_script:
+        return by_script
+    if not _LATIN.search(text):
+        return None
+
+    words = _words(text)
+    grams = list(_trigrams(words))
+    if not words or not grams:
+        return None
+    scores = {}
+    for lang, (vocab, trigrams) in _build_profiles().items():
+        # Share of word unigrams plus share of character trigrams the language covers
+        word_hits = sum(1 for word in words if word in vocab) / len(words)
+        gram_hits = sum(1 for gram in grams if gram in trigrams) / len(grams)
+        scores[lang] = word_hits + gram_hits
+    ranked = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)
+    (best, best_score), (_, second_score) = ranked[0], ranked[1]
+    confidence = (best_score - second_score) / best_score if best_score else 0.0
+    if confidence < MIN_CONFIDENCE:
+        return None
+    return best, round(confidence, 3)
+
+
+def book_sample(chapters, title: str = '', limit: int = SAMPLE_CHARS) -> str:
+    """Plain-text sample spread evenly over the chapters."""
+    chapters = [ch for ch in (chapters or []) if isinstance(ch, dict) and ch.get('content')]
+    if not chapters:
+        return title or ''
+    count = min(len(chapters), max(1, limit // 1000))
+    picked = [chapters[i * len(chapters) // count] for i in range(count)]
+    per_chapter = limit // count
+    parts = [title or '']
+    for ch in picked:
+        parts.append(plain_text(ch['content'], per_chapter))
+    return ' '.join(parts)
+
+
+def detect_book_language(extracted_epub, chapters: Optional[List[Dict]] = None) -> str:
+    """
+    Detected language code of the book's content, or '' if undetermined.
+    Without chapters, only the sampled Chapter rows are loaded.
+    """
+    try:
+        if chapters is None:
+            total = extracted_epub.chapters.count()
+            count = min(total, max(1, SAMPLE_CHARS // 1000))
+            indexes = {i * total // count for i in range(count)} if count else set()
+            chapters = list(extracted_epub.chapters.filter(index__in=indexes).order_by('index').values('content'))
+        result = detect_language(book_sample(chapters, extracted_epub.title))
+    except Exception as e:
+        log.warning(f"[LangDetect] Falha ao detectar idioma do livro {extracted_epub.pk}: {e}")
+        return ''
+    if not result:
+        return ''
+    lang, confidence = result
+    log.info(f"[LangDetect] Livro {extracted_epub.pk}: idioma detectado '{lang}' (confiança {confidence:.2f})")
+    return lang
+
+
+def resolve_source_lang(extracted_epub, source_lang: str) -> str:
+    """
+    Replace 'auto' with the book's detected language, detecting it now for
+    books extracted before detection existed. Stays 'auto' if undetermined.
+    """
+    if source_lang and source_lang != 'auto':
+        return source_lang
+    if not extracted_epub.detected_lang:
+        detected = detect_book_language(extracted_epub)
+        if not detected:
+            return 'auto'
+        extracted_epub.detected_lang = detected
+        type(extracted_epub).objects.filter(pk=extracted_epub.pk).update(detected_lang=detected)
+    return extracted_epub.detected_lang
+
+
+def source_lang_candidates(extracted_epub, source_lang: str):
+    """Stored source languages that match a request, most specific first."""
+    resolved = resolve_source_lang(extracted_epub, source_lang)
+    return [resolved] if resolved == 'auto' or source_lang != 'auto' else [resolved, 'auto']
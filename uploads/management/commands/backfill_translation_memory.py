@@ -0,0 +1,69 @@
+from django.core.management.base import BaseCommand
+from typing import List, Tuple
+
+from uploads.chapters import chapter_dicts
+from uploads.models import TranslatedEpub
+from uploads.html_pipeline import text_segments
+from uploads import segment_masks, translation_memory
+
+
+def aligned_segments(original_html: str, translated_html: str) -> List[Tuple[str, str]]:
+    """Pares (original, tradução) dos segmentos (nós de texto e parágrafos com marcadores), apenas quando as duas árvores se alinham."""
+    original_nodes = [text.strip() for text in text_segments(original_html)]
+    translated_nodes = [text.strip() for text in text_segments(translated_html)]
+    if not original_nodes or len(original_nodes) != len(translated_nodes):
+        return []
+    # Gravados mascarados, como a tradução os procura; pares cujos números/nomes não batem ficam de fora
+    pairs = [segment_masks.mask_pair(o, t) for o, t in zip(original_nodes, translated_nodes) if o != t]
+    return [pair for pair in pairs if pair]
+
+
+class Command(BaseCommand):
+    help = 'Popula a memória de tradução a partir dos capítulos traduzidos existentes (TranslatedChapter).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Mostra quantos segmentos seriam gravados sem salvar')
+        parser.add_argument('--limit', type=int, default=None, help='Limite de traduções a processar')
+
+    def handle(self, *args, **options):
+        dry = options['dry_run']
+        limit = options.get('limit')
+
+        qs = TranslatedEpub.objects.select_related('extracted_epub').order_by('pk')
+        if limit:
+            qs = qs[:limit]
+
+        total_translations = 0
+        total_segments = 0
+        skipped_chapters = 0
+        for tr in qs.iterator():
+            source_chapters = {
+                ch['index']: ch for ch in chapter_dicts(tr.extracted_epub, fields=('index', 'title', 'content'))
+            }
+
+            pairs: List[Tuple[str, str]] = []
+            if tr.extracted_epub.title and tr.translated_title and tr.translated_title != tr.extracted_epub.title:
+                pairs.append(segment_masks.mask_pair(tr.extracted_epub.title, tr.translated_title))
+            for row in tr.chapters.filter(status='done').order_by('chapter_index'):
+                source = source_chapters.get(row.chapter_index)
+                if source is None:
+                    skipped_chapters += 1
+                    continue
+                if source.get('title') and row.title and source['title'] != row.title:
+                    pairs.append(segment_masks.mask_pair(source['title'], row.title))
+                chapter_pairs = aligned_segments(source.get('content', ''), row.content)
+                if not chapter_pairs:
+                    skipped_chapters += 1
+                pairs.extend(chapter_pairs)
+
+            pairs = [pair for pair in pairs if pair]
+            if pairs and not dry:
+                translation_memory.store(tr.source_lang, tr.target_lang, pairs)
+            total_segments += len(pairs)
+            total_translations += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Traduções processadas: {total_translations} | Segmentos: {total_segments} | Capítulos ignorados: {skipped_chapters}'
+        ))
+        if dry:
+            self.stdout.write('(dry-run) Nenhuma alteração salva.')
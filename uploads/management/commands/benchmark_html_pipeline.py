@@ -0,0 +1,144 @@
+import re
+import time
+import warnings
+from typing import Callable, List, Tuple
+
+import bleach
+from bs4 import BeautifulSoup, Comment
+from django.core.management.base import BaseCommand, CommandError
+
+from uploads.html_pipeline import (
+    ALLOWED_ATTRS, ALLOWED_TAGS, chapter_fields, iter_text_slots, parse_document, parse_fragment, render_skeleton
+)
+from uploads.models import ExtractedEpub
+from uploads.translation_utils import MAX_REQUEST_CHARS, build_batches
+
+
+def synthetic_chapter(paragraphs: int) -> str:
+    """Documento XHTML grande, no formato típico de um capítulo de EPUB."""
+    body = []
+    for i in range(paragraphs):
+        body.append(
+            f'<p class="p{i % 3}">Parágrafo {i} com <em>ênfase</em>, um <a href="ch{i}.xhtml#n{i}">link</a> '
+            f'e texto suficiente para parecer prosa de verdade. Segunda frase do parágrafo {i}.</p>'
+        )
+        if i % 50 == 0:
+            body.append(f'<h3>Seção {i}</h3><!-- marcador --><pre>codigo({i})</pre><br/>')
+    return (
+        '<?xml version="1.0" encoding="utf-8"?>\n<!DOCTYPE html>\n'
+        '<html xmlns="http://www.w3.org/1999/xhtml"><head><title>cap.xhtml</title>'
+        '<style>p { margin: 0 }</style></head><body><h1>Capítulo</h1>'
+        + ''.join(body) + '<script>track()</script></body></html>'
+    )
+
+
+def legacy_extract(raw: bytes) -> Tuple[str, str]:
+    """Caminho antigo da extração: um BeautifulSoup para o título (com cópia) e outro para sanitizar."""
+    soup_doc = BeautifulSoup(raw, 'html.parser')
+    title = ''
+    for tag_name in ['h1', 'h2', 'h3', 'h4', 'h5', 'h6']:
+        element = soup_doc.find(tag_name)
+        if element and element.get_text().strip():
+            title = element.get_text().strip()
+            break
+    content_copy = soup_doc.__copy__()
+    for tag in content_copy.find_all(['script', 'style', 'meta', 'link']):
+        tag.decompose()
+
+    tmp = re.sub(r'^\s*<\?xml[^>]*?>', '', raw.decode('utf-8'), flags=re.IGNORECASE)
+    tmp = re.sub(r'<!DOCTYPE[^>]*?>', '', tmp, flags=re.IGNORECASE)
+    soup = BeautifulSoup(tmp, 'html.parser')
+    for tag in soup.find_all(['script', 'iframe', 'object', 'embed', 'style']):
+        tag.decompose()
+    inner = ''.join(str(c) for c in soup.body.contents) if soup.body else str(soup)
+    inner = re.sub(r'^\s*<html[^>]*>', '', inner, flags=re.IGNORECASE)
+    inner = re.sub(r'</html>\s*$', '', inner, flags=re.IGNORECASE)
+    return inner.strip(), title
+
+
+def legacy_translate_pass(content: str) -> str:
+    """Caminho antigo do translate_html (sem provedor): BeautifulSoup, nós de texto e bleach.clean."""
+    soup = BeautifulSoup(content, 'html.parser')
+    elements = [
+        el for el in soup.find_all(string=True)
+        if not isinstance(el, Comment) and el.strip() and not any(p.name in ('pre', 'code') for p in el.parents)
+    ]
+    for el in elements:
+        el.replace_with(str(el).upper())
+    return bleach.clean(str(soup), tags=ALLOWED_TAGS, attributes=ALLOWED_ATTRS, strip=False)
+
+
+def pipeline_extract(raw: bytes) -> Tuple[str, str]:
+    document = parse_document(raw)
+    return document.html, document.title
+
+
+def pipeline_translate_pass(chapter: dict) -> str:
+    """Caminho novo: sem parse, só troca os textos nos slots do esqueleto gravado na extração."""
+    return render_skeleton(chapter['skeleton'], [text.upper() for text in chapter['texts']])
+
+
+def provider_requests(texts: List[str]) -> int:
+    return len(build_batches(texts, MAX_REQUEST_CHARS)) if texts else 0
+
+
+def best_of(fn: Callable, items: List, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for item in items:
+            fn(item)
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+class Command(BaseCommand):
+    help = 'Compara o pipeline HTML (lxml, um parse por documento, esqueleto de capítulo) com o caminho antigo (BeautifulSoup + bleach).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--paragraphs', type=int, default=3000, help='Parágrafos do capítulo sintético')
+        parser.add_argument('--repeat', type=int, default=5, help='Repetições; vale o melhor tempo')
+        parser.add_argument('--extracted-id', type=int, default=None,
+                            help='Usa os capítulos de um ExtractedEpub em vez do capítulo sintético')
+
+    def handle(self, *args, **options):
+        repeat = max(1, options['repeat'])
+        warnings.filterwarnings('ignore', module='bleach')
+        if options['extracted_id']:
+            try:
+                extracted = ExtractedEpub.objects.get(pk=options['extracted_id'])
+            except ExtractedEpub.DoesNotExist:
+                raise CommandError(f"ExtractedEpub {options['extracted_id']} não encontrado")
+            contents = list(extracted.chapters.values_list('content', flat=True))
+            documents = [f'<html><body>{c}</body></html>'.encode('utf-8') for c in contents]
+            skeletons = [chapter_fields(c) for c in contents]
+            label = f'livro {extracted.pk} ({len(documents)} capítulos)'
+        else:
+            documents = [synthetic_chapter(options['paragraphs']).encode('utf-8')]
+            document = parse_document(documents[0])
+            contents = [document.html]
+            skeletons = [{'skeleton': document.skeleton, 'texts': document.texts}]
+            label = f"capítulo sintético ({options['paragraphs']} parágrafos)"
+
+        size_kb = sum(len(d) for d in documents) / 1024
+        self.stdout.write(f'Entrada: {label}, {size_kb:.0f} KB, melhor de {repeat}')
+        rows = [
+            ('Extração (sanitização + título + esqueleto)', legacy_extract, documents, pipeline_extract, documents),
+            ('Tradução (remontagem do capítulo)', legacy_translate_pass, contents, pipeline_translate_pass, skeletons),
+        ]
+        for name, legacy, legacy_items, pipeline, items in rows:
+            old_ms = best_of(legacy, legacy_items, repeat)
+            new_ms = best_of(pipeline, items, repeat)
+            speedup = old_ms / new_ms if new_ms else float('inf')
+            self.stdout.write(f'{name}: antigo {old_ms:.1f} ms | pipeline {new_ms:.1f} ms | {speedup:.1f}x')
+
+        # Segments and requests sent to the provider: one per text node before, one per paragraph now
+        nodes = [
+            getattr(el, attr).strip() for content in contents
+            for el, attr, skipped in iter_text_slots(parse_fragment(content)) if not skipped
+        ]
+        units = [text for chapter in skeletons for text in chapter['texts']]
+        self.stdout.write(
+            f'Segmentos: {len(nodes)} nós de texto -> {len(units)} unidades | '
+            f'requisições ao provedor: {provider_requests(nodes)} -> {provider_requests(units)}'
+        )
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from uploads.models import Chapter
+from uploads.html_pipeline import chapter_fields
+
+
+class Command(BaseCommand):
+    help = 'Gera o esqueleto (HTML com slots numerados + lista de textos) dos capítulos extraídos antes do formato existir.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Mostra quantos capítulos seriam alterados sem salvar')
+        parser.add_argument('--limit', type=int, default=None, help='Limite de livros a processar')
+        parser.add_argument('--force', action='store_true', help='Regera também capítulos que já têm esqueleto')
+
+    def handle(self, *args, **options):
+        dry = options['dry_run']
+        force = options['force']
+        limit = options.get('limit')
+
+        qs = Chapter.objects.all() if force else Chapter.objects.filter(skeleton='')
+        book_ids = list(qs.order_by('extracted_epub_id').values_list('extracted_epub_id', flat=True).distinct())
+        if limit:
+            book_ids = book_ids[:limit]
+
+        total_chapters = 0
+        for row in qs.filter(extracted_epub_id__in=book_ids).only('pk', 'content').iterator():
+            fields = chapter_fields(row.content)
+            total_chapters += 1
+            if not dry:
+                # The stored content (and its hash) stays as is; only the skeleton is added
+                Chapter.objects.filter(pk=row.pk).update(
+                    skeleton=fields['skeleton'], texts=fields['texts'], skipped=fields['skipped']
+                )
+
+        self.stdout.write(self.style.SUCCESS(f'Livros alterados: {len(book_ids)} | Capítulos com esqueleto novo: {total_chapters}'))
+        if dry:
+            self.stdout.write('(dry-run) Nenhuma alteração salva.')
@@ -2,6 +2,7 @@
 from django.core.management.base import BaseCommand
 from django.contrib.auth.models import User
 from uploads.models import UploadedFile, ExtractedEpub, ReadingProgress
+from uploads.chapters import replace_chapters
 import json
 from datetime import datetime
 
@@ -95,11 +96,11 @@ class Command(BaseCommand):
                 defaults={
                     'title': book_data['title'],
                     'metadata': book_data['metadata'],
-                    'chapters': book_data['chapters']
                 }
             )
             
             if created:
+                replace_chapters(extracted_epub, book_data['chapters'])
                 self.stdout.write(f'Created extracted epub: {book_data["title"]}')
                 
                 # Create reading progress
@@ -1,5 +1,8 @@
 from django.core.management.base import BaseCommand
-from uploads.models import ExtractedEpub, TranslatedEpub
+from uploads.models import ExtractedEpub, TranslatedChapter
+from uploads.chapters import update_chapter
+from uploads.content_hashes import annotate_book, chapter_hash
+from uploads.html_pipeline import chapter_fields
 import bleach
 from typing import List, Dict
 
@@ -55,44 +58,44 @@ class Command(BaseCommand):
         samples: List[Dict[str, str]] = []
 
         # Processa ExtractedEpub
-        qs = ExtractedEpub.objects.exclude(chapters=None)
+        qs = ExtractedEpub.objects.filter(chapters__isnull=False).distinct().order_by('pk')
         if limit:
             qs = qs[:limit]
         for extracted in qs:
             changed = False
-            chapters = extracted.chapters or []
-            for ch in chapters:
-                content = ch.get('content') or ''
+            for row in extracted.chapters.all():
+                content = row.content or ''
                 if needs_normalization(content):
-                    before = content
-                    ch['content'] = normalize_plain_text(content)
+                    # The skeleton is rebuilt together with the content
+                    fields = chapter_fields(normalize_plain_text(content))
                     changed = True
                     total_changed += 1
                     if len(samples) < sample:
-                        samples.append({'type': 'extracted', 'id': extracted.id, 'before': before[:400], 'after': ch['content'][:400]})
+                        samples.append({'type': 'extracted', 'id': extracted.id, 'before': content[:400], 'after': fields['content'][:400]})
+                    if not dry:
+                        update_chapter(row, **fields)
                 total_checked += 1
             if changed and not dry:
-                extracted.save(update_fields=['chapters'])
+                # Chapter hashes changed, so does the book's
+                annotate_book(extracted)
+                extracted.save(update_fields=['content_hash'])
 
-        # Processa TranslatedEpub
-        tqs = TranslatedEpub.objects.exclude(translated_chapters=None)
+        # Processa os capítulos traduzidos (um registro por capítulo)
+        tqs = TranslatedChapter.objects.filter(status='done').order_by('pk')
         if limit:
             tqs = tqs[:limit]
-        for tr in tqs:
-            changed = False
-            chapters = tr.translated_chapters or []
-            for ch in chapters:
-                content = ch.get('content') or ''
-                if needs_normalization(content):
-                    before = content
-                    ch['content'] = normalize_plain_text(content)
-                    changed = True
-                    total_changed += 1
-                    if len(samples) < sample:
-                        samples.append({'type': 'translated', 'id': tr.id, 'before': before[:400], 'after': ch['content'][:400]})
-                total_checked += 1
-            if changed and not dry:
-                tr.save(update_fields=['translated_chapters'])
+        for row in tqs.iterator():
+            content = row.content or ''
+            if needs_normalization(content):
+                before = content
+                row.content = normalize_plain_text(content)
+                row.content_hash = chapter_hash(row.content)
+                total_changed += 1
+                if len(samples) < sample:
+                    samples.append({'type': 'translated', 'id': row.translation_id, 'before': before[:400], 'after': row.content[:400]})
+                if not dry:
+                    row.save(update_fields=['content', 'content_hash'])
+            total_checked += 1
 
         self.stdout.write(self.style.SUCCESS(f'Verificados capítulos: {total_checked} | Alterados: {total_changed}'))
         if dry:
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('uploads', '0008_uploadedfile_debug_id_alter_auditlog_action'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TranslationMemory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source_lang', models.CharField(max_length=10)),
+                ('target_lang', models.CharField(max_length=10)),
+                ('segment_hash', models.CharField(max_length=64)),
+                ('source_text', models.TextField()),
+                ('translated_text', models.TextField()),
+                ('hit_count', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['last_used_at'], name='uploads_tra_last_us_2e75e6_idx')],
+                'unique_together': {('source_lang', 'target_lang', 'segment_hash')},
+            },
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:22
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('uploads', '0009_translationmemory'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TranslationJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source_lang', models.CharField(default='auto', max_length=10)),
+                ('target_lang', models.CharField(default='pt', max_length=10)),
+                ('chapter_index', models.IntegerField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='queued', max_length=20)),
+                ('total_chapters', models.IntegerField(default=0)),
+                ('completed_chapters', models.IntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('extracted_epub', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='translation_jobs', to='uploads.extractedepub')),
+                ('translation', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='jobs', to='uploads.translatedepub')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='TranslationCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chapter_index', models.IntegerField()),
+                ('status', models.CharField(choices=[('done', 'Done'), ('failed', 'Failed')], default='done', max_length=10)),
+                ('content', models.TextField(blank=True)),
+                ('text_nodes', models.IntegerField(default=0)),
+                ('duration_ms', models.IntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='checkpoints', to='uploads.translationjob')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='translationjob',
+            index=models.Index(fields=['extracted_epub', 'source_lang', 'target_lang', 'status'], name='uploads_tra_extract_a04213_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='translationjob',
+            index=models.Index(fields=['user', 'status'], name='uploads_tra_user_id_8db3f0_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='translationcheckpoint',
+            unique_together={('job', 'chapter_index')},
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('uploads', '0010_translationjob_translationcheckpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='translationjob',
+            name='task_id',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('uploads', '0011_translationjob_task_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='translationcheckpoint',
+            name='stats',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('uploads', '0012_translationcheckpoint_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='extractedepub',
+            name='detected_lang',
+            field=models.CharField(blank=True, default='', max_length=10),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('uploads', '0013_extractedepub_detected_lang'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='translationcheckpoint',
+            name='segments',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='translationcheckpoint',
+            name='source_hash',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('uploads', '0014_translationcheckpoint_source_hash_segments'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='translationcheckpoint',
+            name='telemetry',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='translationjob',
+            name='telemetry',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
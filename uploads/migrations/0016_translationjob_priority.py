@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:31
+
+from django.db import migrations, models
+
+
+def mark_chapter_jobs_interactive(apps, schema_editor):
+    TranslationJob = apps.get_model('uploads', 'TranslationJob')
+    TranslationJob.objects.filter(chapter_index__isnull=False).update(priority='interactive')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('uploads', '0015_translation_telemetry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='translationjob',
+            name='priority',
+            field=models.CharField(choices=[('interactive', 'Interactive'), ('bulk', 'Bulk')], default='bulk', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='translationjob',
+            index=models.Index(fields=['priority', 'status'], name='uploads_tra_priorit_8382ee_idx'),
+        ),
+        migrations.RunPython(mark_chapter_jobs_interactive, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('uploads', '0016_translationjob_priority'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='translationjob',
+            name='priority',
+            field=models.CharField(choices=[('interactive', 'Interactive'), ('bulk', 'Bulk'), ('prefetch', 'Prefetch')], default='bulk', max_length=20),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:41
+
+from django.db import migrations, models
+
+
+def schedule_active_fanout_jobs(apps, schema_editor):
+    # Full-book jobs fanned out before the scheduler existed are finished by it
+    TranslationJob = apps.get_model('uploads', 'TranslationJob')
+    TranslationJob.objects.filter(
+        chapter_index__isnull=True, status__in=('queued', 'running'), total_chapters__gte=2
+    ).update(scheduled=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('uploads', '0017_translationjob_prefetch_priority'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='translationcheckpoint',
+            name='leased_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='translationjob',
+            name='dispatched_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='translationjob',
+            name='scheduled',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AlterField(
+            model_name='translationcheckpoint',
+            name='status',
+            field=models.CharField(choices=[('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='done', max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='translationjob',
+            index=models.Index(fields=['scheduled', 'status'], name='uploads_tra_schedul_3f5e40_idx'),
+        ),
+        migrations.RunPython(schedule_active_fanout_jobs, migrations.RunPython.noop),
+    ]
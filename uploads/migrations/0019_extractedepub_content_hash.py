@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:43
+
+from django.db import migrations, models
+
+
+def hash_existing_books(apps, schema_editor):
+    from uploads.content_hashes import book_content_hash
+
+    ExtractedEpub = apps.get_model('uploads', 'ExtractedEpub')
+    for extracted in ExtractedEpub.objects.exclude(chapters=None).only('pk', 'title', 'metadata', 'chapters').iterator():
+        ExtractedEpub.objects.filter(pk=extracted.pk).update(
+            content_hash=book_content_hash(extracted.title, extracted.metadata, extracted.chapters)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('uploads', '0018_translation_scheduler'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='extractedepub',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=64),
+        ),
+        migrations.RunPython(hash_existing_books, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,91 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:49
+
+from django.db import migrations, models
+import django.db.models.deletion
+import hashlib
+
+
+def split_translated_chapters(apps, schema_editor):
+    """One TranslatedChapter per chapter of every translation blob; newer translations win."""
+    TranslatedEpub = apps.get_model('uploads', 'TranslatedEpub')
+    TranslatedChapter = apps.get_model('uploads', 'TranslatedChapter')
+    translations = TranslatedEpub.objects.exclude(translated_chapters=None).order_by('translated_at', 'pk')
+    for translation in translations.iterator():
+        chapters = translation.translated_chapters if isinstance(translation.translated_chapters, list) else []
+        if translation.chapter_index is not None:
+            chapters = [(translation.chapter_index, chapters[0])] if chapters else []
+        else:
+            chapters = list(enumerate(chapters))
+        for idx, chapter in chapters:
+            if not isinstance(chapter, dict):
+                continue
+            content = chapter.get('content') or ''
+            TranslatedChapter.objects.update_or_create(
+                extracted_epub_id=translation.extracted_epub_id,
+                source_lang=translation.source_lang,
+                target_lang=translation.target_lang,
+                chapter_index=idx,
+                defaults={
+                    'translation': translation,
+                    'status': 'done',
+                    'title': chapter.get('title') or '',
+                    'content': content,
+                    'content_hash': hashlib.sha256(content.encode('utf-8')).hexdigest(),
+                    'source_hash': chapter.get('source_hash') or '',
+                    'segments': chapter.get('segments') or {},
+                },
+            )
+
+
+def join_translated_chapters(apps, schema_editor):
+    TranslatedEpub = apps.get_model('uploads', 'TranslatedEpub')
+    TranslatedChapter = apps.get_model('uploads', 'TranslatedChapter')
+    for translation in TranslatedEpub.objects.iterator():
+        rows = TranslatedChapter.objects.filter(
+            extracted_epub_id=translation.extracted_epub_id, source_lang=translation.source_lang,
+            target_lang=translation.target_lang, status='done'
+        ).order_by('chapter_index')
+        if translation.chapter_index is not None:
+            rows = rows.filter(chapter_index=translation.chapter_index)
+        translation.translated_chapters = [
+            {'title': row.title, 'content': row.content, 'source_hash': row.source_hash, 'segments': row.segments}
+            for row in rows
+        ]
+        translation.save(update_fields=['translated_chapters'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('uploads', '0019_extractedepub_content_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TranslatedChapter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source_lang', models.CharField(default='auto', max_length=10)),
+                ('target_lang', models.CharField(default='pt', max_length=10)),
+                ('chapter_index', models.IntegerField()),
+                ('status', models.CharField(choices=[('done', 'Done'), ('failed', 'Failed')], default='done', max_length=10)),
+                ('title', models.TextField(blank=True)),
+                ('content', models.TextField(blank=True)),
+                ('content_hash', models.CharField(blank=True, max_length=64)),
+                ('source_hash', models.CharField(blank=True, max_length=64)),
+                ('segments', models.JSONField(blank=True, default=dict)),
+                ('translated_at', models.DateTimeField(auto_now=True)),
+                ('extracted_epub', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='translated_chapters', to='uploads.extractedepub')),
+                ('translation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chapters', to='uploads.translatedepub')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['extracted_epub', 'target_lang', 'status'], name='uploads_tra_extract_cbb586_idx')],
+                'unique_together': {('extracted_epub', 'source_lang', 'target_lang', 'chapter_index')},
+            },
+        ),
+        migrations.RunPython(split_translated_chapters, join_translated_chapters),
+        migrations.RemoveField(
+            model_name='translatedepub',
+            name='translated_chapters',
+        ),
+    ]
@@ -0,0 +1,95 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:53
+
+from django.db import migrations, models
+import django.db.models.deletion
+import hashlib
+import re
+
+_TAG = re.compile(r'<[^>]+>')
+
+
+def _word_count(chapter):
+    texts = chapter.get('texts')
+    if isinstance(texts, list):
+        return sum(len(str(text).split()) for text in texts)
+    return len(_TAG.sub(' ', chapter.get('content') or '').split())
+
+
+def split_chapters(apps, schema_editor):
+    """One Chapter row per element of the chapters JSON of every book."""
+    ExtractedEpub = apps.get_model('uploads', 'ExtractedEpub')
+    Chapter = apps.get_model('uploads', 'Chapter')
+    books = ExtractedEpub.objects.exclude(chapters_json=None).only('pk', 'chapters_json')
+    for extracted in books.iterator():
+        rows = []
+        chapters = extracted.chapters_json if isinstance(extracted.chapters_json, list) else []
+        for index, chapter in enumerate(chapters):
+            chapter = chapter if isinstance(chapter, dict) else {}
+            content = chapter.get('content') or ''
+            rows.append(Chapter(
+                extracted_epub_id=extracted.pk,
+                index=index,
+                title=chapter.get('title') or '',
+                content=content,
+                size=len(content),
+                word_count=_word_count(chapter),
+                hash=chapter.get('hash') or hashlib.sha256(content.encode('utf-8')).hexdigest(),
+                skeleton=chapter.get('skeleton') or '',
+                texts=chapter.get('texts') or [],
+                skipped=chapter.get('skipped') or {},
+            ))
+        Chapter.objects.bulk_create(rows, batch_size=200)
+
+
+def join_chapters(apps, schema_editor):
+    ExtractedEpub = apps.get_model('uploads', 'ExtractedEpub')
+    Chapter = apps.get_model('uploads', 'Chapter')
+    for extracted in ExtractedEpub.objects.only('pk').iterator():
+        chapters = []
+        for row in Chapter.objects.filter(extracted_epub_id=extracted.pk).order_by('index'):
+            chapter = {'title': row.title, 'content': row.content, 'hash': row.hash}
+            if row.skeleton:
+                chapter.update({'skeleton': row.skeleton, 'texts': row.texts, 'skipped': row.skipped})
+            chapters.append(chapter)
+        ExtractedEpub.objects.filter(pk=extracted.pk).update(chapters_json=chapters or None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('uploads', '0020_translatedchapter'),
+    ]
+
+    operations = [
+        # The JSON column moves aside so that extracted.chapters can name the new rows
+        migrations.RenameField(
+            model_name='extractedepub',
+            old_name='chapters',
+            new_name='chapters_json',
+        ),
+        migrations.CreateModel(
+            name='Chapter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.IntegerField()),
+                ('title', models.TextField(blank=True)),
+                ('content', models.TextField(blank=True)),
+                ('size', models.IntegerField(default=0)),
+                ('word_count', models.IntegerField(default=0)),
+                ('hash', models.CharField(blank=True, max_length=64)),
+                ('skeleton', models.TextField(blank=True)),
+                ('texts', models.JSONField(blank=True, default=list)),
+                ('skipped', models.JSONField(blank=True, default=dict)),
+                ('extracted_epub', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chapters', to='uploads.extractedepub')),
+            ],
+            options={
+                'ordering': ['index'],
+                'unique_together': {('extracted_epub', 'index')},
+            },
+        ),
+        migrations.RunPython(split_chapters, join_chapters),
+        migrations.RemoveField(
+            model_name='extractedepub',
+            name='chapters_json',
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('uploads', '0022_single_flight_idempotency'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='translationjob',
+            name='group_key',
+            field=models.CharField(blank=True, db_index=True, max_length=32),
+        ),
+    ]
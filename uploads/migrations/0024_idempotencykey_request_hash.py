@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 09:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('uploads', '0023_translationjob_group_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='idempotencykey',
+            name='request_hash',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
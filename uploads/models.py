@@ -1,3 +1,4 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 
 class UploadedFile(models.Model):
@@ -14,21 +15,45 @@ class ExtractedEpub(models.Model):
     uploaded_file = models.OneToOneField(UploadedFile, on_delete=models.CASCADE)
     title = models.CharField(max_length=255, blank=True)
     metadata = models.JSONField(blank=True, null=True)
-    chapters = models.JSONField(blank=True, null=True)
+    # Chapter contents live in Chapter rows (extracted.chapters)
     images = models.JSONField(blank=True, null=True)
     cover_image = models.CharField(max_length=500, blank=True, null=True)
+    detected_lang = models.CharField(max_length=10, blank=True, default='')
+    # Hash of everything that gets translated; identical books share finished translations
+    content_hash = models.CharField(max_length=64, blank=True, default='', db_index=True)
     extracted_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return f"Extracted: {self.title}"
 
+class Chapter(models.Model):
+    extracted_epub = models.ForeignKey(ExtractedEpub, on_delete=models.CASCADE, related_name='chapters')
+    index = models.IntegerField()
+    title = models.TextField(blank=True)
+    content = models.TextField(blank=True)
+    size = models.IntegerField(default=0)
+    word_count = models.IntegerField(default=0)
+    hash = models.CharField(max_length=64, blank=True)
+    # Skeleton with numbered text slots and its texts (see html_pipeline)
+    skeleton = models.TextField(blank=True)
+    texts = models.JSONField(default=list, blank=True)
+    skipped = models.JSONField(default=dict, blank=True)
+
+    class Meta:
+        ordering = ['index']
+        unique_together = ('extracted_epub', 'index')
+
+    def __str__(self):
+        return f"Chapter {self.index}: {self.title}"
+
+
 class TranslatedEpub(models.Model):
     extracted_epub = models.ForeignKey(ExtractedEpub, on_delete=models.CASCADE, related_name='translations')
     source_lang = models.CharField(max_length=10, default='auto')
     target_lang = models.CharField(max_length=10, default='pt')
     translated_title = models.CharField(max_length=255, blank=True)
     translated_metadata = models.JSONField(blank=True, null=True)
-    translated_chapters = models.JSONField(blank=True, null=True) 
+    # Chapter contents live in TranslatedChapter rows of the same book and language pair
     chapter_index = models.IntegerField(null=True, blank=True)
     translated_at = models.DateTimeField(auto_now_add=True)
 
@@ -40,6 +65,36 @@ class TranslatedEpub(models.Model):
             return f"Translated Chapter {self.chapter_index}: {self.translated_title}"
         return f"Translated: {self.translated_title}"
 
+class TranslatedChapter(models.Model):
+    STATUS_CHOICES = [
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    extracted_epub = models.ForeignKey(ExtractedEpub, on_delete=models.CASCADE, related_name='translated_chapters')
+    source_lang = models.CharField(max_length=10, default='auto')
+    target_lang = models.CharField(max_length=10, default='pt')
+    chapter_index = models.IntegerField()
+    # The translation that last wrote the chapter
+    translation = models.ForeignKey(TranslatedEpub, on_delete=models.CASCADE, related_name='chapters')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='done')
+    title = models.TextField(blank=True)
+    content = models.TextField(blank=True)
+    content_hash = models.CharField(max_length=64, blank=True)
+    source_hash = models.CharField(max_length=64, blank=True)
+    segments = models.JSONField(default=dict, blank=True)
+    translated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('extracted_epub', 'source_lang', 'target_lang', 'chapter_index')
+        indexes = [
+            models.Index(fields=['extracted_epub', 'target_lang', 'status']),
+        ]
+
+    def __str__(self):
+        return f"Translated chapter {self.chapter_index} ({self.source_lang}->{self.target_lang}) {self.status}"
+
+
 class ReadingProgress(models.Model):
     user = models.ForeignKey('auth.User', on_delete=models.CASCADE)
     extracted_epub = models.ForeignKey(ExtractedEpub, on_delete=models.CASCADE)
@@ -112,3 +167,134 @@ class ReaderPreference(models.Model):
 
     def __str__(self):
         return f"ReaderPreference({self.user.username}) v{self.version}"
+
+
+class TranslationMemory(models.Model):
+    source_lang = models.CharField(max_length=10)
+    target_lang = models.CharField(max_length=10)
+    segment_hash = models.CharField(max_length=64)
+    source_text = models.TextField()
+    translated_text = models.TextField()
+    hit_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('source_lang', 'target_lang', 'segment_hash')
+        indexes = [
+            models.Index(fields=['last_used_at']),
+        ]
+
+    def __str__(self):
+        return f"TM {self.source_lang}->{self.target_lang} {self.segment_hash[:12]}"
+
+
+class TranslationJob(models.Model):
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    PRIORITY_CHOICES = [
+        ('interactive', 'Interactive'),
+        ('bulk', 'Bulk'),
+        ('prefetch', 'Prefetch'),
+    ]
+
+    user = models.ForeignKey('auth.User', on_delete=models.CASCADE, null=True, blank=True)
+    extracted_epub = models.ForeignKey(ExtractedEpub, on_delete=models.CASCADE, related_name='translation_jobs')
+    source_lang = models.CharField(max_length=10, default='auto')
+    target_lang = models.CharField(max_length=10, default='pt')
+    chapter_index = models.IntegerField(null=True, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    priority = models.CharField(max_length=20, choices=PRIORITY_CHOICES, default='bulk')
+    total_chapters = models.IntegerField(default=0)
+    completed_chapters = models.IntegerField(default=0)
+    translation = models.ForeignKey(TranslatedEpub, on_delete=models.SET_NULL, null=True, blank=True, related_name='jobs')
+    task_id = models.CharField(max_length=255, blank=True)
+    # Full-book jobs whose chapters are handed out by the fair-share scheduler
+    scheduled = models.BooleanField(default=False)
+    dispatched_at = models.DateTimeField(null=True, blank=True)
+    # Multi-target jobs scheduled together: each chapter is claimed once for all of them
+    group_key = models.CharField(max_length=32, blank=True, db_index=True)
+    telemetry = models.JSONField(default=dict, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['extracted_epub', 'source_lang', 'target_lang', 'status']),
+            models.Index(fields=['user', 'status']),
+            models.Index(fields=['priority', 'status']),
+            models.Index(fields=['scheduled', 'status']),
+        ]
+
+    def __str__(self):
+        return f"TranslationJob {self.pk} ({self.source_lang}->{self.target_lang}) {self.status}"
+
+
+class TranslationCheckpoint(models.Model):
+    STATUS_CHOICES = [
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    job = models.ForeignKey(TranslationJob, on_delete=models.CASCADE, related_name='checkpoints')
+    chapter_index = models.IntegerField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='done')
+    content = models.TextField(blank=True)
+    text_nodes = models.IntegerField(default=0)
+    duration_ms = models.IntegerField(default=0)
+    stats = models.JSONField(default=dict, blank=True)
+    source_hash = models.CharField(max_length=64, blank=True)
+    segments = models.JSONField(default=dict, blank=True)
+    telemetry = models.JSONField(default=dict, blank=True)
+    error = models.TextField(blank=True)
+    # Set while the chapter is 'running': a lease that expires if the worker is lost
+    leased_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('job', 'chapter_index')
+
+    def __str__(self):
+        return f"Checkpoint job={self.job_id} chapter={self.chapter_index} {self.status}"
+
+
+class SingleFlightLock(models.Model):
+    """Lease held while a piece of expensive work runs (see single_flight)."""
+    key = models.CharField(max_length=255, unique=True)
+    owner = models.CharField(max_length=64)
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"SingleFlightLock {self.key} until {self.expires_at}"
+
+
+class IdempotencyKey(models.Model):
+    """Response stored for a POST sent with an Idempotency-Key header, replayed to client retries."""
+    user = models.ForeignKey('auth.User', on_delete=models.CASCADE, related_name='idempotency_keys')
+    key = models.CharField(max_length=255)
+    # Method and path the key was first used with
+    scope = models.CharField(max_length=255)
+    # SHA-256 of the request body (see idempotency.fingerprint)
+    request_hash = models.CharField(max_length=64, blank=True)
+    status_code = models.IntegerField()
+    response = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('user', 'key')
+        indexes = [
+            models.Index(fields=['created_at']),
+        ]
+
+    def __str__(self):
+        return f"IdempotencyKey {self.key} ({self.scope}) -> {self.status_code}"
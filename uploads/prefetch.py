@@ -0,0 +1,120 @@
+"""
+Predictive prefetch: when a reader moves forward in a book that is being
+read in translation, the next chapters are translated ahead of time as
+low-priority single-chapter jobs.
+
+The active language pair is the target sent with the progress update or,
+failing that, the one of the user's latest translation of the book. Each
+user has a cap on prefetch jobs in flight and a daily budget of chapters.
+"""
+import logging
+from datetime import timedelta
+from typing import List, Optional, Tuple
+
+from django.conf import settings
+from django.utils import timezone
+
+from .langdetect_utils import SUPPORTED_LANGUAGES, resolve_source_lang
+from .models import TranslatedChapter, TranslatedEpub, TranslationJob
+from .translation_jobs import get_or_create_job
+from .translation_queues import PREFETCH, task_options
+
+log = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ('queued', 'running')
+
+
+def is_enabled() -> bool:
+    return getattr(settings, 'TRANSLATION_PREFETCH_ENABLED', True)
+
+
+def active_language_pair(user, extracted, target_lang: Optional[str] = None) -> Optional[Tuple[str, str]]:
+    """(source_lang, target_lang) the user is reading the book in, or None if they read the original."""
+    target_lang = (target_lang or '').strip()
+    if target_lang and target_lang != 'auto':
+        if target_lang not in SUPPORTED_LANGUAGES:
+            log.info(f"[Prefetch] Idioma de destino inválido ignorado: {target_lang}")
+            return None
+        return resolve_source_lang(extracted, 'auto'), target_lang
+    job = TranslationJob.objects.filter(extracted_epub=extracted, user=user).order_by('-created_at').first()
+    if job:
+        return job.source_lang, job.target_lang
+    translation = TranslatedEpub.objects.filter(extracted_epub=extracted).order_by('-translated_at').first()
+    if translation:
+        return resolve_source_lang(extracted, translation.source_lang), translation.target_lang
+    return None
+
+
+def untranslated_chapters(extracted, source_lang: str, target_lang: str, indexes: List[int]) -> List[int]:
+    """
+    Indexes without a translation and without a translation job on the way.
+    Chapters whose last job failed are left for the reader to request, rather
+    than retried by every progress update.
+    """
+    if not indexes:
+        return []
+    jobs = TranslationJob.objects.filter(extracted_epub=extracted, source_lang=source_lang, target_lang=target_lang)
+    if jobs.filter(chapter_index__isnull=True, status__in=ACTIVE_STATUSES).exists():
+        return []
+    jobs = jobs.filter(status__in=ACTIVE_STATUSES + ('failed',))
+    # Chapters stored under the legacy 'auto' source also count
+    covered = set(TranslatedChapter.objects.filter(
+        extracted_epub=extracted, source_lang__in=[source_lang, 'auto'], target_lang=target_lang,
+        chapter_index__in=indexes, status='done'
+    ).values_list('chapter_index', flat=True))
+    covered |= set(jobs.filter(chapter_index__in=indexes).values_list('chapter_index', flat=True))
+    return [idx for idx in indexes if idx not in covered]
+
+
+def remaining_budget(user) -> int:
+    """Chapters the user may still have prefetched right now."""
+    prefetch_jobs = TranslationJob.objects.filter(user=user, priority=PREFETCH)
+    in_flight = prefetch_jobs.filter(status__in=ACTIVE_STATUSES).count()
+    today = prefetch_jobs.filter(created_at__gte=timezone.now() - timedelta(days=1)).count()
+    max_in_flight = getattr(settings, 'TRANSLATION_PREFETCH_MAX_IN_FLIGHT', 4)
+    daily = getattr(settings, 'TRANSLATION_PREFETCH_DAILY_CHAPTERS', 100)
+    return max(0, min(max_in_flight - in_flight, daily - today))
+
+
+def prefetch_after_progress(user, extracted, previous_chapter: Optional[int], current_chapter: int,
+                            target_lang: Optional[str] = None) -> List[int]:
+    """
+    Enqueue translation of the next chapters after a progress update.
+    Returns the chapter indexes that were enqueued. Never raises: saving
+    progress must not fail because of prefetching.
+    """
+    if not is_enabled():
+        return []
+    try:
+        current_chapter = int(current_chapter)
+        if previous_chapter is not None and current_chapter <= previous_chapter:
+            return []
+        pair = active_language_pair(user, extracted, target_lang)
+        if not pair:
+            return []
+        source_lang, target_lang = pair
+        count = getattr(settings, 'TRANSLATION_PREFETCH_CHAPTERS', 2)
+        total = extracted.chapters.count()
+        upcoming = [idx for idx in range(current_chapter + 1, current_chapter + 1 + count) if idx < total]
+        candidates = untranslated_chapters(extracted, source_lang, target_lang, upcoming)
+        candidates = candidates[:remaining_budget(user)]
+
+        from .tasks import translate_epub_task
+        enqueued = []
+        for idx in candidates:
+            job = get_or_create_job(extracted, source_lang, target_lang, idx, user.pk, priority=PREFETCH)
+            if job.priority != PREFETCH or job.status != 'queued':
+                # A request of the reader created the job meanwhile; it is queued on its own
+                continue
+            result = translate_epub_task.apply_async(
+                args=(extracted.pk, source_lang, target_lang, idx, user.pk, job.pk), **task_options(job)
+            )
+            job.task_id = result.id or ''
+            job.save(update_fields=['task_id', 'updated_at'])
+            enqueued.append(idx)
+        if enqueued:
+            log.info(f"[Prefetch] Livro {extracted.pk}: capítulos {enqueued} enfileirados ({source_lang}->{target_lang})")
+        return enqueued
+    except Exception as e:
+        log.warning(f"[Prefetch] Falha ao enfileirar pré-tradução do livro {extracted.pk}: {e}")
+        return []
@@ -0,0 +1,327 @@
+"""
+Cluster-wide pacing of translation provider calls.
+
+Every provider call made by translate_with_retry goes through three gates:
+- a circuit breaker shared by all workers: after TRANSLATION_BREAKER_THRESHOLD
+  consecutive throttled/failed calls it opens for
+  TRANSLATION_BREAKER_COOLDOWN_SECONDS and every worker waits instead of
+  sending; calls that still fail after it reopen it straight away;
+- a token bucket of TRANSLATION_PROVIDER_RATE requests per second (burst
+  TRANSLATION_PROVIDER_BURST) shared by all workers;
+- an AIMD concurrency limit per process: it grows by one call per window of
+  successful calls and halves on a 429/5xx, so workers settle just under the
+  rate the provider accepts instead of retrying in lockstep.
+
+Each provider (translation backend) has its own gates, so several
+providers add up their limits. Rate, burst and concurrency can be set per
+provider in TRANSLATION_BACKEND_OPTIONS, as can a daily character quota
+that the router (translation_backends) reads to steer traffic away from a
+provider about to run out.
+
+The shared state lives in Redis (TRANSLATION_LIMITER_REDIS_URL); without
+Redis, or when it fails, each process falls back to its own in-memory
+bucket, breaker and quota counter.
+"""
+import logging
+import os
+import threading
+import time
+from datetime import date
+from typing import Dict, Optional
+
+import requests
+from deep_translator.exceptions import RequestError, TooManyRequests
+from django.conf import settings
+
+log = logging.getLogger(__name__)
+
+KEY_PREFIX = 'translation:provider'
+DEFAULT_PROVIDER = 'google'
+
+# Atomic refill-and-take on a Redis hash {tokens, ts}; returns the seconds to wait (0 when a token was taken)
+_TAKE_TOKEN = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 60)
+return tostring(wait)
+"""
+
+
+class ProviderUnavailable(Exception):
+    """The circuit breaker stayed open longer than callers are willing to wait."""
+
+
+def is_throttle(error: Exception) -> bool:
+    """429 from the provider."""
+    return isinstance(error, TooManyRequests)
+
+
+def is_provider_failure(error: Exception) -> bool:
+    """Errors that say the provider is overloaded or down (429, 5xx, timeouts), as opposed to a bad input."""
+    return isinstance(error, (TooManyRequests, RequestError, requests.RequestException))
+
+
+def _setting(name: str, default):
+    return getattr(settings, name, default)
+
+
+def backend_option(name: str, key: str, default=None):
+    """A per-provider option from TRANSLATION_BACKEND_OPTIONS ({"name": {"rate": 2, ...}})."""
+    options = (_setting('TRANSLATION_BACKEND_OPTIONS', {}) or {}).get(name) or {}
+    value = options.get(key)
+    return default if value is None else value
+
+
+class _LocalState:
+    """In-memory token bucket and breaker of one process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tokens: Optional[float] = None
+        self._ts = time.monotonic()
+        self._failures = 0
+        self._open_until = 0.0
+        self._quota: Dict[str, int] = {}
+
+    def take_token(self, rate: float, burst: float) -> float:
+        with self._lock:
+            now = time.monotonic()
+            tokens = burst if self._tokens is None else self._tokens
+            tokens = min(burst, tokens + (now - self._ts) * rate)
+            self._ts = now
+            if tokens >= 1:
+                self._tokens = tokens - 1
+                return 0.0
+            self._tokens = tokens
+            return (1 - tokens) / rate
+
+    def open_for(self) -> float:
+        with self._lock:
+            return max(0.0, self._open_until - time.time())
+
+    def failure(self, threshold: int, cooldown: float) -> bool:
+        with self._lock:
+            self._failures += 1
+            if self._failures >= threshold:
+                self._open_until = time.time() + cooldown
+                return True
+            return False
+
+    def success(self) -> None:
+        with self._lock:
+            self._failures = 0
+
+    def use_quota(self, day: str, chars: int) -> int:
+        with self._lock:
+            self._quota = {day: self._quota.get(day, 0) + chars}
+            return self._quota[day]
+
+    def quota_used(self, day: str) -> int:
+        with self._lock:
+            return self._quota.get(day, 0)
+
+
+class _RedisState:
+    """Token bucket and breaker shared by every worker through Redis."""
+
+    def __init__(self, client, name: str):
+        self._client = client
+        self._bucket = f'{KEY_PREFIX}:{name}:bucket'
+        self._failures = f'{KEY_PREFIX}:{name}:failures'
+        self._open_until = f'{KEY_PREFIX}:{name}:open_until'
+        self._quota = f'{KEY_PREFIX}:{name}:quota'
+        self._take = client.register_script(_TAKE_TOKEN)
+
+    def take_token(self, rate: float, burst: float) -> float:
+        return float(self._take(keys=[self._bucket], args=[rate, burst]))
+
+    def open_for(self) -> float:
+        until = self._client.get(self._open_until)
+        return max(0.0, float(until) - time.time()) if until else 0.0
+
+    def failure(self, threshold: int, cooldown: float) -> bool:
+        pipe = self._client.pipeline()
+        pipe.incr(self._failures)
+        pipe.expire(self._failures, int(cooldown) * 4 + 60)
+        failures = pipe.execute()[0]
+        if failures >= threshold:
+            self._client.set(self._open_until, str(time.time() + cooldown), ex=int(cooldown) + 1)
+            return True
+        return False
+
+    def success(self) -> None:
+        self._client.delete(self._failures)
+
+    def use_quota(self, day: str, chars: int) -> int:
+        pipe = self._client.pipeline()
+        pipe.incrby(f'{self._quota}:{day}', chars)
+        pipe.expire(f'{self._quota}:{day}', 2 * 86400)
+        return int(pipe.execute()[0])
+
+    def quota_used(self, day: str) -> int:
+        return int(self._client.get(f'{self._quota}:{day}') or 0)
+
+
+class ProviderLimiter:
+    """The gates of one provider in this process; see the module docstring."""
+
+    def __init__(self, name: str = DEFAULT_PROVIDER, redis_client=None):
+        self.name = name
+        self._local = _LocalState()
+        self._shared = _RedisState(redis_client, name) if redis_client is not None else None
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self.limit = float(self.max_concurrency())
+        self._last_decrease = 0.0
+
+    # --- settings --------------------------------------------------------
+
+    def max_concurrency(self) -> int:
+        limit = backend_option(self.name, 'max_concurrency', _setting('TRANSLATION_PROVIDER_MAX_CONCURRENCY', 0))
+        return max(1, limit or _setting('TRANSLATION_MAX_WORKERS', 4))
+
+    def rate(self) -> float:
+        return float(backend_option(self.name, 'rate', _setting('TRANSLATION_PROVIDER_RATE', 0)) or 0)
+
+    def burst(self) -> float:
+        return max(1.0, float(backend_option(self.name, 'burst', _setting('TRANSLATION_PROVIDER_BURST', 10))))
+
+    def daily_chars(self) -> int:
+        return int(backend_option(self.name, 'daily_chars', 0) or 0)
+
+    # --- shared state, falling back to the local one ----------------------
+
+    def _state_call(self, method: str, *args):
+        if self._shared is not None:
+            try:
+                return getattr(self._shared, method)(*args)
+            except Exception as e:
+                log.warning(f"[ProviderLimiter] Redis indisponível, usando limites locais: {e}")
+        return getattr(self._local, method)(*args)
+
+    # --- gates -----------------------------------------------------------
+
+    def _wait_breaker(self) -> float:
+        waited = 0.0
+        max_wait = _setting('TRANSLATION_BREAKER_MAX_WAIT_SECONDS', 120)
+        while True:
+            remaining = self.open_for()
+            if remaining <= 0:
+                return waited
+            if waited + remaining > max_wait:
+                raise ProviderUnavailable(f"{self.name}: circuit breaker open for {remaining:.0f}s more")
+            time.sleep(remaining)
+            waited += remaining
+
+    def _take_token(self) -> float:
+        rate = self.rate()
+        if rate <= 0:
+            return 0.0
+        burst = self.burst()
+        waited = 0.0
+        while True:
+            wait = self._state_call('take_token', rate, burst)
+            if wait <= 0:
+                return waited
+            time.sleep(wait)
+            waited += wait
+
+    def open_for(self) -> float:
+        """Seconds until the breaker closes; 0 when calls may be sent."""
+        return self._state_call('open_for')
+
+    def quota_left(self) -> Optional[float]:
+        """Fraction of today's character quota still available, None without a quota."""
+        limit = self.daily_chars()
+        if not limit:
+            return None
+        return max(0.0, 1 - self._state_call('quota_used', date.today().isoformat()) / limit)
+
+    def use_quota(self, chars: int) -> None:
+        if self.daily_chars():
+            self._state_call('use_quota', date.today().isoformat(), chars)
+
+    def acquire(self) -> float:
+        """Wait for the breaker, a concurrency slot and a token; returns the seconds spent waiting."""
+        started = time.monotonic()
+        self._wait_breaker()
+        with self._cond:
+            while self._in_flight >= int(self.limit):
+                self._cond.wait()
+            self._in_flight += 1
+        try:
+            self._take_token()
+        except Exception:
+            self.release()
+            raise
+        return time.monotonic() - started
+
+    def release(self, ok: Optional[bool] = None, throttled: bool = False) -> None:
+        """
+        Free the slot. ok=True grows the concurrency limit additively,
+        ok=False (a provider failure) halves it, at most once a second so a
+        burst of failing calls in flight counts as one signal.
+        """
+        with self._cond:
+            self._in_flight -= 1
+            if ok:
+                self.limit = min(float(self.max_concurrency()), self.limit + 1.0 / self.limit)
+            elif ok is False:
+                now = time.monotonic()
+                if now - self._last_decrease >= 1.0:
+                    self._last_decrease = now
+                    self.limit = max(1.0, self.limit / 2)
+            self._cond.notify_all()
+        if ok:
+            self._state_call('success')
+        elif ok is False:
+            threshold = _setting('TRANSLATION_BREAKER_THRESHOLD', 5)
+            cooldown = _setting('TRANSLATION_BREAKER_COOLDOWN_SECONDS', 30)
+            if self._state_call('failure', threshold, cooldown):
+                reason = 'limitado (429)' if throttled else 'falhando'
+                log.warning(f"[ProviderLimiter] Provedor {self.name} {reason}; circuito aberto por {cooldown}s para todos os workers")
+
+
+_lock = threading.Lock()
+_limiters: Dict[str, ProviderLimiter] = {}
+_limiters_pid: Optional[int] = None
+
+
+def _redis_client():
+    url = _setting('TRANSLATION_LIMITER_REDIS_URL', '')
+    if not url:
+        return None
+    try:
+        import redis
+        client = redis.Redis.from_url(url, decode_responses=True, socket_timeout=2)
+        client.ping()
+        return client
+    except Exception as e:
+        log.warning(f"[ProviderLimiter] Redis indisponível, usando limites locais: {e}")
+        return None
+
+
+def get_limiter(name: str = DEFAULT_PROVIDER) -> ProviderLimiter:
+    """The limiter of a provider in this process; rebuilt after a fork (Celery prefork children)."""
+    global _limiters_pid
+    with _lock:
+        if _limiters_pid != os.getpid():
+            _limiters.clear()
+            _limiters_pid = os.getpid()
+        limiter = _limiters.get(name)
+        if limiter is None:
+            limiter = _limiters[name] = ProviderLimiter(name, redis_client=_redis_client())
+        return limiter
@@ -0,0 +1,113 @@
+"""
+Masking of the variable parts of a segment before it is hashed and translated.
+
+Numbers, URLs/e-mails and the proper nouns listed in TRANSLATION_PROTECTED_TERMS
+are replaced by typed placeholders ([[N1]], [[U1]], [[T1]]), numbered per
+type in order of appearance. "Chapter 12" and "Chapter 13" then share the
+segment "Chapter [[N1]]": one translation memory entry and one provider
+request for the pattern, with the values put back into every instance.
+Protected terms are never sent to the provider, so names come back
+untranslated.
+
+Placeholders already in the text (the inline tags of html_pipeline units,
+[[1]]...[[/1]]) are left alone.
+"""
+import re
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+from django.conf import settings
+
+NUMBER = 'N'
+URL = 'U'
+TERM = 'T'
+
+_URL_PATTERN = (
+    r'(?:https?://|ftp://|www\.)[^\s\[\]<>"]*[^\s\[\]<>".,;:!?)\']'
+    r'|[\w.+-]+@[\w-]+\.[\w.-]*\w'
+)
+# Digits not glued to letters ("3rd", "mp3" stay in the text), with thousands/decimal/time separators
+_NUMBER_PATTERN = r'(?<![\w.,:/])\d+(?:[.,:/]\d+)*(?![\w/])'
+# Inline tag placeholders of html_pipeline units are skipped over
+_EXISTING_PATTERN = r'\[\[[^\[\]]*\]\]'
+_MASK = re.compile(r'\[\[\s*([NUT])\s*(\d+)\s*\]\]')
+
+
+def enabled() -> bool:
+    return getattr(settings, 'TRANSLATION_MASKING_ENABLED', True)
+
+
+def protected_terms() -> Tuple[str, ...]:
+    terms = getattr(settings, 'TRANSLATION_PROTECTED_TERMS', ()) or ()
+    if isinstance(terms, str):
+        terms = terms.split(',')
+    return tuple(sorted({term.strip() for term in terms if term.strip()}, key=len, reverse=True))
+
+
+@lru_cache(maxsize=8)
+def _compile(terms: Tuple[str, ...]):
+    parts = [f'(?P<existing>{_EXISTING_PATTERN})', f'(?P<{URL}>{_URL_PATTERN})']
+    if terms:
+        parts.append(f"(?P<{TERM}>(?<!\\w)(?:{'|'.join(re.escape(term) for term in terms)})(?!\\w))")
+    parts.append(f'(?P<{NUMBER}>{_NUMBER_PATTERN})')
+    return re.compile('|'.join(parts))
+
+
+def mask(text: str) -> Tuple[str, Dict[str, str]]:
+    """(masked text, {placeholder: value}); the text is returned as is when masking is off."""
+    if not text or not enabled():
+        return text, {}
+    values: Dict[str, str] = {}
+    counters: Dict[str, int] = {}
+
+    def replace(match):
+        kind = match.lastgroup
+        if kind == 'existing':
+            return match.group(0)
+        counters[kind] = counters.get(kind, 0) + 1
+        token = f'{kind}{counters[kind]}'
+        values[token] = match.group(0)
+        return f'[[{token}]]'
+
+    return _compile(protected_terms()).sub(replace, text), values
+
+
+def unmask(text: str, values: Dict[str, str]) -> Optional[str]:
+    """
+    The text with its placeholders replaced by values, or None when the
+    translation lost, duplicated or invented a placeholder.
+    """
+    if not values:
+        return text
+    found = []
+
+    def replace(match):
+        token = f'{match.group(1)}{match.group(2)}'
+        found.append(token)
+        return values.get(token, match.group(0))
+
+    restored = _MASK.sub(replace, text)
+    if sorted(found) != sorted(values):
+        return None
+    return restored
+
+
+def strip_masks(text: str) -> str:
+    """The text without its placeholders, to tell whether anything is left to translate."""
+    return _MASK.sub('', text or '')
+
+
+def mask_pair(source: str, translated: str) -> Optional[Tuple[str, str]]:
+    """
+    Mask a known (source, translation) pair the same way, for filling the
+    translation memory from existing translations. None when a value does
+    not appear exactly once in the translation.
+    """
+    masked, values = mask(source)
+    if not values:
+        return masked, translated
+    if any(translated.count(value) != 1 for value in values.values()):
+        return None
+    tokens = {value: token for token, value in values.items()}
+    pattern = re.compile('|'.join(re.escape(value) for value in sorted(tokens, key=len, reverse=True)))
+    return masked, pattern.sub(lambda m: f'[[{tokens[m.group(0)]}]]', translated)
@@ -0,0 +1,62 @@
+"""
+Local classification of text segments that never need a provider call:
+numbers, punctuation-only separators ("* * *"), URLs/e-mails, markup
+comments and the contents of code blocks. They are passed through unchanged.
+"""
+import re
+from typing import Dict, Iterable, List, Optional
+
+# Text inside these elements is never translated
+SKIP_PARENT_TAGS = {'script', 'style', 'code', 'pre', 'kbd', 'samp', 'var', 'math', 'svg'}
+
+# Metadata fields that are names or identifiers rather than prose
+UNTRANSLATABLE_METADATA_KEYS = {
+    'author', 'authors', 'creator', 'contributor', 'publisher', 'language', 'identifier',
+    'external_work_id', 'source_type', 'source', 'source_url', 'url', 'date', 'published', 'updated',
+}
+
+_URL = re.compile(r'^(?:https?://|ftp://|www\.)\S+$|^[\w.+-]+@[\w-]+\.[\w.-]+$', re.IGNORECASE)
+
+
+def classify_text(text: str) -> Optional[str]:
+    """Return why text needs no translation ('blank', 'url', 'no_letters'), or None if it does."""
+    stripped = (text or '').strip()
+    if not stripped:
+        return 'blank'
+    if _URL.match(stripped):
+        return 'url'
+    if not any(ch.isalpha() for ch in stripped):
+        # numbers, dates, "* * *", "—", "…"
+        return 'no_letters'
+    return None
+
+
+def needs_translation(text: str) -> bool:
+    return classify_text(text) is None
+
+
+def translatable_metadata_keys(metadata) -> List[str]:
+    """Metadata fields translated along with the title: non-empty prose strings."""
+    if not isinstance(metadata, dict):
+        return []
+    return [
+        key for key, value in metadata.items()
+        if isinstance(value, str) and value.strip() and key.lower() not in UNTRANSLATABLE_METADATA_KEYS
+    ]
+
+
+def record_skipped(stats: Optional[Dict], texts: Iterable[str]) -> None:
+    """Add skipped segments to a stats dict: each one used to cost a provider call."""
+    if stats is None:
+        return
+    for text in texts:
+        stats['skipped_segments'] = stats.get('skipped_segments', 0) + 1
+        stats['skipped_chars'] = stats.get('skipped_chars', 0) + len(text.strip())
+
+
+def merge_stats(target: Dict, source: Optional[Dict]) -> Dict:
+    """Sum numeric counters of source into target."""
+    for key, value in (source or {}).items():
+        if isinstance(value, (int, float)):
+            target[key] = target.get(key, 0) + value
+    return target
@@ -1,6 +1,8 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import UploadedFile, ExtractedEpub, TranslatedEpub, AuditLog, ReadingProgress, ReaderPreference
+from .models import UploadedFile, ExtractedEpub, TranslatedEpub, AuditLog, ReadingProgress, ReaderPreference, TranslationJob
+from .chapters import PUBLIC_FIELDS, chapter_dicts
+from .translated_chapters import chapters_of
 
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
@@ -26,15 +28,31 @@ class UploadedFileSerializer(serializers.ModelSerializer):
 class ExtractedEpubSerializer(serializers.ModelSerializer):
     class Meta:
         model = ExtractedEpub
-        fields = ('id', 'uploaded_file', 'title', 'metadata', 'chapters', 'images', 'extracted_at')
-        read_only_fields = ('uploaded_file', 'extracted_at')
+        fields = ('id', 'uploaded_file', 'title', 'metadata', 'images', 'detected_lang', 'extracted_at')
+        read_only_fields = ('uploaded_file', 'detected_lang', 'extracted_at')
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        # Skeletons are only used by the translation path
+        data['chapters'] = chapter_dicts(instance, fields=PUBLIC_FIELDS)
+        return data
 
 class TranslatedEpubSerializer(serializers.ModelSerializer):
     class Meta:
         model = TranslatedEpub
-        fields = ('id', 'extracted_epub', 'source_lang', 'target_lang', 'translated_title', 'translated_metadata', 'translated_chapters', 'chapter_index', 'translated_at')
+        fields = ('id', 'extracted_epub', 'source_lang', 'target_lang', 'translated_title', 'translated_metadata', 'chapter_index', 'translated_at')
         read_only_fields = ('extracted_epub', 'translated_at')
 
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        # Listings pass with_chapters=False to skip loading the chapter rows
+        if self.context.get('with_chapters', True):
+            # Segment maps are only used for incremental re-translation
+            data['translated_chapters'] = [
+                {k: v for k, v in ch.items() if k != 'segments'} for ch in chapters_of(instance)
+            ]
+        return data
+
 class ReadingProgressSerializer(serializers.ModelSerializer):
     class Meta:
         model = ReadingProgress
@@ -56,3 +74,13 @@ class ReaderPreferenceSerializer(serializers.ModelSerializer):
             'version', 'font_size', 'theme', 'font_family', 'line_height', 'page_width', 'text_align', 'updated_at', 'created_at'
         )
         read_only_fields = ('updated_at', 'created_at', 'version')
+
+
+class TranslationJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = TranslationJob
+        fields = (
+            'id', 'extracted_epub', 'source_lang', 'target_lang', 'chapter_index', 'status', 'priority', 'translation',
+            'error', 'created_at', 'started_at', 'finished_at', 'updated_at'
+        )
+        read_only_fields = fields
@@ -0,0 +1,108 @@
+"""
+Single-flight locks for expensive work.
+
+Identical work (extracting the same upload, running the same translation
+job) runs once at a time: the first caller takes a lock keyed by the work
+and the others wait for it to be released, then find the result in the
+database instead of producing it again. Callers that must not wait (a
+duplicate Celery delivery) pass wait=0 and get Busy.
+
+A lock is a SingleFlightLock row: a lease that expires after ttl seconds,
+so work whose worker died does not block its key forever. Locks are
+re-entrant within a thread, which keeps eager Celery tasks from waiting on
+the request that runs them.
+"""
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import SingleFlightLock
+
+POLL_SECONDS = 0.25
+
+_local = threading.local()
+
+
+class Busy(Exception):
+    """The work is still running elsewhere after waiting for it."""
+
+    def __init__(self, key: str):
+        super().__init__(f"{key} is already running")
+        self.key = key
+
+
+def default_wait() -> float:
+    return getattr(settings, 'SINGLE_FLIGHT_WAIT_SECONDS', 60)
+
+
+def default_ttl() -> int:
+    return getattr(settings, 'SINGLE_FLIGHT_LOCK_SECONDS', 600)
+
+
+def _held():
+    if not hasattr(_local, 'held'):
+        _local.held = {}
+    return _local.held
+
+
+def _acquire(key: str, owner: str, ttl: int) -> bool:
+    now = timezone.now()
+    expires_at = now + timedelta(seconds=ttl)
+    try:
+        with transaction.atomic():
+            SingleFlightLock.objects.create(key=key, owner=owner, expires_at=expires_at)
+        return True
+    except IntegrityError:
+        # Only an expired lease can be taken over
+        return SingleFlightLock.objects.filter(key=key, expires_at__lt=now).update(
+            owner=owner, expires_at=expires_at
+        ) == 1
+
+
+def is_running(key: str) -> bool:
+    return SingleFlightLock.objects.filter(key=key, expires_at__gte=timezone.now()).exists()
+
+
+@contextmanager
+def single_flight(key: str, wait: Optional[float] = None, ttl: Optional[int] = None):
+    """
+    Hold the lock for key while the block runs, waiting up to wait seconds
+    for another holder to finish first (Busy after that). The block should
+    check whether the caller it waited for already did the work.
+    """
+    held = _held()
+    if key in held:
+        held[key] += 1
+        try:
+            yield
+        finally:
+            held[key] -= 1
+        return
+
+    wait = default_wait() if wait is None else wait
+    ttl = ttl or default_ttl()
+    owner = uuid.uuid4().hex
+    deadline = time.monotonic() + wait
+    while not _acquire(key, owner, ttl):
+        if time.monotonic() >= deadline:
+            raise Busy(key)
+        time.sleep(POLL_SECONDS)
+    held[key] = 1
+    try:
+        yield
+    finally:
+        del held[key]
+        SingleFlightLock.objects.filter(key=key, owner=owner).delete()
+
+
+def prune() -> int:
+    """Delete leases that expired without being released."""
+    deleted, _ = SingleFlightLock.objects.filter(expires_at__lt=timezone.now()).delete()
+    return deleted
@@ -1,7 +1,5 @@
-from .models import ExtractedEpub, TranslatedEpub, AuditLog
+from .models import ExtractedEpub, TranslatedEpub, AuditLog, TranslationJob
 from celery import shared_task
-from bs4 import BeautifulSoup
-from deep_translator import GoogleTranslator
 from ebooklib import epub
 import ebooklib
 import os
@@ -9,9 +7,34 @@ import hashlib
 from pathlib import Path
 from django.conf import settings
 import time
-from typing import Iterable
-import bleach
 import mimetypes
+from contextlib import ExitStack
+from .html_pipeline import chapter_fields, has_skeleton, parse_document, render_skeleton
+from .chapters import chapter_count, chapter_dicts, get_chapter, replace_chapters
+from .translated_chapters import save_chapters
+from .content_hashes import (
+    annotate_book, shared_translation, source_chapter_hash, previous_translated_chapter, previous_translated_chapters,
+)
+from .translation_telemetry import TranslationTelemetry, collect as collect_telemetry, without_samples
+from .langdetect_utils import detect_book_language, resolve_source_lang
+from .segment_utils import merge_stats, translatable_metadata_keys
+from .translation_queues import task_options, should_yield
+from .translation_scheduler import (
+    claim_assembly, claimed_jobs, dispatch, group_jobs, renew_lease, schedule, schedule_group,
+)
+from .translation_engine import max_workers, run_concurrently
+from . import translator_pool
+from .provider_limiter import ProviderUnavailable
+from .single_flight import Busy, is_running, single_flight
+from .translation_jobs import (
+    get_or_create_job, chapter_indexes, pending_chapter_indexes, mark_running, mark_finished, mark_failed, mark_shared,
+    save_checkpoint, save_checkpoints, iter_checkpointed_chapters, checkpointed_text_nodes, checkpointed_stats, job_telemetry,
+)
+from .translation_utils import (  # noqa: F401
+    SegmentTarget, covers_segments, translate_with_retry, translate_segments, translate_segments_multi, chunk_text,
+)
+# Celery only autodiscovers uploads.tasks; the periodic maintenance tasks live here
+from . import tasks_scheduled  # noqa: F401
 
 
 def extract_epub_sync(extracted_epub_id):
@@ -33,33 +56,16 @@ def extract_epub_sync(extracted_epub_id):
     chapters = []
     document_items = [item for item in book.get_items() if item.get_type() == ebooklib.ITEM_DOCUMENT]
 
-    import re
-    def sanitize_html(raw_html: str) -> str:
-        if not raw_html:
-            return ''
-        tmp = re.sub(r'^\s*<\?xml[^>]*?>', '', raw_html, flags=re.IGNORECASE)
-        tmp = re.sub(r'<!DOCTYPE[^>]*?>', '', tmp, flags=re.IGNORECASE)
-        soup_local = BeautifulSoup(tmp, 'html.parser')
-        for tag in soup_local.find_all(['script','iframe','object','embed','style']):
-            tag.decompose()
-        body = soup_local.body
-        if body:
-            inner = ''.join(str(c) for c in body.contents)
-        else:
-            inner = str(soup_local)
-        inner = re.sub(r'^\s*<html[^>]*>','', inner, flags=re.IGNORECASE)
-        inner = re.sub(r'</html>\s*$','', inner, flags=re.IGNORECASE)
-        return inner.strip()
-
-    for item in document_items:
-        soup = BeautifulSoup(item.get_content(), 'html.parser')
-        title_tag = soup.find('title')
-        title_text = title_tag.get_text() if title_tag else item.get_name()
-        raw_content = item.get_content().decode('utf-8')
-        cleaned_content = sanitize_html(raw_content)
-        chapters.append({'title': title_text, 'content': cleaned_content})
+    for index, item in enumerate(document_items):
+        # One parse per document gives the sanitized body, the chapter title and its skeleton
+        document = parse_document(item.get_content(), fallback_title=f"Capítulo {index + 1}")
+        chapters.append({
+            'title': document.title, 'content': document.html,
+            'skeleton': document.skeleton, 'texts': document.texts, 'skipped': document.skipped,
+        })
     
-    extracted.chapters = chapters
+    annotate_book(extracted, chapters)
+    extracted.detected_lang = detect_book_language(extracted, chapters)
     
     images = []
     cover_image_path = None
@@ -136,112 +142,295 @@ def extract_epub_sync(extracted_epub_id):
     extracted.images = images
     extracted.cover_image = cover_image_path
     extracted.save()
+    replace_chapters(extracted, chapters)
     
     return extracted
 
 
-def translate_epub_sync(extracted_epub_id, source_lang, target_lang, chapter_index=None, user_id=None):
+def extract_once(uploaded_file, extract=None):
     """
-    Synchronous EPUB translation
+    The ExtractedEpub of an uploaded file, extracted on first use with
+    extract (extract_epub_sync by default). Callers arriving while the file
+    is being extracted wait for that extraction instead of returning a
+    half-filled book or extracting it again.
     """
-    import logging
-    log = logging.getLogger(__name__)
-    
-    log.info(f"[TranslateSync] Iniciando: extracted_epub_id={extracted_epub_id}, source={source_lang}, target={target_lang}, chapter={chapter_index}")
-    
-    extracted_epub = ExtractedEpub.objects.get(id=extracted_epub_id)
-    log.info(f"[TranslateSync] ExtractedEpub carregado: title='{extracted_epub.title}', chapters_count={len(extracted_epub.chapters or [])}")
-    
-    translator = GoogleTranslator(source=source_lang, target=target_lang)
-    start_time = time.time()
-    text_nodes_count = 0
+    key = f'extract:{uploaded_file.pk}'
+    extracted = ExtractedEpub.objects.filter(uploaded_file=uploaded_file).first()
+    if extracted is not None and not is_running(key):
+        return extracted
+    with single_flight(key):
+        extracted, created = ExtractedEpub.objects.get_or_create(uploaded_file=uploaded_file)
+        if created:
+            try:
+                if extract is None:
+                    extract_epub_sync(extracted.pk)
+                else:
+                    extract(extracted)
+            except Exception:
+                # Leave no half-extracted book behind; the next caller tries again
+                extracted.delete()
+                raise
+            extracted.refresh_from_db()
+    return extracted
 
-    # Translate title
-    translated_title = ''
-    if extracted_epub.title:
-        try:
-            translated_title = translate_with_retry(translator, extracted_epub.title)
-            log.info(f"[TranslateSync] Título traduzido: '{extracted_epub.title}' -> '{translated_title}'")
-        except Exception as e:
-            log.error(f"[TranslateSync] Erro ao traduzir título: {str(e)}")
-            translated_title = extracted_epub.title
-
-    # Translate metadata
-    translated_metadata = {}
-    if extracted_epub.metadata and isinstance(extracted_epub.metadata, dict):
-        log.info(f"[TranslateSync] Traduzindo metadata com {len(extracted_epub.metadata)} campos")
-        for key, value in extracted_epub.metadata.items():
-            if isinstance(value, str) and value.strip():
-                try:
-                    translated_metadata[key] = translate_with_retry(translator, value)
-                except Exception as e:
-                    log.error(f"[TranslateSync] Erro ao traduzir metadata {key}: {str(e)}")
-                    translated_metadata[key] = value
-            else:
-                translated_metadata[key] = value
-
-    # Translate chapters
-    translated_chapters = []
-    if chapter_index is not None and extracted_epub.chapters and isinstance(extracted_epub.chapters, list):
+
+def translation_flight_key(extracted_epub_id, source_lang, target_lang, chapter_index=None):
+    """Single-flight key of a translation request: book, language pair and chapter."""
+    return f'translate:{extracted_epub_id}:{source_lang}:{target_lang}:{"all" if chapter_index is None else chapter_index}'
+
+
+def job_flight_key(job_id):
+    return f'translation-job:{job_id}'
+
+
+def _select_chapters(extracted_epub, chapter_index, log):
+    """Number of chapters the request covers; the chapter index is checked against the book."""
+    total = chapter_count(extracted_epub)
+    if chapter_index is not None and total:
         log.info(f"[TranslateSync] Traduzindo capítulo específico: {chapter_index}")
-        if 0 <= chapter_index < len(extracted_epub.chapters):
-            chapters_to_translate = [extracted_epub.chapters[chapter_index]]
-        else:
-            raise ValueError(f"Chapter index {chapter_index} out of range")
-    else:
-        log.info(f"[TranslateSync] Traduzindo todos os capítulos")
-        chapters_to_translate = extracted_epub.chapters or []
-
-    log.info(f"[TranslateSync] Capítulos para traduzir: {len(chapters_to_translate)}")
-
-    for i, chapter in enumerate(chapters_to_translate):
-        log.info(f"[TranslateSync] Traduzindo capítulo {i+1}/{len(chapters_to_translate)}: '{chapter.get('title', 'Sem título')}'")
-        
-        translated_chapter = {
-            'title': '',
-            'content': chapter['content']
+        if 0 <= chapter_index < total:
+            return 1
+        raise ValueError(f"Chapter index {chapter_index} out of range")
+    log.info(f"[TranslateSync] Traduzindo todos os capítulos")
+    return total
+
+
+def _translate_headers(extracted_epub, chapters, targets, source_lang, log):
+    """
+    Translate title, metadata and chapter titles together in as few requests
+    as possible, for every SegmentTarget at once. Returns one
+    (title, metadata, chapter titles) tuple per target.
+    """
+    metadata = extracted_epub.metadata if isinstance(extracted_epub.metadata, dict) else {}
+    metadata_keys = translatable_metadata_keys(metadata)
+    chapter_titles = [chapter.get('title') or '' for chapter in chapters]
+    header_texts = [extracted_epub.title or ''] + [metadata[key] for key in metadata_keys] + chapter_titles
+    try:
+        translated_by_target = translate_segments_multi(targets, header_texts, source_lang, max_workers=None)
+    except Exception as e:
+        log.error(f"[TranslateSync] Erro ao traduzir título/metadata: {str(e)}")
+        translated_by_target = [list(header_texts) for _ in targets]
+
+    headers = []
+    for target, translated_headers in zip(targets, translated_by_target):
+        translated_title = translated_headers[0]
+        if extracted_epub.title:
+            log.info(f"[TranslateSync] Título traduzido ({target.target_lang}): '{extracted_epub.title}' -> '{translated_title}'")
+        translated_metadata = dict(metadata)
+        if metadata:
+            log.info(f"[TranslateSync] Metadata traduzida com {len(metadata_keys)} campos")
+        for offset, key in enumerate(metadata_keys, start=1):
+            translated_metadata[key] = translated_headers[offset]
+        translated_chapter_titles = [
+            translated if chapter.get('title') else f'Capítulo {i+1}'
+            for i, (chapter, translated) in enumerate(zip(chapters, translated_headers[1 + len(metadata_keys):]))
+        ]
+        headers.append((translated_title, translated_metadata, translated_chapter_titles))
+    return headers
+
+
+def _chapter_fields(chapter):
+    """The skeleton and texts of a stored chapter; parsed from its HTML for chapters extracted without them."""
+    return chapter if has_skeleton(chapter) else chapter_fields(chapter.get('content') or '')
+
+
+def _translate_and_checkpoint(job, chapter, chapter_index, translator, segment_workers, log):
+    """Translate one chapter and persist it right away as a checkpoint. Returns the text node count."""
+    fields = _translate_chapter_checkpoint(job, chapter, chapter_index, translator, segment_workers, log)
+    save_checkpoint(job, chapter_index, **fields)
+    return fields.get('text_nodes', 0)
+
+
+def _translate_chapter_checkpoint(job, chapter, chapter_index, translator, segment_workers, log):
+    """
+    Translate one chapter and return the checkpoint to save for it
+    (save_checkpoint's keyword arguments). Nothing is written, so chapters
+    can run on pool threads while their checkpoints are saved by the
+    calling thread.
+    """
+    started = time.time()
+    stats = {}
+    telemetry = TranslationTelemetry()
+    log.info(f"[TranslateSync] Traduzindo capítulo {chapter_index+1}/{job.total_chapters}: '{chapter.get('title', 'Sem título')}'")
+    try:
+        source_hash = source_chapter_hash(chapter)
+        previous = previous_translated_chapter(job, chapter_index)
+        if (previous and previous.get('source_hash') == source_hash
+                and covers_segments(previous.get('segments'), _chapter_fields(chapter)['texts'])):
+            log.info(f"[TranslateSync] Capítulo {chapter_index+1} inalterado desde a última tradução; reaproveitando")
+            stats['reused_chapters'] = 1
+            duration_ms = int((time.time() - started) * 1000)
+            return {
+                'content': previous.get('content', ''), 'duration_ms': duration_ms, 'stats': stats,
+                'source_hash': source_hash, 'segments': previous.get('segments') or {},
+                'telemetry': telemetry.snapshot(duration_ms),
+            }
+
+        content_length = len(chapter['content'])
+        log.info(f"[TranslateSync] Traduzindo conteúdo do capítulo {chapter_index+1} (tamanho: {content_length} chars)")
+        segments = {}
+        with collect_telemetry(telemetry):
+            translated_html, nodes = translate_chapter(
+                chapter, translator, job.source_lang, job.target_lang, max_workers=segment_workers,
+                stats=stats, reuse=(previous or {}).get('segments'), record=segments
+            )
+        duration_ms = int((time.time() - started) * 1000)
+        log.info(f"[TranslateSync] Capítulo {chapter_index+1} traduzido com sucesso ({nodes} nós de texto, {stats.get('skipped_segments', 0)} ignorados)")
+        return {
+            'content': translated_html, 'text_nodes': nodes, 'duration_ms': duration_ms, 'stats': stats,
+            'source_hash': source_hash, 'segments': segments, 'telemetry': telemetry.snapshot(duration_ms),
         }
-        
-        # Translate chapter title
-        try:
-            if chapter.get('title'):
-                translated_chapter['title'] = translate_with_retry(translator, chapter['title'])
-                log.info(f"[TranslateSync] Título do capítulo traduzido: '{chapter['title']}' -> '{translated_chapter['title']}'")
-            else:
-                translated_chapter['title'] = f'Capítulo {i+1}'
-        except Exception as e:
-            log.error(f"[TranslateSync] Erro ao traduzir título do capítulo {i+1}: {str(e)}")
-            translated_chapter['title'] = chapter.get('title', f'Capítulo {i+1}')
-        
-        # Translate chapter content
+    except Exception as e:
+        log.error(f"[TranslateSync] Erro ao traduzir conteúdo do capítulo {chapter_index+1}: {str(e)}")
+        import traceback
+        log.error(f"[TranslateSync] Traceback: {traceback.format_exc()}")
+        duration_ms = int((time.time() - started) * 1000)
+        return {'duration_ms': duration_ms, 'error': str(e), 'telemetry': telemetry.snapshot(duration_ms)}
+
+
+def _translate_chapter_for_targets(jobs, chapter, chapter_index, translators, segment_workers, log):
+    """
+    Translate one chapter for several jobs of the same book that differ only
+    in target language, and checkpoint it for all of them with one write.
+    The chapter is segmented once; only the provider calls are per target.
+    """
+    save_checkpoints(
+        chapter_index, _chapter_checkpoints_for_targets(jobs, chapter, chapter_index, translators, segment_workers, log)
+    )
+
+
+def _chapter_checkpoints_for_targets(jobs, chapter, chapter_index, translators, segment_workers, log):
+    """The (job, checkpoint) pairs of _translate_chapter_for_targets, without writing them."""
+    started = time.time()
+    source_hash = source_chapter_hash(chapter)
+    previous = previous_translated_chapters(jobs[0], [job.target_lang for job in jobs], chapter_index)
+    results = []
+    fresh = []
+    fields = None
+    for job in jobs:
+        earlier = previous.get(job.target_lang)
+        unchanged = bool(earlier) and earlier.get('source_hash') == source_hash
+        if unchanged:
+            fields = fields or _chapter_fields(chapter)
+        # Segments that failed at the provider are missing from the map and still need translating
+        if unchanged and covers_segments(earlier.get('segments'), fields['texts']):
+            log.info(f"[TranslateMulti] Capítulo {chapter_index+1} ({job.target_lang}) inalterado desde a última tradução; reaproveitando")
+            results.append((job, {
+                'content': earlier.get('content', ''), 'stats': {'reused_chapters': 1}, 'source_hash': source_hash,
+                'segments': earlier.get('segments') or {}, 'telemetry': TranslationTelemetry().snapshot(0),
+            }))
+        else:
+            fresh.append(job)
+    if fresh:
+        log.info(f"[TranslateMulti] Traduzindo capítulo {chapter_index+1}/{jobs[0].total_chapters} para {[job.target_lang for job in fresh]}: '{chapter.get('title', 'Sem título')}'")
         try:
-            content_length = len(chapter['content'])
-            log.info(f"[TranslateSync] Traduzindo conteúdo do capítulo {i+1} (tamanho: {content_length} chars)")
-            translated_html, nodes = translate_html(chapter['content'], translator)
-            text_nodes_count += nodes
-            translated_chapter['content'] = translated_html
-            log.info(f"[TranslateSync] Capítulo {i+1} traduzido com sucesso ({nodes} nós de texto)")
+            fields = fields or _chapter_fields(chapter)
+            targets = [
+                SegmentTarget(
+                    job.target_lang, translators[job.target_lang], stats=merge_stats({}, fields.get('skipped')),
+                    reuse=(previous.get(job.target_lang) or {}).get('segments'), record={},
+                    telemetry=TranslationTelemetry(),
+                )
+                for job in fresh
+            ]
+            translated_by_target = translate_segments_multi(
+                targets, fields['texts'], fresh[0].source_lang, max_workers=segment_workers
+            )
+            duration_ms = int((time.time() - started) * 1000)
+            for job, target, translated in zip(fresh, targets, translated_by_target):
+                results.append((job, {
+                    'content': render_skeleton(fields['skeleton'], translated), 'text_nodes': len(fields['texts']),
+                    'duration_ms': duration_ms, 'stats': target.stats, 'source_hash': source_hash,
+                    'segments': target.record, 'telemetry': target.telemetry.snapshot(duration_ms),
+                }))
         except Exception as e:
-            log.error(f"[TranslateSync] Erro ao traduzir conteúdo do capítulo {i+1}: {str(e)}")
-            import traceback
-            log.error(f"[TranslateSync] Traceback: {traceback.format_exc()}")
-        
-        translated_chapters.append(translated_chapter)
+            log.error(f"[TranslateMulti] Erro ao traduzir conteúdo do capítulo {chapter_index+1}: {str(e)}")
+            duration_ms = int((time.time() - started) * 1000)
+            results.extend((job, {'duration_ms': duration_ms, 'error': str(e)}) for job in fresh)
+    return results
 
-    log.info(f"[TranslateSync] Salvando tradução no banco de dados...")
-    # Save translation idempotently
-    translation, _created = TranslatedEpub.objects.update_or_create(
-        extracted_epub=extracted_epub,
-        source_lang=source_lang,
-        target_lang=target_lang,
-        chapter_index=chapter_index,
-        defaults={
-            'translated_title': translated_title,
-            'translated_metadata': translated_metadata,
-            'translated_chapters': translated_chapters,
-        }
+
+def _finalize_job(job, extracted_epub, translator, user_id, start_time, log):
+    """Assemble the TranslatedEpub from the job checkpoints and close the job."""
+    return _finalize_jobs([job], extracted_epub, {job.target_lang: translator}, user_id, start_time, log)[0]
+
+
+def _finalize_jobs(jobs, extracted_epub, translators, user_id, start_time, log):
+    """
+    _finalize_job for jobs covering the same chapters in different target
+    languages; their headers are translated together.
+    """
+    indexes = chapter_indexes(jobs[0])
+    titles = {ch['index']: ch for ch in chapter_dicts(extracted_epub, indexes, fields=('index', 'title'))}
+    chapters_to_translate = [titles.get(i, {}) for i in indexes]
+    targets = [
+        SegmentTarget(job.target_lang, translators[job.target_lang], stats={}, telemetry=TranslationTelemetry())
+        for job in jobs
+    ]
+    headers = _translate_headers(extracted_epub, chapters_to_translate, targets, jobs[0].source_lang, log)
+    translations = []
+    for job, target, (translated_title, translated_metadata, translated_chapter_titles) in zip(jobs, targets, headers):
+        stats = merge_stats(target.stats, checkpointed_stats(job))
+        telemetry = job_telemetry(job, target.telemetry.snapshot(), int((time.time() - start_time) * 1000))
+        done = dict(iter_checkpointed_chapters(job))
+        translated_chapters = {}
+        for position, idx in enumerate(indexes):
+            checkpoint = done.get(idx)
+            if checkpoint is None:
+                # Readers and downloads show the original content of failed chapters
+                translated_chapters[idx] = {'title': translated_chapter_titles[position], 'status': 'failed'}
+                continue
+            translated_chapters[idx] = {
+                'title': translated_chapter_titles[position],
+                'content': checkpoint['content'],
+                'source_hash': checkpoint['source_hash'],
+                'segments': checkpoint['segments'],
+            }
+        translation = _save_translation(
+            extracted_epub, job.source_lang, job.target_lang, job.chapter_index, translated_title, translated_metadata,
+            translated_chapters, user_id, start_time, checkpointed_text_nodes(job), log, stats, telemetry
+        )
+        mark_finished(job, translation, telemetry)
+        translations.append(translation)
+    return translations
+
+
+def _share_existing_translation(job, extracted_epub, user_id, log):
+    """Clone the finished translation of an identical book, if any, instead of calling the provider."""
+    shared = shared_translation(extracted_epub, job.source_lang, job.target_lang, job.chapter_index)
+    if not shared:
+        return None
+    donor, fields = shared
+    log.info(f"[TranslateSync] Conteúdo idêntico já traduzido (tradução {donor.pk}); clonando para o livro {extracted_epub.pk}")
+    translation = _save_translation(
+        extracted_epub, job.source_lang, job.target_lang, job.chapter_index, fields['translated_title'],
+        fields['translated_metadata'], fields['translated_chapters'], user_id, time.time(), 0, log,
+        shared_from=donor.pk
     )
-    
+    mark_shared(job, translation)
+    return translation
+
+
+def _save_translation(extracted_epub, source_lang, target_lang, chapter_index, translated_title,
+                      translated_metadata, translated_chapters, user_id, start_time, text_nodes_count, log, stats=None,
+                      telemetry=None, shared_from=None):
+    log.info(f"[TranslateSync] Salvando tradução no banco de dados...")
+    # Save translation idempotently; the lock keeps concurrent saves from creating a second row
+    # (the unique constraint does not cover full-book translations, whose chapter_index is NULL)
+    with single_flight(translation_flight_key(extracted_epub.pk, source_lang, target_lang, chapter_index)):
+        translation, _created = TranslatedEpub.objects.update_or_create(
+            extracted_epub=extracted_epub,
+            source_lang=source_lang,
+            target_lang=target_lang,
+            chapter_index=chapter_index,
+            defaults={
+                'translated_title': translated_title,
+                'translated_metadata': translated_metadata,
+            }
+        )
+        # One row per chapter, shared by the full-book and single-chapter translations of the pair
+        save_chapters(translation, translated_chapters)
+
     action_description = "created" if _created else "updated"
     log.info(f"[TranslateSync] Tradução {action_description}: translation_id={translation.pk}")
     log.info(f"[TranslateSync] Dados salvos - title: '{translated_title}', chapters: {len(translated_chapters)}")
@@ -257,97 +446,394 @@ def translate_epub_sync(extracted_epub_id, source_lang, target_lang, chapter_ind
             resource_id=translation.pk,
             resource_type='translation',
             metadata={
-                'extracted_epub_id': extracted_epub_id,
+                'extracted_epub_id': extracted_epub.pk,
                 'source_lang': source_lang,
                 'target_lang': target_lang,
                 'chapter_index': chapter_index,
                 'duration_ms': duration_ms,
-                'text_nodes_translated': text_nodes_count
+                'text_nodes_translated': text_nodes_count,
+                # Segments passed through locally; each one used to be a provider call
+                'calls_saved': (stats or {}).get('skipped_segments', 0),
+                'chars_saved': (stats or {}).get('skipped_chars', 0),
+                'telemetry': without_samples(telemetry),
+                'shared_from_translation_id': shared_from,
             }
         )
+    return translation
+
+
+def _make_translator(source_lang, target_lang):
+    # Clients and their keep-alive connections are reused by every task of the worker process
+    return translator_pool.get_translator(source_lang, target_lang)
+
+
+def translate_epub_sync(extracted_epub_id, source_lang, target_lang, chapter_index=None, user_id=None, job_id=None):
+    """
+    Synchronous EPUB translation. Chapters are checkpointed as they finish;
+    calling it again for the same request resumes the unfinished job.
+    """
+    import logging
+    log = logging.getLogger(__name__)
+    
+    log.info(f"[TranslateSync] Iniciando: extracted_epub_id={extracted_epub_id}, source={source_lang}, target={target_lang}, chapter={chapter_index}")
+    
+    extracted_epub = ExtractedEpub.objects.get(id=extracted_epub_id)
+    log.info(f"[TranslateSync] ExtractedEpub carregado: title='{extracted_epub.title}', chapters_count={chapter_count(extracted_epub)}")
+    source_lang = resolve_source_lang(extracted_epub, source_lang)
+    log.info(f"[TranslateSync] Idioma de origem efetivo: {source_lang}")
+    
+    translator = _make_translator(source_lang, target_lang)
+    start_time = time.time()
+
+    selected = _select_chapters(extracted_epub, chapter_index, log)
+    log.info(f"[TranslateSync] Capítulos para traduzir: {selected}")
+
+    job = get_or_create_job(extracted_epub, source_lang, target_lang, chapter_index, user_id, job_id)
+    shared = _share_existing_translation(job, extracted_epub, user_id, log)
+    if shared:
+        return shared
+    mark_running(job)
+    pending = pending_chapter_indexes(job)
+    if len(pending) < selected:
+        log.info(f"[TranslateSync] Retomando job {job.pk}: {selected - len(pending)} capítulo(s) já traduzido(s)")
+
+    try:
+        # Translate chapters: several chapters in flight, or several batches of a single chapter
+        workers = max_workers()
+        chapter_workers = workers if len(pending) > 1 else 1
+        segment_workers = 1 if chapter_workers > 1 else workers
+        # Only the pending chapters are loaded
+        chapters = {ch['index']: ch for ch in chapter_dicts(extracted_epub, pending)}
+
+        log.info(f"[TranslateSync] Concorrência: {chapter_workers} capítulo(s), {segment_workers} lote(s) por capítulo")
+        # Chapters are translated on the pool; each checkpoint is saved from this thread as soon as it is ready
+        run_concurrently(
+            lambda idx: _translate_chapter_checkpoint(job, chapters[idx], idx, translator, segment_workers, log),
+            pending, chapter_workers, on_result=lambda idx, fields: save_checkpoint(job, idx, **fields)
+        )
+
+        translation = _finalize_job(job, extracted_epub, translator, user_id, start_time, log)
+    except Exception as e:
+        mark_failed(job, str(e))
+        raise
 
     log.info(f"[TranslateSync] Tradução concluída com sucesso! Retornando translation object")
     return translation
 
 
-def translate_html(html_content, translator):
+def translate_epub_multi_sync(extracted_epub_id, source_lang, target_langs, chapter_index=None, user_id=None,
+                              job_ids=None):
     """
-    Translate HTML content while preserving structure, with chunking, retries and sanitization.
+    Translate a book (or one chapter) into several target languages at once.
+    Every target keeps its own job, checkpoints and TranslatedEpub, but each
+    chapter is loaded and segmented once and the request batches of all
+    targets go out together. Returns {target_lang: TranslatedEpub}.
     """
+    import logging
+    log = logging.getLogger(__name__)
+
+    target_langs = list(dict.fromkeys(target_langs))
+    log.info(f"[TranslateMulti] Iniciando: extracted_epub_id={extracted_epub_id}, source={source_lang}, targets={target_langs}, chapter={chapter_index}")
+    extracted_epub = ExtractedEpub.objects.get(id=extracted_epub_id)
+    source_lang = resolve_source_lang(extracted_epub, source_lang)
+    start_time = time.time()
+    _select_chapters(extracted_epub, chapter_index, log)
+
+    job_ids = job_ids or {}
+    translations = {}
+    jobs = []
+    for target_lang in target_langs:
+        job = get_or_create_job(extracted_epub, source_lang, target_lang, chapter_index, user_id, job_ids.get(target_lang))
+        if job.status == 'completed' and job.translation_id:
+            translations[target_lang] = job.translation
+            continue
+        shared = _share_existing_translation(job, extracted_epub, user_id, log)
+        if shared:
+            translations[target_lang] = shared
+            continue
+        mark_running(job)
+        jobs.append(job)
+    if not jobs:
+        return translations
+
+    pending = {job.pk: set(pending_chapter_indexes(job)) for job in jobs}
+    indexes = sorted(set().union(*pending.values()))
+    translators = {job.target_lang: _make_translator(source_lang, job.target_lang) for job in jobs}
     try:
-        soup = BeautifulSoup(html_content, 'html.parser')
+        # The worker budget is split between chapters and the batches of their targets
+        workers = max_workers()
+        chapter_workers = max(1, workers // len(jobs)) if len(indexes) > 1 else 1
+        segment_workers = max(1, workers // chapter_workers)
+        # Only the chapters some target still needs are loaded, once for all targets
+        chapters = {ch['index']: ch for ch in chapter_dicts(extracted_epub, indexes)}
+        log.info(f"[TranslateMulti] {len(indexes)} capítulo(s) para {len(jobs)} idioma(s); concorrência: {chapter_workers} capítulo(s), {segment_workers} lote(s) por capítulo")
+        run_concurrently(
+            lambda idx: _chapter_checkpoints_for_targets(
+                [job for job in jobs if idx in pending[job.pk]], chapters[idx], idx, translators, segment_workers, log
+            ),
+            indexes, chapter_workers, on_result=save_checkpoints
+        )
+        for translation in _finalize_jobs(jobs, extracted_epub, translators, user_id, start_time, log):
+            translations[translation.target_lang] = translation
+    except Exception as e:
+        for job in jobs:
+            mark_failed(job, str(e))
+        raise
+
+    log.info(f"[TranslateMulti] Tradução concluída para {sorted(translations)}")
+    return translations
+
+
+def translate_skeleton(skeleton, texts, translator, source_lang=None, target_lang=None, max_workers=1, stats=None,
+                       reuse=None, record=None):
+    """
+    Translate the texts of a chapter skeleton and substitute them into its
+    slots. No HTML is parsed: the skeleton was built at extraction.
+    Returns (html, number of text segments).
+    """
+    translations = translate_segments(
+        translator, texts, source_lang=source_lang, target_lang=target_lang, max_workers=max_workers, stats=stats,
+        reuse=reuse, record=record
+    )
+    return render_skeleton(skeleton, translations), len(texts)
+
+
+def translate_chapter(chapter, translator, source_lang=None, target_lang=None, max_workers=1, stats=None,
+                      reuse=None, record=None):
+    """Translate a stored chapter, from its skeleton when it has one."""
+    if not has_skeleton(chapter):
+        return translate_html(
+            chapter.get('content', ''), translator, source_lang, target_lang, max_workers=max_workers,
+            stats=stats, reuse=reuse, record=record
+        )
+    try:
+        if stats is not None:
+            merge_stats(stats, chapter.get('skipped') or {})
+        return translate_skeleton(
+            chapter['skeleton'], chapter['texts'], translator, source_lang, target_lang, max_workers=max_workers,
+            stats=stats, reuse=reuse, record=record
+        )
+    except ProviderUnavailable:
+        # The chapter must fail (and be retried) rather than be saved untranslated
+        raise
+    except Exception as e:
+        import logging
+        logging.getLogger(__name__).error(f"[TranslateChapter] Erro ao traduzir HTML: {str(e)}")
+        return chapter.get('content', ''), 0
 
-        allowed_tags = [
-            'p','div','span','strong','em','b','i','u','a','ul','ol','li','br','hr','h1','h2','h3','h4','h5','h6',
-            'img','blockquote','code','pre','table','thead','tbody','tr','td','th'
-        ]
-        allowed_attrs = {
-            '*': ['class','id','style'],
-            'a': ['href','title','target','rel'],
-            'img': ['src','alt','title']
-        }
 
-        text_nodes = 0
-        for element in soup.find_all(string=True):
-            if hasattr(element, 'parent') and element.strip() and element.parent.name not in ['script', 'style']:
-                original_text = element.strip()
-                if original_text:
-                    chunks = list(chunk_text(original_text, 4000))
-                    translated_chunks = []
-                    for ch in chunks:
-                        translated_chunk = translate_with_retry(translator, ch)
-                        translated_chunks.append(translated_chunk or ch)
-                    translated = ''.join(translated_chunks)
-                    if translated and translated != original_text:
-                        element.replace_with(translated)
-                    text_nodes += 1
-
-        cleaned = bleach.clean(str(soup), tags=allowed_tags, attributes=allowed_attrs, strip=False)
-        return cleaned, text_nodes
+def translate_html(html_content, translator, source_lang=None, target_lang=None, max_workers=1, stats=None,
+                   reuse=None, record=None):
+    """
+    Translate HTML content while preserving structure, with batching, retries and sanitization.
+    Passing the language pair enables the translation memory; max_workers
+    bounds the number of concurrent provider requests for this chapter.
+    Segments classified as non-translatable are counted in stats. reuse and
+    record carry segment-hash maps between runs (see translate_segments).
+    """
+    try:
+        # Parsed once into a skeleton, then translated like a stored chapter
+        fields = chapter_fields(html_content)
+        if stats is not None:
+            merge_stats(stats, fields['skipped'])
+        return translate_skeleton(
+            fields['skeleton'], fields['texts'], translator, source_lang, target_lang, max_workers=max_workers,
+            stats=stats, reuse=reuse, record=record
+        )
+    except ProviderUnavailable:
+        raise
     except Exception as e:
         print(f"General error in HTML translation: {str(e)}")
         return html_content, 0
 
 
-def translate_with_retry(translator, text: str, retries: int = 2, backoff: float = 0.5) -> str:
-    last_err = None
-    for attempt in range(retries + 1):
-        try:
-            result = translator.translate(text)
-            return result if result is not None else text
-        except Exception as e:
-            last_err = e
-            time.sleep(backoff * (2 ** attempt))
-    print(f"Translation failed after retries: {last_err}")
-    return text
-
-
-def chunk_text(text: str, max_len: int) -> Iterable[str]:
-    if len(text) <= max_len:
-        yield text
-        return
-    words = text.split()
-    buf = []
-    cur_len = 0
-    for w in words:
-        add_len = len(w) + (1 if buf else 0)
-        if cur_len + add_len > max_len:
-            yield ' '.join(buf)
-            buf = [w]
-            cur_len = len(w)
-        else:
-            buf.append(w)
-            cur_len += add_len
-    if buf:
-        yield ' '.join(buf)
+@shared_task(bind=True, name='uploads.translate_epub_task', acks_late=True,
+             autoretry_for=(Exception,), dont_autoretry_for=(ValueError, ExtractedEpub.DoesNotExist),
+             retry_backoff=True, max_retries=3)
+def translate_epub_task(self, extracted_epub_id, source_lang, target_lang, chapter_index=None, user_id=None, job_id=None):
+    """
+    Async translation. Single chapters and small books are translated here
+    and the translation ID is returned. Full-book jobs are handed to the
+    fair-share scheduler, which dispatches their chapters as
+    translate_chapter_task and assembles the book after the last one;
+    their progress is followed through the job.
+
+    A job runs in one task at a time: a second delivery of the same job
+    (e.g. a prefetch promoted to interactive while its first task runs)
+    returns without doing anything.
+    """
+    import logging
+    log = logging.getLogger(__name__)
+    extracted_epub = ExtractedEpub.objects.get(id=extracted_epub_id)
+    job = get_or_create_job(extracted_epub, source_lang, target_lang, chapter_index, user_id, job_id)
+    key = job_flight_key(job.pk)
+    try:
+        with single_flight(key, wait=0, ttl=_job_lock_seconds()):
+            job.refresh_from_db()
+            if job.status == 'completed' and job.translation_id:
+                # Already done by another task, e.g. a prefetch promoted to interactive
+                return job.translation_id
+            min_chapters = getattr(settings, 'TRANSLATION_FANOUT_MIN_CHAPTERS', 2)
+            pending = pending_chapter_indexes(job)
+            if chapter_index is not None or len(pending) < min_chapters:
+                translation = translate_epub_sync(
+                    extracted_epub_id, source_lang, target_lang, chapter_index, user_id, job.pk
+                )
+                return translation.id
+
+            shared = _share_existing_translation(job, extracted_epub, user_id, log)
+            if shared:
+                return shared.id
+            schedule(job)
+            dispatch()
+    except Busy as e:
+        if e.key != key:
+            raise
+        log.info(f"[TranslateTask] Job {job.pk} já está em execução em outra tarefa; entrega duplicada ignorada")
+    # Eager mode has translated the whole book by now
+    job.refresh_from_db(fields=['translation'])
+    return job.translation_id
+
+
+def _job_lock_seconds():
+    # A job lock outlives its task only if the worker died; then it expires like a scheduler lease
+    return getattr(settings, 'TRANSLATION_SCHEDULER_LEASE_SECONDS', 1800)
+
+
+@shared_task(bind=True, name='uploads.translate_epub_multi_task', acks_late=True,
+             autoretry_for=(Exception,), dont_autoretry_for=(ValueError, ExtractedEpub.DoesNotExist),
+             retry_backoff=True, max_retries=3)
+def translate_epub_multi_task(self, extracted_epub_id, source_lang, target_langs, chapter_index=None, user_id=None,
+                              job_ids=None):
+    """
+    Async multi-target translation (see translate_epub_multi_sync). Single
+    chapters and small books are translated here; full books are handed to
+    the fair-share scheduler as one group, whose chapters are dispatched
+    once for all targets and count as one slot each against the user and
+    global limits. Returns {target_lang: translation ID} of the translations
+    finished by now. Jobs already running in another task are left to it.
+    """
+    import logging
+    log = logging.getLogger(__name__)
+    with ExitStack() as locks:
+        if job_ids:
+            free = {}
+            for lang, job_id in job_ids.items():
+                try:
+                    locks.enter_context(single_flight(job_flight_key(job_id), wait=0, ttl=_job_lock_seconds()))
+                    free[lang] = job_id
+                except Busy:
+                    log.info(f"[TranslateTask] Job {job_id} já está em execução em outra tarefa; entrega duplicada ignorada")
+            target_langs, job_ids = [lang for lang in target_langs if lang in free], free
+        if not target_langs:
+            return {}
+        if chapter_index is None:
+            scheduled = _schedule_multi(extracted_epub_id, source_lang, target_langs, user_id, job_ids, log)
+            if scheduled is not None:
+                return scheduled
+        translations = translate_epub_multi_sync(
+            extracted_epub_id, source_lang, target_langs, chapter_index, user_id, job_ids
+        )
+    return {lang: translation.id for lang, translation in translations.items()}
 
 
-@shared_task(name='uploads.translate_epub_task')
-def translate_epub_task(extracted_epub_id, source_lang, target_lang, chapter_index=None, user_id=None):
-    """Async task wrapper for translate_epub_sync returning translation ID"""
-    translation = translate_epub_sync(extracted_epub_id, source_lang, target_lang, chapter_index, user_id)
+def _schedule_multi(extracted_epub_id, source_lang, target_langs, user_id, job_ids, log):
+    """
+    Schedule the full-book jobs of several targets as one group, or return
+    None when there are too few chapters left to be worth dispatching.
+    """
+    extracted_epub = ExtractedEpub.objects.get(id=extracted_epub_id)
+    job_ids = job_ids or {}
+    jobs = [
+        get_or_create_job(extracted_epub, source_lang, lang, None, user_id, job_ids.get(lang)) for lang in target_langs
+    ]
+    min_chapters = getattr(settings, 'TRANSLATION_FANOUT_MIN_CHAPTERS', 2)
+    if max(len(pending_chapter_indexes(job)) for job in jobs) < min_chapters:
+        return None
+    translations = {}
+    group = []
+    for job in jobs:
+        if job.status == 'completed' and job.translation_id:
+            translations[job.target_lang] = job.translation_id
+            continue
+        shared = _share_existing_translation(job, extracted_epub, user_id, log)
+        if shared:
+            translations[job.target_lang] = shared.id
+            continue
+        group.append(job)
+    if group:
+        log.info(f"[TranslateMulti] Agendando jobs {[job.pk for job in group]} como um grupo")
+        schedule_group(group)
+        dispatch()
+    # Eager mode has translated the whole book by now
+    for job in group:
+        job.refresh_from_db(fields=['translation'])
+        if job.translation_id:
+            translations[job.target_lang] = job.translation_id
+    return translations
+
+
+@shared_task(bind=True, name='uploads.translate_chapter_task', acks_late=True, max_retries=None)
+def translate_chapter_task(self, job_id, chapter_index):
+    """
+    Translate and checkpoint one chapter dispatched by the scheduler, then
+    assemble the book if it was the last one and pass the slot on. Before
+    starting, bulk chapters step back while interactive jobs are waiting.
+    For a multi-target group the chapter is translated for every job of the
+    group that claimed it, segmented once.
+    """
+    import logging
+    log = logging.getLogger(__name__)
+    job = TranslationJob.objects.select_related('extracted_epub').get(pk=job_id)
+    jobs = claimed_jobs(job, chapter_index)
+    if jobs:
+        if not self.request.is_eager and should_yield(job, self.request.retries):
+            countdown = getattr(settings, 'TRANSLATION_BULK_YIELD_SECONDS', 5)
+            log.info(f"[TranslateChapter] Job {job_id} cap. {chapter_index+1}: cedendo lugar a traduções interativas por {countdown}s")
+            renew_lease(job, chapter_index)
+            raise self.retry(countdown=countdown)
+        chapter = get_chapter(job.extracted_epub, chapter_index)
+        if chapter is None:
+            # The book was re-extracted with fewer chapters; the job can still be assembled
+            for member in jobs:
+                save_checkpoint(member, chapter_index, error=f"Chapter index {chapter_index} out of range")
+        elif job.group_key:
+            translators = {member.target_lang: _make_translator(member.source_lang, member.target_lang) for member in jobs}
+            _translate_chapter_for_targets(jobs, chapter, chapter_index, translators, max_workers(), log)
+        else:
+            _translate_and_checkpoint(
+                job, chapter, chapter_index, _make_translator(job.source_lang, job.target_lang), max_workers(), log
+            )
+    for member in group_jobs(job):
+        if claim_assembly(member):
+            assemble_translation_task.apply_async(args=(member.pk, member.user_id), **task_options(member))
+    dispatch()
+    return {'index': chapter_index}
+
+
+@shared_task(name='uploads.assemble_translation_task')
+def assemble_translation_task(job_id, user_id=None):
+    """Translate headers and save the full-book TranslatedEpub from the checkpoints."""
+    import logging
+    log = logging.getLogger(__name__)
+    job = TranslationJob.objects.select_related('extracted_epub').get(pk=job_id)
+    start_time = job.started_at.timestamp() if job.started_at else time.time()
+    try:
+        translation = _finalize_job(
+            job, job.extracted_epub, _make_translator(job.source_lang, job.target_lang), user_id, start_time, log
+        )
+    except Exception as e:
+        mark_failed(job, str(e))
+        raise
     return translation.id
 
+
+@shared_task(name='uploads.dispatch_translations_task')
+def dispatch_translations_task():
+    """Periodic dispatch: picks up chapters whose worker was lost."""
+    return dispatch()
+
+
 @shared_task(name='uploads.extract_epub_task')
 def extract_epub_task(extracted_epub_id):
     extracted = extract_epub_sync(extracted_epub_id)
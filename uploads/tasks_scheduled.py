@@ -2,6 +2,7 @@ from celery import shared_task
 from django.core.mail import send_mail
 from django.conf import settings
 from .models import UploadedFile, TranslatedEpub, ExtractedEpub
+from .translated_chapters import rows_of, without_chapters
 from datetime import timedelta
 from django.utils import timezone
 from django.db.models import Q
@@ -146,14 +147,11 @@ def check_failed_translations():
     
     cutoff_time = timezone.now() - timedelta(hours=24)
     
-    failed_translations = TranslatedEpub.objects.filter(
-        Q(translated_at__lt=cutoff_time) & (
-            Q(translated_chapters__isnull=True) |
-            Q(translated_chapters__exact='') |
-            Q(translated_chapters__exact=[]) |
-            Q(translated_title__exact='') |
-            Q(translated_title__isnull=True)
-        )
+    stale_translations = TranslatedEpub.objects.filter(translated_at__lt=cutoff_time)
+    failed_translations = stale_translations.filter(
+        Q(pk__in=without_chapters(stale_translations).values('pk')) |
+        Q(translated_title__exact='') |
+        Q(translated_title__isnull=True)
     )
     
     cleaned_count = 0
@@ -168,9 +166,8 @@ def check_failed_translations():
                   f"created={translation.translated_at}")
 
             has_content = (
-                translation.translated_chapters and 
-                len(translation.translated_chapters) > 0 and
-                translation.translated_title
+                translation.translated_title and
+                rows_of(translation).filter(status='done').exists()
             )
             
             if not has_content:
@@ -196,3 +193,28 @@ def check_failed_translations():
         result_message += f", found {old_count} old translations (30+ days)"
     
     return result_message
+
+
+@shared_task(name='uploads.prune_translation_memory')
+def prune_translation_memory():
+    """
+    Evict translation memory entries past their TTL and trim the table
+    to TRANSLATION_MEMORY_MAX_ENTRIES, least recently used first
+    """
+    from .translation_memory import prune
+
+    result = prune()
+    return f"Pruned translation memory: {result['expired']} expired, {result['evicted']} evicted (LRU)"
+
+
+@shared_task(name='uploads.prune_idempotency_keys')
+def prune_idempotency_keys():
+    """
+    Delete stored Idempotency-Key responses past IDEMPOTENCY_KEY_TTL_HOURS
+    and single-flight locks whose holder died without releasing them
+    """
+    from . import idempotency, single_flight
+
+    keys = idempotency.prune()
+    locks = single_flight.prune()
+    return f"Pruned {keys} idempotency keys and {locks} expired locks"
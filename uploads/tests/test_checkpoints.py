@@ -0,0 +1,89 @@
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+
+from uploads import tasks, translator_pool
+from uploads.chapters import replace_chapters
+from uploads.content_hashes import annotate_book
+from uploads.html_pipeline import chapter_fields
+from uploads.models import ExtractedEpub, TranslationJob, UploadedFile
+from uploads.translated_chapters import chapters_of
+from uploads.translation_jobs import get_or_create_job, save_checkpoint
+
+
+class ScriptedBackend:
+    """Upper-cases the text and records it; fails on texts containing a word of `failing`."""
+
+    calls = []
+    failing = set()
+
+    def __init__(self, source='auto', target='en'):
+        pass
+
+    def translate(self, text, **kwargs):
+        ScriptedBackend.calls.append(text)
+        if any(word in text for word in ScriptedBackend.failing):
+            raise ValueError('provider error')
+        return text.upper()
+
+
+@override_settings(
+    TRANSLATION_BACKENDS=['scripted'],
+    TRANSLATION_BACKEND_OPTIONS={'scripted': {'class': f'{__name__}.ScriptedBackend'}},
+    TRANSLATION_MAX_WORKERS=1,
+    TRANSLATION_MEMORY_ENABLED=False,
+)
+class CheckpointResumeTests(TestCase):
+    def setUp(self):
+        translator_pool._translators.clear()
+        ScriptedBackend.calls = []
+        ScriptedBackend.failing = set()
+        self.user = User.objects.create_user('reader', password='secret')
+        upload = UploadedFile.objects.create(user=self.user, file='epubs/book.epub', title='Book')
+        chapters = [
+            {'title': 'One', 'content': '<p>Alpha words here.</p><p>Beta words here.</p>'},
+            {'title': 'Two', 'content': '<p>Gamma stuff.</p>'},
+        ]
+        chapters = [dict(chapter, **chapter_fields(chapter['content'])) for chapter in chapters]
+        self.book = ExtractedEpub(uploaded_file=upload, title='Book', metadata={})
+        annotate_book(self.book, chapters)
+        self.book.save()
+        replace_chapters(self.book, chapters)
+
+    def tearDown(self):
+        translator_pool._translators.clear()
+
+    def translate(self, job_id=None):
+        return tasks.translate_epub_sync(self.book.pk, 'en', 'pt', None, self.user.pk, job_id)
+
+    def contents(self, translation):
+        return [chapter['content'] for chapter in chapters_of(translation)]
+
+    def test_resume_skips_checkpointed_chapters(self):
+        job = get_or_create_job(self.book, 'en', 'pt', None, self.user.pk)
+        save_checkpoint(job, 0, content='<p>KEPT</p>', text_nodes=2)
+
+        translation = self.translate(job.pk)
+
+        self.assertEqual(self.contents(translation), ['<p>KEPT</p>', '<p>GAMMA STUFF.</p>'])
+        self.assertFalse(any('Alpha' in text or 'Beta' in text for text in ScriptedBackend.calls))
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'completed')
+
+    def test_failed_segments_are_retried_on_the_next_run(self):
+        ScriptedBackend.failing = {'Beta'}
+        translation = self.translate()
+        first, second = self.contents(translation)
+        self.assertIn('Beta words here.', first)
+        self.assertEqual(second, '<p>GAMMA STUFF.</p>')
+
+        ScriptedBackend.failing = set()
+        ScriptedBackend.calls = []
+        translation = self.translate()
+
+        self.assertEqual(self.contents(translation), [
+            '<p>ALPHA WORDS HERE.</p><p>BETA WORDS HERE.</p>', '<p>GAMMA STUFF.</p>',
+        ])
+        # The chapter translated in full is not sent again
+        self.assertTrue(any('Beta' in text for text in ScriptedBackend.calls))
+        self.assertFalse(any('Gamma' in text for text in ScriptedBackend.calls))
+        self.assertEqual(TranslationJob.objects.filter(extracted_epub=self.book).count(), 2)
@@ -0,0 +1,37 @@
+from django.test import SimpleTestCase
+
+from uploads.translation_utils import join_chunks, split_chunks
+
+
+class SplitChunksTests(SimpleTestCase):
+    def assertRoundTrip(self, text, max_len):
+        chunks = split_chunks(text, max_len)
+        self.assertTrue(all(len(piece) <= max_len for piece, _ in chunks), chunks)
+        self.assertEqual(join_chunks([piece for piece, _ in chunks], chunks), text)
+        return chunks
+
+    def test_short_text_is_one_chunk(self):
+        self.assertEqual(split_chunks('Short text.', 100), [('Short text.', '')])
+
+    def test_sentences_keep_the_source_separators(self):
+        text = 'First sentence here. Second one follows!  Third?\nFourth line.'
+        chunks = self.assertRoundTrip(text, 25)
+        self.assertEqual(chunks, [
+            ('First sentence here.', ' '), ('Second one follows!', '  '), ('Third?\nFourth line.', ''),
+        ])
+
+    def test_cjk_sentences_are_joined_without_spaces(self):
+        text = '这是第一句。这是第二句。这是第三句。'
+        chunks = self.assertRoundTrip(text, 7)
+        self.assertEqual([separator for _, separator in chunks], ['', '', ''])
+
+    def test_long_sentence_falls_back_to_words(self):
+        text = ' '.join(['word'] * 30) + '.'
+        chunks = self.assertRoundTrip(text, 20)
+        self.assertGreater(len(chunks), 1)
+        self.assertTrue(all(separator == ' ' for _, separator in chunks[:-1]))
+
+    def test_translations_are_joined_with_the_source_separators(self):
+        text = 'One. Two.\n\nThree.'
+        chunks = split_chunks(text, 6)
+        self.assertEqual(join_chunks([piece.upper() for piece, _ in chunks], chunks), 'ONE. TWO.\n\nTHREE.')
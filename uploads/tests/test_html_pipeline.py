@@ -0,0 +1,46 @@
+from django.test import SimpleTestCase
+
+from uploads.html_pipeline import _safe_url, chapter_fields, parse_document, render_skeleton
+
+
+class RenderSkeletonTests(SimpleTestCase):
+    def test_source_texts_render_the_stored_content(self):
+        for html in (
+            '<p>Hello <em>world</em> again.</p><p>Second &amp; <a href="x.html">link</a></p>',
+            '<h1>Title</h1><div><p>A</p>tail text<br>more</div><pre>code()</pre><img src="a.png" alt="pic">',
+        ):
+            fields = chapter_fields(html)
+            self.assertEqual(render_skeleton(fields['skeleton'], fields['texts']), fields['content'])
+
+    def test_translated_texts_keep_the_markup(self):
+        fields = chapter_fields('<p>Hello <em>world</em> again.</p><p>Second &amp; <a href="x.html">link</a></p>')
+        self.assertEqual(fields['texts'], ['Hello [[1]]world[[/1]] again.', 'Second & [[1]]link[[/1]]'])
+        self.assertEqual(
+            render_skeleton(fields['skeleton'], [text.upper() for text in fields['texts']]),
+            '<p>HELLO <em>WORLD</em> AGAIN.</p><p>SECOND &amp; <a href="x.html">LINK</a></p>'
+        )
+
+    def test_code_is_not_translated(self):
+        fields = chapter_fields('<p>Run</p><pre>code()</pre>')
+        self.assertEqual(fields['texts'], ['Run'])
+        self.assertEqual(fields['skipped'], {'skipped_segments': 1, 'skipped_chars': 6})
+        self.assertEqual(render_skeleton(fields['skeleton'], ['RUN']), '<p>RUN</p><pre>code()</pre>')
+
+
+class SanitizeTests(SimpleTestCase):
+    def test_unsafe_urls(self):
+        self.assertTrue(_safe_url('img/a.png'))
+        self.assertTrue(_safe_url('https://example.com'))
+        self.assertTrue(_safe_url('data:image/png;base64,iVBOR'))
+        self.assertFalse(_safe_url('java\tscript:alert(1)'))
+        self.assertFalse(_safe_url('data:text/html,<script>alert(1)</script>'))
+        self.assertFalse(_safe_url('data:image/svg+xml,<svg onload="alert(1)"/>'))
+
+    def test_xhtml_keeps_xlink_href_and_drops_scripts(self):
+        document = parse_document(
+            '<?xml version="1.0"?><html xmlns="http://www.w3.org/1999/xhtml" '
+            'xmlns:xlink="http://www.w3.org/1999/xlink"><head><title>t</title></head><body>'
+            '<svg><image xlink:href="cover.jpg"/></svg><p onclick="x()">Hi<script>x()</script></p></body></html>'
+        )
+        self.assertEqual(document.html, '<svg><image href="cover.jpg"></image></svg><p>Hi</p>')
+        self.assertEqual(document.texts, ['Hi'])
@@ -0,0 +1,60 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory, force_authenticate
+from rest_framework.views import APIView
+
+from uploads.idempotency import HEADER, idempotent
+from uploads.models import IdempotencyKey
+
+
+class CountingView(APIView):
+    calls = 0
+
+    @idempotent
+    def post(self, request):
+        CountingView.calls += 1
+        if request.data.get('conflict'):
+            return Response({'error': 'busy'}, status=status.HTTP_409_CONFLICT)
+        return Response({'call': CountingView.calls, 'value': request.data.get('value')}, status=status.HTTP_201_CREATED)
+
+
+class IdempotencyTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('reader', password='secret')
+        self.factory = APIRequestFactory()
+        CountingView.calls = 0
+
+    def post(self, data, key='key-1', path='/work/'):
+        request = self.factory.post(path, data, format='json', **{f"HTTP_{HEADER.upper().replace('-', '_')}": key})
+        force_authenticate(request, user=self.user)
+        return CountingView.as_view()(request)
+
+    def test_repeated_key_replays_the_first_response(self):
+        first = self.post({'value': 1})
+        second = self.post({'value': 1})
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second.data, {'call': 1, 'value': 1})
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(CountingView.calls, 1)
+
+    def test_key_reused_with_another_body_or_endpoint_is_rejected(self):
+        self.post({'value': 1})
+        self.assertEqual(self.post({'value': 2}).status_code, 422)
+        self.assertEqual(self.post({'value': 1}, path='/other/').status_code, 422)
+        self.assertEqual(CountingView.calls, 1)
+
+    def test_errors_are_not_stored(self):
+        self.assertEqual(self.post({'conflict': True}).status_code, 409)
+        self.assertFalse(IdempotencyKey.objects.exists())
+        self.assertEqual(self.post({'conflict': True}).status_code, 409)
+        self.assertEqual(CountingView.calls, 2)
+
+    def test_requests_without_a_key_always_run(self):
+        for _ in range(2):
+            request = self.factory.post('/work/', {'value': 1}, format='json')
+            force_authenticate(request, user=self.user)
+            CountingView.as_view()(request)
+        self.assertEqual(CountingView.calls, 2)
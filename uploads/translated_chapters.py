@@ -0,0 +1,114 @@
+"""
+Per-chapter storage of translations.
+
+Every translated chapter is one TranslatedChapter row keyed by book,
+language pair and chapter index, so full-book and single-chapter
+translations write and read the same data and showing or re-translating
+one chapter touches one row. The TranslatedEpub keeps the translated title
+and metadata and is what jobs and the API refer to; the rows record which
+translation last wrote them.
+"""
+from typing import Dict, Iterable, List, Optional
+
+from django.db.models import Exists, OuterRef, Q
+
+from .content_hashes import chapter_hash
+from .models import Chapter, TranslatedChapter
+
+ROW_FIELDS = ('translation', 'status', 'title', 'content', 'content_hash', 'source_hash', 'segments', 'translated_at')
+
+
+def save_chapters(translation, chapters: Dict[int, Dict]) -> None:
+    """
+    Write the chapters of a translation, {chapter_index: {'title', 'content',
+    'source_hash', 'segments'}}. Chapters with status 'failed' are only
+    recorded where no earlier translation of them exists.
+    """
+    rows = {'done': [], 'failed': []}
+    for idx, chapter in chapters.items():
+        status = chapter.get('status', 'done')
+        content = (chapter.get('content') or '') if status == 'done' else ''
+        rows[status].append(TranslatedChapter(
+            extracted_epub_id=translation.extracted_epub_id,
+            source_lang=translation.source_lang,
+            target_lang=translation.target_lang,
+            chapter_index=idx,
+            translation=translation,
+            status=status,
+            title=chapter.get('title') or '',
+            content=content,
+            content_hash=chapter_hash(content) if content else '',
+            source_hash=chapter.get('source_hash') or '',
+            segments=chapter.get('segments') or {},
+        ))
+    if rows['done']:
+        TranslatedChapter.objects.bulk_create(
+            rows['done'], update_conflicts=True, update_fields=ROW_FIELDS,
+            unique_fields=('extracted_epub', 'source_lang', 'target_lang', 'chapter_index'),
+        )
+    if rows['failed']:
+        TranslatedChapter.objects.bulk_create(rows['failed'], ignore_conflicts=True)
+
+
+def chapter_map(extracted_epub, target_lang: str, source_langs: Optional[List[str]] = None,
+                indexes: Optional[Iterable[int]] = None) -> Dict[int, TranslatedChapter]:
+    """
+    Translated chapters of a book by index, optionally limited to some
+    indexes. Where several source languages match, earlier entries of
+    source_langs win, then the newest row.
+    """
+    qs = TranslatedChapter.objects.filter(extracted_epub=extracted_epub, target_lang=target_lang, status='done')
+    if source_langs is not None:
+        qs = qs.filter(source_lang__in=source_langs)
+    if indexes is not None:
+        qs = qs.filter(chapter_index__in=list(indexes))
+    rank = {lang: position for position, lang in enumerate(source_langs or [])}
+    found = {}
+    for row in qs.order_by('translated_at', 'pk'):
+        current = found.get(row.chapter_index)
+        if current is None or rank.get(row.source_lang, 0) <= rank.get(current.source_lang, 0):
+            found[row.chapter_index] = row
+    return found
+
+
+def rows_of(translation):
+    """Rows of the book and language pair covered by a translation."""
+    qs = TranslatedChapter.objects.filter(
+        extracted_epub_id=translation.extracted_epub_id, source_lang=translation.source_lang,
+        target_lang=translation.target_lang
+    )
+    if translation.chapter_index is not None:
+        qs = qs.filter(chapter_index=translation.chapter_index)
+    return qs.order_by('chapter_index')
+
+
+def chapters_of(translation) -> List[Dict]:
+    """
+    Chapters of a translation in the former translated_chapters layout.
+    Chapters whose translation failed carry the original content.
+    """
+    rows = list(rows_of(translation))
+    failed = [row.chapter_index for row in rows if row.status != 'done']
+    originals = dict(
+        Chapter.objects.filter(extracted_epub_id=translation.extracted_epub_id, index__in=failed)
+        .values_list('index', 'content')
+    ) if failed else {}
+    chapters = []
+    for row in rows:
+        content = row.content if row.status == 'done' else originals.get(row.chapter_index, '')
+        chapters.append({
+            'chapter_index': row.chapter_index, 'title': row.title, 'content': content,
+            'source_hash': row.source_hash, 'segments': row.segments,
+        })
+    return chapters
+
+
+def without_chapters(queryset):
+    """Translations of the queryset that have no translated chapter stored."""
+    rows = TranslatedChapter.objects.filter(
+        extracted_epub=OuterRef('extracted_epub'), source_lang=OuterRef('source_lang'),
+        target_lang=OuterRef('target_lang'), status='done'
+    )
+    return queryset.alias(
+        has_rows=Exists(rows), has_chapter_row=Exists(rows.filter(chapter_index=OuterRef('chapter_index')))
+    ).filter(Q(chapter_index__isnull=True, has_rows=False) | Q(chapter_index__isnull=False, has_chapter_row=False))
@@ -0,0 +1,215 @@
+"""
+Pluggable translation backends and the router that spreads calls over them.
+
+A backend is anything with translate(text) -> str for one language pair,
+built by a factory (source_lang, target_lang, **options). Built in:
+- google: deep_translator's GoogleTranslator on the pooled keep-alive
+  session (translator_pool);
+- echo: returns the text unchanged (or with a prefix); for tests and local
+  runs without a provider.
+Any other name is built from the "class" option of TRANSLATION_BACKEND_OPTIONS
+(a dotted path, e.g. "deep_translator.MyMemoryTranslator"); the remaining
+options, except the limiter ones, are passed to the constructor.
+
+TRANSLATION_BACKENDS lists the backends in use as "name" or "name:weight".
+The Router picks one for every provider call, at random in proportion to
+weight / measured latency, scaled by what is left of its daily quota.
+Backends whose circuit breaker is open or whose quota ran out are skipped,
+and translate_with_retry fails a call over to another backend. Every
+backend has its own rate limiter (provider_limiter), so the throughput of
+several providers adds up.
+"""
+import importlib
+import logging
+import random
+import threading
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from django.conf import settings
+
+from . import provider_limiter
+from .translation_engine import ThreadLocalTranslator
+
+log = logging.getLogger(__name__)
+
+# Options read by provider_limiter and the router, not passed to backend constructors
+LIMITER_OPTIONS = {'class', 'rate', 'burst', 'max_concurrency', 'daily_chars'}
+# Latency assumed for a backend before its first call
+DEFAULT_LATENCY_MS = 500.0
+_LATENCY_FLOOR_MS = 50.0
+_EWMA_ALPHA = 0.2
+# A failure multiplies a backend's latency by 1.5, up to 4x; the penalty halves every 30s
+_FAILURE_PENALTY = 1.5
+_MAX_PENALTY = 4.0
+_PENALTY_HALF_LIFE_S = 30.0
+
+
+class EchoBackend:
+    """Returns the text unchanged, optionally prefixed; a provider-free backend."""
+
+    def __init__(self, source: str = 'auto', target: str = 'en', prefix: str = ''):
+        self.source = source
+        self.target = target
+        self.prefix = prefix
+
+    def translate(self, text: str, **kwargs) -> str:
+        return f'{self.prefix}{text}' if self.prefix else text
+
+
+def _google(source: str, target: str, **options):
+    from .translator_pool import PooledGoogleTranslator
+    return PooledGoogleTranslator(source=source, target=target, **options)
+
+
+_REGISTRY: Dict[str, Callable[..., object]] = {
+    'google': _google,
+    'echo': EchoBackend,
+}
+
+
+def register_backend(name: str, factory: Callable[..., object]) -> None:
+    """Make a backend available under name; factory(source=..., target=..., **options)."""
+    _REGISTRY[name] = factory
+
+
+def _factory(name: str) -> Callable[..., object]:
+    path = provider_limiter.backend_option(name, 'class')
+    if path:
+        module, _, attr = path.rpartition('.')
+        return getattr(importlib.import_module(module), attr)
+    try:
+        return _REGISTRY[name]
+    except KeyError:
+        raise ValueError(f"Unknown translation backend '{name}'; set its class in TRANSLATION_BACKEND_OPTIONS")
+
+
+def create_backend(name: str, source_lang: str, target_lang: str):
+    """A client of a backend for one language pair."""
+    options = {
+        key: value for key, value in ((getattr(settings, 'TRANSLATION_BACKEND_OPTIONS', {}) or {}).get(name) or {}).items()
+        if key not in LIMITER_OPTIONS
+    }
+    return _factory(name)(source=source_lang, target=target_lang, **options)
+
+
+class BackendSpec(NamedTuple):
+    name: str
+    weight: float
+
+
+def configured_backends() -> List[BackendSpec]:
+    """TRANSLATION_BACKENDS parsed; google alone when unset."""
+    entries = getattr(settings, 'TRANSLATION_BACKENDS', None) or [provider_limiter.DEFAULT_PROVIDER]
+    if isinstance(entries, str):
+        entries = entries.split(',')
+    specs = []
+    for entry in entries:
+        name, _, weight = str(entry).strip().partition(':')
+        if name:
+            specs.append(BackendSpec(name.strip(), float(weight) if weight.strip() else 1.0))
+    return specs or [BackendSpec(provider_limiter.DEFAULT_PROVIDER, 1.0)]
+
+
+class _Health:
+    """
+    Latency per backend (EWMA of successful calls) times a failure penalty,
+    shared by the routers of a process. The penalty is bounded and decays
+    back to the measured latency, so a backend recovers its traffic after
+    an outage even without successful calls to pull it down.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latency: Dict[str, float] = {}
+        # name -> (penalty factor, monotonic time it was set)
+        self._penalty: Dict[str, Tuple[float, float]] = {}
+
+    def _penalty_now(self, name: str, now: float) -> float:
+        factor, since = self._penalty.get(name, (1.0, now))
+        return 1.0 + (factor - 1.0) * 0.5 ** ((now - since) / _PENALTY_HALF_LIFE_S)
+
+    def latency_ms(self, name: str) -> float:
+        with self._lock:
+            return self._latency.get(name, DEFAULT_LATENCY_MS) * self._penalty_now(name, time.monotonic())
+
+    def report(self, name: str, latency_ms: float, ok: bool) -> None:
+        with self._lock:
+            now = time.monotonic()
+            penalty = self._penalty_now(name, now)
+            if ok:
+                current = self._latency.get(name, DEFAULT_LATENCY_MS)
+                self._latency[name] = current + _EWMA_ALPHA * (latency_ms - current)
+                self._penalty[name] = (max(1.0, penalty / _FAILURE_PENALTY), now)
+            else:
+                # A failing backend gets less traffic before its breaker opens
+                self._penalty[name] = (min(_MAX_PENALTY, penalty * _FAILURE_PENALTY), now)
+
+
+health = _Health()
+
+
+class Router:
+    """
+    Translator of one language pair over the configured backends. It is
+    used like a client (translate), but translate_with_retry asks it for a
+    backend per call (route) so that limits, retries and failover apply per
+    backend.
+    """
+
+    def __init__(self, source_lang: str, target_lang: str, backends: Optional[Sequence[BackendSpec]] = None):
+        self.source_lang = source_lang
+        self.target_lang = target_lang
+        self.backends = list(backends or configured_backends())
+        # deep_translator clients keep per-request state; one per thread and backend
+        self._clients = {
+            spec.name: ThreadLocalTranslator(
+                lambda name=spec.name: create_backend(name, source_lang, target_lang)
+            )
+            for spec in self.backends
+        }
+
+    def _candidates(self, exclude) -> Tuple[List[Tuple[BackendSpec, float]], List[Tuple[BackendSpec, float]]]:
+        """(usable backends with their score, backends waiting for their breaker with the wait)."""
+        usable, blocked = [], []
+        for spec in self.backends:
+            if spec.name in exclude or spec.weight <= 0:
+                continue
+            limiter = provider_limiter.get_limiter(spec.name)
+            left = limiter.quota_left()
+            if left is not None and left <= 0:
+                continue
+            wait = limiter.open_for()
+            if wait > 0:
+                blocked.append((spec, wait))
+                continue
+            latency = max(health.latency_ms(spec.name), _LATENCY_FLOOR_MS)
+            usable.append((spec, spec.weight * (1.0 if left is None else left) / latency))
+        return usable, blocked
+
+    def route(self, exclude=()) -> Tuple[str, object]:
+        """(backend name, client) for the next call, avoiding the backends in exclude when possible."""
+        usable, blocked = self._candidates(exclude)
+        if not usable and not blocked and exclude:
+            usable, blocked = self._candidates(())
+        if usable:
+            spec = random.choices([spec for spec, _ in usable], weights=[score for _, score in usable])[0]
+        elif blocked:
+            # Every backend is paused: the one reopening first is used and its limiter waits for it
+            spec = min(blocked, key=lambda item: item[1])[0]
+        else:
+            raise provider_limiter.ProviderUnavailable(
+                f"No translation backend available for {self.source_lang}->{self.target_lang} (quotas exhausted)"
+            )
+        return spec.name, self._clients[spec.name]
+
+    def can_fail_over(self, failed) -> bool:
+        """Whether a backend outside failed can take the call right now."""
+        return bool(self._candidates(failed)[0])
+
+    def report(self, name: str, latency_ms: float, ok: bool) -> None:
+        health.report(name, latency_ms, ok)
+
+    def translate(self, text: str, **kwargs) -> str:
+        """A single call, without the limiter; translate_with_retry is the normal entry point."""
+        return self.route()[1].translate(text, **kwargs)
@@ -0,0 +1,87 @@
+"""
+Bounded-concurrency execution for translation work.
+
+Translation time is dominated by network waits, so chapters and request
+batches are run on a thread pool. Results always come back in input order.
+"""
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Iterable, List, Optional, TypeVar
+
+from django.conf import settings
+from django.db import connection
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+# SQLite has a single writer: a transaction that reads and then writes fails with
+# "database is locked" when another thread writes meanwhile, so writes made while
+# translation threads run (checkpoints, translation memory) take this lock
+db_write_lock = threading.RLock()
+
+
+def max_workers() -> int:
+    return max(1, getattr(settings, 'TRANSLATION_MAX_WORKERS', 4))
+
+
+def run_concurrently(fn: Callable[[T], R], items: Iterable[T], workers: int | None = None,
+                     on_result: Optional[Callable[[T, R], None]] = None) -> List[R]:
+    """
+    Apply fn to every item with at most `workers` calls in flight and return
+    the results in the order of items. With a single worker or item the calls
+    run inline in the current thread. on_result(item, result) is called in
+    the calling thread as each call finishes; database writes go there, as
+    concurrent writers from pool threads get "database is locked" on SQLite.
+    """
+    items = list(items)
+    workers = min(workers or max_workers(), len(items))
+    if workers <= 1:
+        results = []
+        for item in items:
+            results.append(fn(item))
+            if on_result:
+                on_result(item, results[-1])
+        return results
+
+    # Context variables (e.g. the telemetry collector) follow the work into the pool
+    context = contextvars.copy_context()
+
+    def _call(item):
+        try:
+            return context.copy().run(fn, item)
+        finally:
+            # Pool threads open their own DB connections; don't leak them
+            connection.close()
+
+    results: List[R] = [None] * len(items)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='translate') as pool:
+        futures = {pool.submit(_call, item): i for i, item in enumerate(items)}
+        for future in as_completed(futures):
+            i = futures[future]
+            results[i] = future.result()
+            if on_result:
+                on_result(items[i], results[i])
+    return results
+
+
+class ThreadLocalTranslator:
+    """
+    Wraps a translator factory so each thread gets its own client instance.
+    deep_translator clients keep per-request state on the instance and are
+    not safe to share between threads.
+    """
+
+    def __init__(self, factory: Callable[[], object]):
+        self._factory = factory
+        self._local = threading.local()
+
+    def _client(self):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._factory()
+            self._local.client = client
+        return client
+
+    def translate(self, text: str, **kwargs):
+        return self._client().translate(text, **kwargs)
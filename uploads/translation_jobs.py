@@ -0,0 +1,235 @@
+"""
+Translation job bookkeeping: every finished chapter is checkpointed as soon as
+it is translated, so a retried job resumes where the previous attempt stopped.
+"""
+from typing import Any, Dict, Iterator, List, Tuple
+
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import TranslationJob, TranslationCheckpoint
+from .translation_engine import db_write_lock
+from .translation_queues import priority_for
+from .segment_utils import merge_stats
+from .translation_telemetry import summarize, without_samples
+
+RESUMABLE_STATUSES = ('queued', 'running', 'failed')
+
+
+def get_or_create_job(extracted_epub, source_lang, target_lang, chapter_index=None, user_id=None, job_id=None,
+                      priority=None):
+    """Return the job to work on, resuming the latest unfinished one for the same request."""
+    if job_id:
+        return TranslationJob.objects.get(pk=job_id)
+    job = TranslationJob.objects.filter(
+        extracted_epub=extracted_epub,
+        source_lang=source_lang,
+        target_lang=target_lang,
+        chapter_index=chapter_index,
+        status__in=RESUMABLE_STATUSES,
+    ).order_by('-created_at').first()
+    if job:
+        return job
+    total = 1 if chapter_index is not None else extracted_epub.chapters.count()
+    return TranslationJob.objects.create(
+        user_id=user_id,
+        extracted_epub=extracted_epub,
+        source_lang=source_lang,
+        target_lang=target_lang,
+        chapter_index=chapter_index,
+        priority=priority or priority_for(chapter_index),
+        total_chapters=total,
+    )
+
+
+def chapter_indexes(job) -> List[int]:
+    if job.chapter_index is not None:
+        return [job.chapter_index]
+    return list(range(job.total_chapters))
+
+
+def pending_chapter_indexes(job) -> List[int]:
+    done = set(job.checkpoints.filter(status='done').values_list('chapter_index', flat=True))
+    return [idx for idx in chapter_indexes(job) if idx not in done]
+
+
+def mark_running(job) -> None:
+    job.status = 'running'
+    job.started_at = job.started_at or timezone.now()
+    job.error = ''
+    job.save(update_fields=['status', 'started_at', 'error', 'updated_at'])
+
+
+def _checkpoint_fields(content: str = '', text_nodes: int = 0, duration_ms: int = 0, error: str = '',
+                       stats: Dict | None = None, source_hash: str = '', segments: Dict | None = None,
+                       telemetry: Dict | None = None) -> Dict[str, Any]:
+    return {
+        'status': 'failed' if error else 'done',
+        'content': content if not error else '',
+        'text_nodes': text_nodes,
+        'duration_ms': duration_ms,
+        'error': error,
+        'stats': stats or {},
+        'source_hash': source_hash if not error else '',
+        'segments': segments if segments and not error else {},
+        'telemetry': telemetry or {},
+    }
+
+
+def _update_completed(job_ids: List[int]) -> None:
+    done = TranslationCheckpoint.objects.filter(job=OuterRef('pk'), status='done').values('job').annotate(
+        total=Count('pk')
+    ).values('total')
+    TranslationJob.objects.filter(pk__in=job_ids).update(
+        completed_chapters=Coalesce(Subquery(done), 0), updated_at=timezone.now()
+    )
+
+
+def save_checkpoint(job, chapter_index: int, content: str = '', text_nodes: int = 0,
+                    duration_ms: int = 0, error: str = '', stats: Dict | None = None,
+                    source_hash: str = '', segments: Dict | None = None,
+                    telemetry: Dict | None = None) -> TranslationCheckpoint:
+    with db_write_lock:
+        checkpoint, _ = TranslationCheckpoint.objects.update_or_create(
+            job=job,
+            chapter_index=chapter_index,
+            defaults=_checkpoint_fields(
+                content, text_nodes, duration_ms, error, stats, source_hash, segments, telemetry
+            ),
+        )
+        _update_completed([job.pk])
+    return checkpoint
+
+
+def save_checkpoints(chapter_index: int, results: List[Tuple[Any, Dict[str, Any]]]) -> None:
+    """
+    Checkpoint one chapter for several jobs with a single write. results
+    pairs each job with the keyword arguments save_checkpoint would take.
+    """
+    if not results:
+        return
+    rows = [
+        TranslationCheckpoint(job=job, chapter_index=chapter_index, **_checkpoint_fields(**fields))
+        for job, fields in results
+    ]
+    with db_write_lock:
+        TranslationCheckpoint.objects.bulk_create(
+            rows, update_conflicts=True, unique_fields=('job', 'chapter_index'),
+            update_fields=list(_checkpoint_fields()),
+        )
+        _update_completed([job.pk for job, _ in results])
+
+
+def iter_checkpointed_chapters(job) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """(chapter_index, {content, source_hash, segments}) of finished chapters, streamed in chapter order."""
+    rows = job.checkpoints.filter(status='done').order_by('chapter_index').values(
+        'chapter_index', 'content', 'source_hash', 'segments'
+    )
+    for row in rows.iterator():
+        yield row.pop('chapter_index'), row
+
+
+def checkpointed_text_nodes(job) -> int:
+    return job.checkpoints.aggregate(total=Sum('text_nodes'))['total'] or 0
+
+
+def checkpointed_stats(job) -> Dict[str, Any]:
+    """Sum of the per-chapter counters recorded in the checkpoints."""
+    totals: Dict[str, Any] = {}
+    for stats in job.checkpoints.values_list('stats', flat=True).iterator():
+        merge_stats(totals, stats)
+    return totals
+
+
+def job_telemetry(job, extra: Dict | None = None, duration_ms: int | None = None) -> Dict[str, Any]:
+    """Job-level telemetry merged from every chapter checkpoint plus extra (e.g. the headers)."""
+    snapshots = list(job.checkpoints.values_list('telemetry', flat=True))
+    return summarize(snapshots + [extra], duration_ms)
+
+
+def telemetry_report(job) -> Dict[str, Any]:
+    """Job and per-chapter telemetry for the API; live figures while the job runs."""
+    if job.telemetry:
+        totals = job.telemetry
+    else:
+        elapsed = int((timezone.now() - job.started_at).total_seconds() * 1000) if job.started_at else None
+        totals = job_telemetry(job, duration_ms=elapsed)
+    chapters = [
+        {'index': idx, 'status': status, **without_samples(telemetry)}
+        for idx, status, telemetry in job.checkpoints.order_by('chapter_index').values_list(
+            'chapter_index', 'status', 'telemetry'
+        )
+    ]
+    return {'job': without_samples(totals), 'chapters': chapters}
+
+
+def mark_finished(job, translation, telemetry: Dict | None = None) -> None:
+    """Close the job; chapters that failed keep it resumable as 'failed'."""
+    failed = list(job.checkpoints.filter(status='failed').values_list('chapter_index', 'error'))
+    job.translation = translation
+    job.telemetry = telemetry or {}
+    job.status = 'failed' if failed else 'completed'
+    job.error = '; '.join(f"chapter {idx}: {err}" for idx, err in failed)[:2000]
+    job.finished_at = timezone.now()
+    job.completed_chapters = job.checkpoints.filter(status='done').count()
+    job.save(update_fields=[
+        'translation', 'status', 'error', 'finished_at', 'completed_chapters', 'telemetry', 'updated_at'
+    ])
+    if not failed:
+        # Content now lives in the TranslatedChapter rows; keep these for progress reporting only
+        job.checkpoints.update(content='', segments={})
+
+
+def mark_shared(job, translation) -> None:
+    """Close a job served by cloning the translation of an identical book."""
+    job.checkpoints.all().delete()
+    TranslationCheckpoint.objects.bulk_create([
+        TranslationCheckpoint(job=job, chapter_index=idx, status='done', stats={'shared_chapters': 1})
+        for idx in chapter_indexes(job)
+    ])
+    mark_finished(job, translation)
+
+
+def mark_failed(job, error: str) -> None:
+    job.status = 'failed'
+    job.error = error[:2000]
+    job.save(update_fields=['status', 'error', 'updated_at'])
+
+
+def job_progress(job) -> Dict[str, Any]:
+    """Per-chapter progress, ETA and errors for the job status endpoint."""
+    checkpoints = {
+        cp['chapter_index']: cp for cp in job.checkpoints.values('chapter_index', 'status', 'duration_ms', 'error')
+    }
+    chapters = []
+    for idx in chapter_indexes(job):
+        cp = checkpoints.get(idx)
+        chapters.append({
+            'index': idx,
+            'status': cp['status'] if cp else 'pending',
+            'duration_ms': cp['duration_ms'] if cp else None,
+            'error': cp['error'] if cp and cp['error'] else None,
+        })
+    total = len(chapters)
+    done = sum(1 for ch in chapters if ch['status'] == 'done')
+    failed = sum(1 for ch in chapters if ch['status'] == 'failed')
+    remaining = total - done - failed
+
+    eta_seconds = None
+    if job.status == 'running' and job.started_at and done and remaining:
+        # Wall-clock rate already accounts for chapters translated in parallel
+        elapsed = (timezone.now() - job.started_at).total_seconds()
+        eta_seconds = int(elapsed / done * remaining)
+    elif job.status in ('completed', 'failed') and not remaining:
+        eta_seconds = 0
+
+    return {
+        'total_chapters': total,
+        'completed_chapters': done,
+        'failed_chapters': failed,
+        'percentage': round(done * 100.0 / total, 1) if total else 0.0,
+        'eta_seconds': eta_seconds,
+        'stats': checkpointed_stats(job),
+        'chapters': chapters,
+    }
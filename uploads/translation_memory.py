@@ -0,0 +1,184 @@
+"""
+Persistent segment-level translation memory.
+
+Segments are keyed by (source_lang, target_lang, sha256 of the normalized
+text). The TranslationMemory table is the source of truth; when
+TRANSLATION_MEMORY_REDIS_URL is set, Redis is used as a front tier with the
+same TTL.
+"""
+import hashlib
+import logging
+import re
+import unicodedata
+from datetime import timedelta
+from typing import Dict, Iterable, Sequence, Tuple
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from .models import TranslationMemory
+from .translation_engine import db_write_lock
+
+log = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r'\s+')
+_redis_client = None
+_redis_checked = False
+
+
+def is_enabled() -> bool:
+    return getattr(settings, 'TRANSLATION_MEMORY_ENABLED', True)
+
+
+def normalize_segment(text: str) -> str:
+    return _WHITESPACE.sub(' ', unicodedata.normalize('NFC', text or '')).strip()
+
+
+def segment_hash(text: str) -> str:
+    return hashlib.sha256(normalize_segment(text).encode('utf-8')).hexdigest()
+
+
+def _ttl_seconds() -> int:
+    return getattr(settings, 'TRANSLATION_MEMORY_TTL_DAYS', 180) * 86400
+
+
+def _redis():
+    global _redis_client, _redis_checked
+    if _redis_checked:
+        return _redis_client
+    _redis_checked = True
+    url = getattr(settings, 'TRANSLATION_MEMORY_REDIS_URL', '')
+    if not url:
+        return None
+    try:
+        import redis
+        _redis_client = redis.Redis.from_url(url, decode_responses=True)
+        _redis_client.ping()
+    except Exception as e:
+        log.warning(f"[TranslationMemory] Redis indisponível, usando apenas o banco: {e}")
+        _redis_client = None
+    return _redis_client
+
+
+def _redis_key(source_lang: str, target_lang: str, digest: str) -> str:
+    return f"tm:{source_lang}:{target_lang}:{digest}"
+
+
+def lookup(source_lang: str, target_lang: str, texts: Iterable[str]) -> Dict[str, str]:
+    """Return {segment_hash: translated_text} for every segment already in memory."""
+    digests = {segment_hash(text) for text in texts if text and text.strip()}
+    return lookup_many(source_lang, [target_lang], digests).get(target_lang, {})
+
+
+def lookup_many(source_lang: str, target_langs: Sequence[str], digests: Iterable[str]) -> Dict[str, Dict[str, str]]:
+    """{target_lang: {segment_hash: translated_text}} for several target languages in one pass."""
+    if not is_enabled():
+        return {}
+    digests = [d for d in set(digests) if d]
+    target_langs = list(dict.fromkeys(target_langs))
+    if not digests or not target_langs:
+        return {}
+
+    found: Dict[str, Dict[str, str]] = {lang: {} for lang in target_langs}
+    client = _redis()
+    if client is not None:
+        try:
+            keys = [(lang, d) for lang in target_langs for d in digests]
+            values = client.mget([_redis_key(source_lang, lang, d) for lang, d in keys])
+            for (lang, d), value in zip(keys, values):
+                if value is not None:
+                    found[lang][d] = value
+        except Exception as e:
+            log.warning(f"[TranslationMemory] Falha no Redis durante lookup: {e}")
+    for lang in target_langs:
+        _touch(source_lang, lang, list(found[lang]))
+
+    missing = sorted({d for lang in target_langs for d in digests if d not in found[lang]})
+    for start in range(0, len(missing), 500):
+        chunk = missing[start:start + 500]
+        rows = TranslationMemory.objects.filter(
+            source_lang=source_lang, target_lang__in=target_langs, segment_hash__in=chunk
+        ).values_list('target_lang', 'segment_hash', 'translated_text')
+        db_hits: Dict[str, Dict[str, str]] = {}
+        for lang, d, translated in rows:
+            if d not in found[lang]:
+                db_hits.setdefault(lang, {})[d] = translated
+        for lang, hits in db_hits.items():
+            _touch(source_lang, lang, list(hits))
+            _redis_set_many(source_lang, lang, hits)
+            found[lang].update(hits)
+    return found
+
+
+def _touch(source_lang: str, target_lang: str, digests: Sequence[str]) -> None:
+    """Count a hit and refresh last_used_at, whichever tier served it, so LRU pruning keeps hot entries."""
+    for start in range(0, len(digests), 500):
+        with db_write_lock:
+            TranslationMemory.objects.filter(
+                source_lang=source_lang, target_lang=target_lang, segment_hash__in=digests[start:start + 500]
+            ).update(hit_count=F('hit_count') + 1, last_used_at=timezone.now())
+
+
+def _redis_set_many(source_lang: str, target_lang: str, entries: Dict[str, str]) -> None:
+    client = _redis()
+    if client is None or not entries:
+        return
+    try:
+        pipe = client.pipeline(transaction=False)
+        for digest, translated in entries.items():
+            pipe.setex(_redis_key(source_lang, target_lang, digest), _ttl_seconds(), translated)
+        pipe.execute()
+    except Exception as e:
+        log.warning(f"[TranslationMemory] Falha no Redis durante escrita: {e}")
+
+
+def store(source_lang: str, target_lang: str, pairs: Iterable[Tuple[str, str]]) -> int:
+    """Persist (source_text, translated_text) pairs. Existing entries are kept."""
+    return store_many(source_lang, {target_lang: pairs})
+
+
+def store_many(source_lang: str, pairs_by_target: Dict[str, Iterable[Tuple[str, str]]]) -> int:
+    """Persist the pairs of several target languages with one insert."""
+    if not is_enabled():
+        return 0
+    entries: Dict[Tuple[str, str], TranslationMemory] = {}
+    for target_lang, pairs in pairs_by_target.items():
+        for source_text, translated_text in pairs:
+            if not source_text or not source_text.strip() or not translated_text:
+                continue
+            digest = segment_hash(source_text)
+            entries[(target_lang, digest)] = TranslationMemory(
+                source_lang=source_lang,
+                target_lang=target_lang,
+                segment_hash=digest,
+                source_text=normalize_segment(source_text),
+                translated_text=translated_text,
+            )
+    if not entries:
+        return 0
+    with db_write_lock:
+        TranslationMemory.objects.bulk_create(entries.values(), ignore_conflicts=True, batch_size=500)
+    for target_lang in pairs_by_target:
+        _redis_set_many(source_lang, target_lang, {
+            digest: entry.translated_text for (lang, digest), entry in entries.items() if lang == target_lang
+        })
+    return len(entries)
+
+
+def prune(ttl_days: int | None = None, max_entries: int | None = None) -> Dict[str, int]:
+    """Evict entries unused for ttl_days, then the least recently used ones above max_entries."""
+    ttl_days = ttl_days if ttl_days is not None else getattr(settings, 'TRANSLATION_MEMORY_TTL_DAYS', 180)
+    max_entries = max_entries if max_entries is not None else getattr(settings, 'TRANSLATION_MEMORY_MAX_ENTRIES', 2000000)
+
+    cutoff = timezone.now() - timedelta(days=ttl_days)
+    expired, _ = TranslationMemory.objects.filter(last_used_at__lt=cutoff).delete()
+
+    evicted = 0
+    overflow = TranslationMemory.objects.count() - max_entries
+    if overflow > 0:
+        lru_ids = list(TranslationMemory.objects.order_by('last_used_at').values_list('id', flat=True)[:overflow])
+        for start in range(0, len(lru_ids), 1000):
+            deleted, _ = TranslationMemory.objects.filter(id__in=lru_ids[start:start + 1000]).delete()
+            evicted += deleted
+    return {'expired': expired, 'evicted': evicted}
@@ -0,0 +1,67 @@
+"""
+Routing of translation work to the interactive and bulk Celery queues.
+
+Single-chapter requests from the reader are interactive: they go to their
+own queue, served by dedicated workers. Full-book jobs go to the bulk queue,
+as do prefetched chapters unless TRANSLATION_PREFETCH_QUEUE says otherwise.
+Bulk chapter subtasks check for waiting interactive jobs before starting
+a chapter and step back for a few seconds if there are any, so a saturated
+fleet frees capacity at the next chapter boundary.
+
+Run the workers as, e.g.:
+    celery -A epub_api worker -Q translate_interactive
+    celery -A epub_api worker -Q translate_bulk,celery
+"""
+from datetime import timedelta
+from typing import Dict
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import TranslationJob
+
+INTERACTIVE = 'interactive'
+BULK = 'bulk'
+PREFETCH = 'prefetch'
+
+
+def priority_for(chapter_index) -> str:
+    return INTERACTIVE if chapter_index is not None else BULK
+
+
+def queue_for(priority: str) -> str:
+    if priority == INTERACTIVE:
+        return getattr(settings, 'TRANSLATION_INTERACTIVE_QUEUE', 'translate_interactive')
+    if priority == PREFETCH:
+        return getattr(settings, 'TRANSLATION_PREFETCH_QUEUE', None) or getattr(
+            settings, 'TRANSLATION_BULK_QUEUE', 'translate_bulk'
+        )
+    return getattr(settings, 'TRANSLATION_BULK_QUEUE', 'translate_bulk')
+
+
+def task_options(job) -> Dict[str, str]:
+    """apply_async options for the task that runs a job."""
+    return {'queue': queue_for(job.priority)}
+
+
+def interactive_backlog(exclude_job_id=None) -> bool:
+    """Whether interactive jobs are waiting or running. Jobs idle for too long are ignored."""
+    stale_after = getattr(settings, 'TRANSLATION_INTERACTIVE_STALE_SECONDS', 300)
+    qs = TranslationJob.objects.filter(
+        priority=INTERACTIVE,
+        status__in=('queued', 'running'),
+        updated_at__gte=timezone.now() - timedelta(seconds=stale_after),
+    )
+    if exclude_job_id:
+        qs = qs.exclude(pk=exclude_job_id)
+    return qs.exists()
+
+
+def should_yield(job, yields_so_far: int) -> bool:
+    """Whether a bulk chapter should step back for interactive work before starting."""
+    if job.priority == INTERACTIVE:
+        return False
+    if yields_so_far >= getattr(settings, 'TRANSLATION_BULK_MAX_YIELDS', 60):
+        # Bulk work is never starved indefinitely
+        return False
+    return interactive_backlog(exclude_job_id=job.pk)
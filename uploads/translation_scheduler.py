@@ -0,0 +1,317 @@
+"""
+Fair-share scheduling of full-book translations.
+
+Chapters of full-book jobs wait in the database and dispatch() hands them
+to translate_chapter_task a few at a time: at most
+TRANSLATION_SCHEDULER_CAPACITY chapters are in flight overall and
+TRANSLATION_USER_MAX_IN_FLIGHT per user. Free slots go round-robin to the
+users with waiting chapters, least recently served first; each user's jobs
+are served in the order they were created. A user who queues a dozen books
+only ever holds their share of the workers, so another user's first
+chapter starts as soon as any chapter in flight finishes.
+
+Multi-target jobs (the same chapters in several target languages) are
+scheduled as one group: a chapter is claimed for every job of the group at
+once, takes one slot, and one translate_chapter_task translates it for all
+of them.
+
+A chapter in flight is a TranslationCheckpoint in status 'running' (a
+lease). Leases not renewed for TRANSLATION_SCHEDULER_LEASE_SECONDS are
+treated as lost and the chapter is dispatched again. dispatch() runs when
+a job is scheduled, after every chapter and periodically from beat.
+"""
+import logging
+import threading
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import TranslationCheckpoint, TranslationJob
+from .translation_jobs import chapter_indexes
+from .translation_queues import task_options
+
+log = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ('queued', 'running')
+
+_local = threading.local()
+
+
+class QueueState(NamedTuple):
+    # One job per scheduling unit: a job alone, or the first job of a group
+    jobs: List[TranslationJob]
+    waiting: Dict[int, List[int]]
+    in_flight: Dict[int, int]
+    # Jobs of each unit with the chapters each of them is still waiting for
+    members: Dict[int, List[Tuple[TranslationJob, Set[int]]]]
+
+
+def capacity() -> int:
+    return getattr(settings, 'TRANSLATION_SCHEDULER_CAPACITY', 8)
+
+
+def user_limit() -> int:
+    return getattr(settings, 'TRANSLATION_USER_MAX_IN_FLIGHT', 2)
+
+
+def lease_cutoff():
+    return timezone.now() - timedelta(seconds=getattr(settings, 'TRANSLATION_SCHEDULER_LEASE_SECONDS', 1800))
+
+
+def schedule(job, group_key: str = '') -> None:
+    """Hand a full-book job to the scheduler; chapters that failed in an earlier run are tried again."""
+    job.checkpoints.filter(status='failed').delete()
+    job.scheduled = True
+    job.group_key = group_key
+    if job.status != 'running':
+        job.status = 'queued'
+    job.error = ''
+    job.save(update_fields=['scheduled', 'group_key', 'status', 'error', 'updated_at'])
+
+
+def schedule_group(jobs: List[TranslationJob]) -> None:
+    """Hand full-book jobs of the same book in different target languages to the scheduler as one unit."""
+    group_key = uuid.uuid4().hex if len(jobs) > 1 else ''
+    for job in jobs:
+        schedule(job, group_key)
+
+
+def claimed_jobs(job, chapter_index: int) -> List[TranslationJob]:
+    """
+    The jobs a dispatched chapter is to be translated for: the job itself
+    unless the chapter is done, or every job of its group holding the lease.
+    """
+    if not job.group_key:
+        done = job.checkpoints.filter(chapter_index=chapter_index, status='done').exists()
+        return [] if done else [job]
+    return list(
+        TranslationJob.objects.select_related('extracted_epub')
+        .filter(group_key=job.group_key, checkpoints__chapter_index=chapter_index, checkpoints__status='running')
+        .order_by('created_at', 'pk')
+    )
+
+
+def group_jobs(job) -> List[TranslationJob]:
+    """The job and the other jobs of its group."""
+    if not job.group_key:
+        return [job]
+    return list(TranslationJob.objects.filter(group_key=job.group_key).order_by('created_at', 'pk'))
+
+
+def _leases(job, chapter_index: int):
+    jobs = {'job__group_key': job.group_key} if job.group_key else {'job': job}
+    return TranslationCheckpoint.objects.filter(chapter_index=chapter_index, status='running', **jobs)
+
+
+def renew_lease(job, chapter_index: int) -> None:
+    _leases(job, chapter_index).update(leased_at=timezone.now())
+
+
+def _state(jobs: List[TranslationJob]) -> QueueState:
+    cutoff = lease_cutoff()
+    taken = defaultdict(set)
+    running = defaultdict(set)
+    rows = TranslationCheckpoint.objects.filter(job__in=jobs).values_list(
+        'job_id', 'chapter_index', 'status', 'leased_at'
+    )
+    for job_id, idx, status, leased_at in rows.iterator():
+        if status == 'running':
+            if leased_at is None or leased_at < cutoff:
+                # Lost lease: the chapter is waiting again
+                continue
+            running[job_id].add(idx)
+        taken[job_id].add(idx)
+    units = {}
+    members = defaultdict(list)
+    for job in jobs:
+        unit = units.setdefault(job.group_key or job.pk, job)
+        members[unit.pk].append((job, {idx for idx in chapter_indexes(job) if idx not in taken[job.pk]}))
+    waiting = {
+        unit.pk: sorted(set().union(*(chapters for _, chapters in members[unit.pk])))
+        for unit in units.values()
+    }
+    # A chapter in flight for several jobs of a group takes one slot
+    in_flight = defaultdict(int, {
+        unit.pk: len(set().union(*(running[job.pk] for job, _ in members[unit.pk])))
+        for unit in units.values()
+    })
+    return QueueState(list(units.values()), waiting, in_flight, members)
+
+
+def _user_order(state: QueueState) -> List[Optional[int]]:
+    """Users with waiting chapters: never served first, then least recently served."""
+    first_seen = {}
+    last_served = {}
+    for position, job in enumerate(state.jobs):
+        first_seen.setdefault(job.user_id, position)
+        if job.dispatched_at and (job.user_id not in last_served or job.dispatched_at > last_served[job.user_id]):
+            last_served[job.user_id] = job.dispatched_at
+    users = {job.user_id for job in state.jobs if state.waiting[job.pk]}
+    return sorted(users, key=lambda user: (user in last_served, last_served.get(user), first_seen[user]))
+
+
+def _plan(state: QueueState, free: int) -> List[Tuple[TranslationJob, int]]:
+    """Round-robin over users, one chapter each per round, within the per-user limit."""
+    limit = user_limit()
+    user_in_flight = defaultdict(int)
+    queues = defaultdict(list)
+    for job in state.jobs:
+        user_in_flight[job.user_id] += state.in_flight[job.pk]
+        if state.waiting[job.pk]:
+            queues[job.user_id].append((job, list(state.waiting[job.pk])))
+    plan = []
+    order = _user_order(state)
+    while free > 0:
+        progressed = False
+        for user in order:
+            if free <= 0:
+                break
+            if user_in_flight[user] >= limit or not queues[user]:
+                continue
+            job, waiting = queues[user][0]
+            plan.append((job, waiting.pop(0)))
+            if not waiting:
+                queues[user].pop(0)
+            user_in_flight[user] += 1
+            free -= 1
+            progressed = True
+        if not progressed:
+            break
+    return plan
+
+
+def _claim(job, chapter_index: int) -> bool:
+    now = timezone.now()
+    try:
+        with transaction.atomic():
+            TranslationCheckpoint.objects.create(job=job, chapter_index=chapter_index, status='running', leased_at=now)
+        return True
+    except IntegrityError:
+        # Only an expired lease can be taken over
+        return TranslationCheckpoint.objects.filter(
+            job=job, chapter_index=chapter_index, status='running', leased_at__lt=lease_cutoff()
+        ).update(leased_at=now) == 1
+
+
+def _claim_next() -> List[Tuple[TranslationJob, int]]:
+    with transaction.atomic():
+        # Locking the active jobs serializes concurrent dispatchers
+        jobs = list(
+            TranslationJob.objects.select_for_update()
+            .filter(scheduled=True, status__in=ACTIVE_STATUSES)
+            .order_by('created_at', 'pk')
+        )
+        if not jobs:
+            return []
+        state = _state(jobs)
+        free = capacity() - sum(state.in_flight.values())
+        if free <= 0:
+            return []
+        claimed = []
+        job_ids = set()
+        for job, idx in _plan(state, free):
+            members = [
+                member for member, waiting in state.members[job.pk] if idx in waiting and _claim(member, idx)
+            ]
+            if members:
+                claimed.append((job, idx))
+                job_ids.update(member.pk for member in members)
+        if claimed:
+            now = timezone.now()
+            TranslationJob.objects.filter(pk__in=job_ids).update(dispatched_at=now, updated_at=now)
+            TranslationJob.objects.filter(pk__in=job_ids, status='queued').update(
+                status='running', started_at=Coalesce('started_at', Value(now))
+            )
+    return claimed
+
+
+def _publish(job, chapter_index: int) -> bool:
+    from .tasks import translate_chapter_task
+    try:
+        translate_chapter_task.apply_async(args=(job.pk, chapter_index), **task_options(job))
+        return True
+    except Exception as e:
+        # The chapter waits for the next dispatch
+        log.error(f"[Scheduler] Falha ao enfileirar job {job.pk} cap. {chapter_index+1}: {e}")
+        _leases(job, chapter_index).delete()
+        return False
+
+
+def dispatch() -> int:
+    """Hand the free slots to waiting chapters. Returns how many chapters were dispatched."""
+    if getattr(_local, 'active', False):
+        # Eager mode runs chapters inline; the outer call picks up the slots they free
+        return 0
+    _local.active = True
+    total = 0
+    try:
+        while True:
+            claimed = _claim_next()
+            if not claimed:
+                break
+            published = [(job.pk, idx) for job, idx in claimed if _publish(job, idx)]
+            total += len(published)
+            log.info(f"[Scheduler] {len(published)} capítulo(s) despachado(s): {published}")
+            if len(published) < len(claimed):
+                break
+    finally:
+        _local.active = False
+    return total
+
+
+def claim_assembly(job) -> bool:
+    """
+    Whether every chapter of the job is finished and this caller should
+    assemble it. Only one caller gets True.
+    """
+    finished = job.checkpoints.filter(status__in=('done', 'failed')).count()
+    if finished < len(chapter_indexes(job)):
+        return False
+    return TranslationJob.objects.filter(pk=job.pk, scheduled=True).update(scheduled=False) == 1
+
+
+def queue_status(job) -> Optional[Dict]:
+    """
+    Where a scheduled job stands: chapters in flight, chapters waiting and
+    queue position, i.e. one plus the number of chapters that go out
+    before its next one under round-robin. None for jobs not scheduled.
+    """
+    if not job.scheduled or job.status not in ACTIVE_STATUSES:
+        return None
+    jobs = list(TranslationJob.objects.filter(scheduled=True, status__in=ACTIVE_STATUSES).order_by('created_at', 'pk'))
+    if job.pk not in {j.pk for j in jobs}:
+        return None
+    state = _state(jobs)
+    unit = next(lead for lead in state.jobs if any(member.pk == job.pk for member, _ in state.members[lead.pk]))
+    waiting = next(len(chapters) for member, chapters in state.members[unit.pk] if member.pk == job.pk)
+    position = None
+    if waiting:
+        ahead_same_user = 0
+        for other in state.jobs:
+            if other.pk == unit.pk:
+                break
+            if other.user_id == job.user_id:
+                ahead_same_user += len(state.waiting[other.pk])
+        order = _user_order(state)
+        rank = order.index(job.user_id)
+        waiting_by_user = defaultdict(int)
+        for other in state.jobs:
+            waiting_by_user[other.user_id] += len(state.waiting[other.pk])
+        # Each round gives every other user one chapter; users ahead in the order also go first in ours
+        others = sum(
+            min(waiting_by_user[user], ahead_same_user + (1 if i < rank else 0))
+            for i, user in enumerate(order) if user != job.user_id
+        )
+        position = 1 + ahead_same_user + others
+    return {
+        'position': position,
+        'chapters_in_flight': state.in_flight[unit.pk],
+        'waiting_chapters': waiting,
+    }
@@ -0,0 +1,128 @@
+"""
+Provider telemetry for translation jobs: characters sent, calls, retries,
+backoff time, cache hit ratio, call latency percentiles, the HTTP
+connections opened (with their setup time) by the translator pool, and
+throttled calls, time spent waiting for the provider limiter and calls
+moved to another backend after a failure.
+
+A TranslationTelemetry collector is made current for the duration of a
+chapter (or of the job headers) with collect(); translate_with_retry and
+translate_segments report into whatever collector is current. The collector
+is propagated to the worker threads of run_concurrently and is thread-safe.
+"""
+import contextvars
+import math
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional
+
+_current: contextvars.ContextVar = contextvars.ContextVar('translation_telemetry', default=None)
+
+COUNTERS = (
+    'chars_sent', 'provider_calls', 'failed_calls', 'retries', 'backoff_ms', 'cache_hits', 'cache_misses',
+    'connections_opened', 'connect_ms', 'throttled_calls', 'limiter_wait_ms', 'failovers',
+)
+
+
+def percentile(samples: List[float], pct: float) -> Optional[int]:
+    """Nearest-rank percentile of the samples, or None when there are none."""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    rank = min(len(ordered), max(1, math.ceil(pct / 100.0 * len(ordered))))
+    return int(ordered[rank - 1])
+
+
+class TranslationTelemetry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters: Dict[str, int] = {key: 0 for key in COUNTERS}
+        self.latencies_ms: List[int] = []
+
+    def record_call(self, chars: int, latency_ms: float, ok: bool = True, throttled: bool = False) -> None:
+        with self._lock:
+            self.counters['chars_sent'] += chars
+            self.counters['provider_calls'] += 1
+            if not ok:
+                self.counters['failed_calls'] += 1
+            if throttled:
+                self.counters['throttled_calls'] += 1
+            self.latencies_ms.append(int(latency_ms))
+
+    def record_limiter_wait(self, wait_ms: float) -> None:
+        """Time a call waited for the breaker, a concurrency slot or a rate token."""
+        with self._lock:
+            self.counters['limiter_wait_ms'] += int(wait_ms)
+
+    def record_retry(self, backoff_ms: float) -> None:
+        with self._lock:
+            self.counters['retries'] += 1
+            self.counters['backoff_ms'] += int(backoff_ms)
+
+    def record_connection(self, connect_ms: float) -> None:
+        """A new provider connection (TCP + TLS handshake); reused keep-alive connections aren't counted."""
+        with self._lock:
+            self.counters['connections_opened'] += 1
+            self.counters['connect_ms'] += int(connect_ms)
+
+    def record_failover(self) -> None:
+        with self._lock:
+            self.counters['failovers'] += 1
+
+    def record_cache(self, hits: int, misses: int) -> None:
+        with self._lock:
+            self.counters['cache_hits'] += hits
+            self.counters['cache_misses'] += misses
+
+    def merge(self, snapshot: Optional[Dict]) -> 'TranslationTelemetry':
+        """Fold a stored snapshot (including its latency samples) into this collector."""
+        if not snapshot:
+            return self
+        with self._lock:
+            for key in COUNTERS:
+                self.counters[key] += int(snapshot.get(key) or 0)
+            self.latencies_ms.extend(snapshot.get('latencies_ms') or [])
+        return self
+
+    def snapshot(self, duration_ms: Optional[int] = None) -> Dict:
+        """JSON-serializable summary; latency samples are kept so snapshots can be merged."""
+        with self._lock:
+            data = dict(self.counters)
+            latencies = list(self.latencies_ms)
+        lookups = data['cache_hits'] + data['cache_misses']
+        data['cache_hit_ratio'] = round(data['cache_hits'] / lookups, 4) if lookups else None
+        data['latency_p50_ms'] = percentile(latencies, 50)
+        data['latency_p95_ms'] = percentile(latencies, 95)
+        data['latency_max_ms'] = max(latencies) if latencies else None
+        if duration_ms is not None:
+            data['duration_ms'] = duration_ms
+            data['chars_per_sec'] = round(data['chars_sent'] * 1000.0 / duration_ms, 1) if duration_ms else None
+        data['latencies_ms'] = latencies
+        return data
+
+
+def current() -> Optional[TranslationTelemetry]:
+    return _current.get()
+
+
+@contextmanager
+def collect(telemetry: TranslationTelemetry):
+    """Make telemetry the collector for translation calls made inside the block."""
+    token = _current.set(telemetry)
+    try:
+        yield telemetry
+    finally:
+        _current.reset(token)
+
+
+def summarize(snapshots: Iterable[Optional[Dict]], duration_ms: Optional[int] = None) -> Dict:
+    """Merge stored per-chapter snapshots into one job-level snapshot."""
+    telemetry = TranslationTelemetry()
+    for snapshot in snapshots:
+        telemetry.merge(snapshot)
+    return telemetry.snapshot(duration_ms)
+
+
+def without_samples(snapshot: Optional[Dict]) -> Dict:
+    """Snapshot as exposed by the API, without the raw latency samples."""
+    return {key: value for key, value in (snapshot or {}).items() if key != 'latencies_ms'}
@@ -0,0 +1,438 @@
+"""
+Helpers that sit between the translation tasks and the translation provider.
+
+Text nodes are packed into as few provider requests as possible: long texts
+are split at sentence boundaries and many short segments share one request,
+separated by a delimiter that survives translation. Segments are masked
+(segment_masks) before they are hashed, looked up and sent, so segments
+differing only in numbers, URLs or protected names are translated once.
+"""
+import logging
+import random
+import re
+import time
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from django.conf import settings
+
+from . import provider_limiter, segment_masks, translation_memory, translation_telemetry
+from .segment_utils import needs_translation, record_skipped
+from .translation_engine import run_concurrently
+
+log = logging.getLogger(__name__)
+
+MAX_REQUEST_CHARS = getattr(settings, 'TRANSLATION_MAX_REQUEST_CHARS', 4500)
+
+SEGMENT_DELIMITER = '\n[[#]]\n'
+_DELIMITER_SPLIT = re.compile(r'\s*\[\[\s*#\s*\]\]\s*')
+_SENTENCE_BOUNDARY = re.compile(
+    r'(?<=[.!?…])["\'”’»)\]]*\s+'
+    # CJK sentences usually end without a space after the full-width punctuation
+    r'|(?<=[。！？])(?![。！？])[」』”’）)\]]*\s*'
+)
+_WORD = re.compile(r'\S+')
+
+
+class Untranslated(str):
+    """
+    The source text returned in place of a translation when the provider
+    failed. It is still usable as text, but is never memorized nor recorded
+    for reuse, so the segment is retried on the next run. A successful
+    translation equal to its source (names, numbers, text already in the
+    target language) is a plain str and is kept like any other.
+    """
+
+
+def translate_with_retry(translator, text: str, retries: int = 2, backoff: float = 0.5) -> str:
+    """
+    One provider call paced by the limiter of its backend (provider_limiter),
+    retried with jittered exponential backoff. With a backend Router each
+    attempt is routed, and an attempt that failed on a degraded backend is
+    retried on another one right away. Returns the source text as
+    Untranslated when every attempt failed; raises ProviderUnavailable while every backend's circuit
+    breaker stays open, so the chapter fails and is retried instead of being
+    saved untranslated.
+    """
+    telemetry = translation_telemetry.current()
+    route = getattr(translator, 'route', None)
+    failed = set()
+    last_err = None
+    for attempt in range(retries + 1):
+        name, client = route(exclude=failed) if route else (provider_limiter.DEFAULT_PROVIDER, translator)
+        limiter = provider_limiter.get_limiter(name)
+        waited = limiter.acquire()
+        if telemetry and waited:
+            telemetry.record_limiter_wait(waited * 1000)
+        started = time.monotonic()
+        try:
+            result = client.translate(text)
+        except Exception as e:
+            last_err = e
+            latency_ms = (time.monotonic() - started) * 1000
+            failure = provider_limiter.is_provider_failure(e)
+            throttled = provider_limiter.is_throttle(e)
+            limiter.release(ok=False if failure else None, throttled=throttled)
+            if route:
+                translator.report(name, latency_ms, ok=False)
+            if telemetry:
+                telemetry.record_call(len(text), latency_ms, ok=False, throttled=throttled)
+            if attempt < retries:
+                if failure and route:
+                    failed.add(name)
+                    if translator.can_fail_over(failed):
+                        log.warning(f"[Backends] {name} falhou ({type(e).__name__}); tentando outro provedor")
+                        if telemetry:
+                            telemetry.record_failover()
+                        continue
+                # Full jitter keeps workers that failed together from retrying together
+                delay = random.uniform(0, backoff * (2 ** attempt))
+                if telemetry:
+                    telemetry.record_retry(delay * 1000)
+                time.sleep(delay)
+            continue
+        latency_ms = (time.monotonic() - started) * 1000
+        limiter.release(ok=True)
+        limiter.use_quota(len(text))
+        if route:
+            translator.report(name, latency_ms, ok=True)
+        if telemetry:
+            telemetry.record_call(len(text), latency_ms)
+        return result if result is not None else text
+    print(f"Translation failed after retries: {last_err}")
+    return Untranslated(text)
+
+
+def _strip_span(text: str, start: int, end: int) -> Tuple[int, int]:
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+
+def _sentence_spans(text: str) -> List[Tuple[int, int]]:
+    """(start, end) of every sentence of text, without the whitespace around it."""
+    spans = []
+    start = 0
+    for match in _SENTENCE_BOUNDARY.finditer(text):
+        spans.append(_strip_span(text, start, match.end()))
+        start = match.end()
+    spans.append(_strip_span(text, start, len(text)))
+    return [(s, e) for s, e in spans if e > s]
+
+
+def split_sentences(text: str) -> List[str]:
+    """Split text after sentence-ending punctuation, keeping the punctuation."""
+    return [text[s:e] for s, e in _sentence_spans(text)]
+
+
+def _word_spans(text: str, start: int, end: int, max_len: int) -> Iterable[Tuple[int, int]]:
+    """Words of text[start:end]; words longer than max_len (or unspaced CJK runs) are cut every max_len characters."""
+    for match in _WORD.finditer(text, start, end):
+        s, e = match.span()
+        while e - s > max_len:
+            yield s, s + max_len
+            s += max_len
+        yield s, e
+
+
+def split_chunks(text: str, max_len: int) -> List[Tuple[str, str]]:
+    """
+    Sentence-aware packing: pieces of at most max_len characters, each
+    filled with as many whole sentences as fit, paired with the whitespace
+    that followed them in text ('' between CJK sentences or inside a word).
+    Pieces are slices of text, so join_chunks puts translations back
+    together with the source's separators. Sentences longer than max_len
+    fall back to word splitting.
+    """
+    if len(text) <= max_len:
+        return [(text, '')]
+    # Whole sentences are packed together, the words of a long sentence only with each other
+    spans = []
+    for start, end in _sentence_spans(text):
+        if end - start <= max_len:
+            units = [(start, end, None)]
+        else:
+            units = [(s, e, start) for s, e in _word_spans(text, start, end, max_len)]
+        for s, e, group in units:
+            if spans and spans[-1][2] == group and e - spans[-1][0] <= max_len:
+                spans[-1] = (spans[-1][0], e, group)
+            else:
+                spans.append((s, e, group))
+    return [
+        (text[s:e], text[e:spans[i + 1][0]] if i + 1 < len(spans) else '')
+        for i, (s, e, _) in enumerate(spans)
+    ]
+
+
+def chunk_text(text: str, max_len: int) -> Iterable[str]:
+    """The pieces of split_chunks."""
+    for piece, _ in split_chunks(text, max_len):
+        yield piece
+
+
+def join_chunks(translated: Sequence[str], chunks: Sequence[Tuple[str, str]]) -> str:
+    """Join the translations of the pieces of split_chunks with the separators of the source."""
+    return ''.join(piece + separator for piece, (_, separator) in zip(translated, chunks))
+
+
+def build_batches(pieces: Sequence[str], max_chars: int) -> List[List[int]]:
+    """Group piece indices so each joined request stays within max_chars."""
+    batches: List[List[int]] = []
+    current: List[int] = []
+    current_len = 0
+    for i, piece in enumerate(pieces):
+        add_len = len(piece) + (len(SEGMENT_DELIMITER) if current else 0)
+        if current and current_len + add_len > max_chars:
+            batches.append(current)
+            current, current_len = [], 0
+            add_len = len(piece)
+        current.append(i)
+        current_len += add_len
+    if current:
+        batches.append(current)
+    return batches
+
+
+def translate_batch(translator, pieces: Sequence[str]) -> List[str]:
+    """
+    Translate several pieces with a single provider call. If the provider
+    mangles the delimiters, the pieces are translated one by one instead.
+    Pieces the provider failed on come back as Untranslated.
+    """
+    if len(pieces) == 1:
+        return [translate_with_retry(translator, pieces[0])]
+    joined = SEGMENT_DELIMITER.join(pieces)
+    translated = translate_with_retry(translator, joined)
+    if isinstance(translated, Untranslated):
+        return [Untranslated(piece) for piece in pieces]
+    parts = _DELIMITER_SPLIT.split(translated.strip())
+    if len(parts) == len(pieces):
+        return [part or Untranslated(piece) for part, piece in zip(parts, pieces)]
+    log.warning(f"[Batch] Delimitadores perdidos ({len(parts)}/{len(pieces)}); traduzindo segmentos individualmente")
+    return [translate_with_retry(translator, piece) for piece in pieces]
+
+
+class SegmentPlan(NamedTuple):
+    """The target-independent work on a list of segments, done once whatever the number of target languages."""
+    texts: List[str]
+    max_chars: int
+    passthrough: FrozenSet[int]
+    # Segment hash (of the masked text) of every segment that needs translating, None for the others
+    digests: List[Optional[str]]
+    # Distinct masked (stripped) texts and the indexes holding them
+    unique: Dict[str, List[int]]
+    # Request-sized (piece, separator) chunks of the distinct texts, split on first use
+    pieces: Dict[str, List[Tuple[str, str]]]
+    # Values of the placeholders of every segment (see segment_masks)
+    masks: List[Dict[str, str]]
+
+
+class SegmentTarget(NamedTuple):
+    """A target language of translate_segments_multi with its per-call arguments (see translate_segments)."""
+    target_lang: Optional[str]
+    translator: object
+    stats: Optional[Dict] = None
+    reuse: Optional[Dict[str, str]] = None
+    record: Optional[Dict[str, str]] = None
+    # Collector for this target's calls; defaults to the current one
+    telemetry: Optional[translation_telemetry.TranslationTelemetry] = None
+
+
+def plan_segments(texts: Sequence[str], max_chars: int | None = None) -> SegmentPlan:
+    """Classify, mask, hash and deduplicate segments ahead of translating them."""
+    masked = [segment_masks.mask(text) for text in texts]
+    passthrough = frozenset(
+        i for i, text in enumerate(texts)
+        if text and text.strip() and not needs_translation(segment_masks.strip_masks(masked[i][0]))
+    )
+    digests: List[Optional[str]] = [None] * len(texts)
+    unique: Dict[str, List[int]] = {}
+    for i, text in enumerate(texts):
+        if i in passthrough or not text or not text.strip():
+            continue
+        digests[i] = translation_memory.segment_hash(masked[i][0])
+        unique.setdefault(masked[i][0].strip(), []).append(i)
+    return SegmentPlan(
+        list(texts), max_chars or MAX_REQUEST_CHARS, passthrough, digests, unique, {}, [values for _, values in masked]
+    )
+
+
+def covers_segments(segments: Dict[str, str] | None, texts: Sequence[str]) -> bool:
+    """
+    Whether a segment hash -> translation map of an earlier run (see record
+    in translate_segments) has every segment of texts that needs translating.
+    Segments the provider failed on are left out of it, so a chapter with
+    such segments is not complete even when its source is unchanged.
+    """
+    plan = plan_segments(texts)
+    segments = segments or {}
+    return all(plan.digests[indexes[0]] in segments for indexes in plan.unique.values())
+
+
+def _pieces(plan: SegmentPlan, text: str) -> List[Tuple[str, str]]:
+    pieces = plan.pieces.get(text)
+    if pieces is None:
+        pieces = plan.pieces[text] = split_chunks(text, plan.max_chars)
+    return pieces
+
+
+def translate_segments(translator, texts: Sequence[str], max_chars: int | None = None,
+                       source_lang: str | None = None, target_lang: str | None = None,
+                       max_workers: int | None = 1, stats: Dict | None = None,
+                       reuse: Dict[str, str] | None = None, record: Dict[str, str] | None = None) -> List[str]:
+    """
+    Translate a list of segments using as few provider requests as possible.
+    Returns the translations in the same order as texts; blank segments are
+    returned unchanged. When the language pair is given, the translation
+    memory is consulted first and only misses reach the provider. Up to
+    max_workers requests are sent concurrently (None means
+    TRANSLATION_MAX_WORKERS); the translator must then be thread-safe.
+    Segments that need no translation (numbers, URLs, separators) are passed
+    through and counted in stats.
+
+    reuse maps segment hashes to translations from a previous run of the same
+    chapter and is checked before anything else; record, when given, is
+    filled with the segment hash -> translation map of this run.
+    """
+    target = SegmentTarget(target_lang, translator, stats, reuse, record)
+    return translate_segments_multi([target], texts, source_lang, max_chars, max_workers)[0]
+
+
+def translate_segments_multi(targets: Sequence[SegmentTarget], texts: Sequence[str], source_lang: str | None = None,
+                             max_chars: int | None = None, max_workers: int | None = 1,
+                             plan: SegmentPlan | None = None) -> List[List[str]]:
+    """
+    Translate the same segments into several target languages, like one
+    translate_segments call per target. Classification, hashing and
+    chunking are done once (or passed in as plan); the translation memory is
+    read and written for every target in one query each, and the request
+    batches of all targets share a pool of max_workers. Returns the
+    translations of each target, in the order of targets.
+    """
+    plan = plan or plan_segments(texts, max_chars)
+    texts = plan.texts
+    skipped = [texts[i] for i in plan.passthrough]
+
+    resolved: List[Dict[str, str]] = []
+    for target in targets:
+        record_skipped(target.stats, skipped)
+        found = {}
+        if target.reuse:
+            for text, indexes in plan.unique.items():
+                previous = target.reuse.get(plan.digests[indexes[0]])
+                if previous is not None:
+                    found[text] = previous
+            if target.stats is not None:
+                reused = sum(len(plan.unique[text]) for text in found)
+                target.stats['reused_segments'] = target.stats.get('reused_segments', 0) + reused
+        resolved.append(found)
+
+    memory_langs = [target.target_lang for target in targets if source_lang and target.target_lang]
+    if memory_langs:
+        wanted = {
+            plan.digests[indexes[0]]
+            for target, found in zip(targets, resolved) if target.target_lang in memory_langs
+            for text, indexes in plan.unique.items() if text not in found
+        }
+        hits = translation_memory.lookup_many(source_lang, memory_langs, wanted)
+        for target, found in zip(targets, resolved):
+            memory = hits.get(target.target_lang) or {}
+            for text, indexes in plan.unique.items():
+                translated = memory.get(plan.digests[indexes[0]])
+                if translated is not None and text not in found:
+                    found[text] = translated
+
+    # Identical segments are only sent once per target
+    pending: List[List[str]] = []
+    work = []
+    for position, (target, found) in enumerate(zip(targets, resolved)):
+        missing = [text for text in plan.unique if text not in found]
+        telemetry = target.telemetry or translation_telemetry.current()
+        if telemetry:
+            hits = sum(len(plan.unique[text]) for text in found)
+            telemetry.record_cache(hits, sum(len(plan.unique[text]) for text in missing))
+        pending.append(missing)
+        pieces = [piece for text in missing for piece, _ in _pieces(plan, text)]
+        work.extend((position, [pieces[i] for i in batch]) for batch in build_batches(pieces, plan.max_chars))
+
+    def _translate(item):
+        target = targets[item[0]]
+        if target.telemetry is None:
+            return translate_batch(target.translator, item[1])
+        with translation_telemetry.collect(target.telemetry):
+            return translate_batch(target.translator, item[1])
+
+    translated_by_target: List[List[str]] = [[] for _ in targets]
+    for (position, batch), batch_results in zip(work, run_concurrently(_translate, work, max_workers)):
+        translated_by_target[position].extend(
+            result or Untranslated(piece) for piece, result in zip(batch, batch_results)
+        )
+
+    results: List[List[str]] = []
+    learned: Dict[str, List[Tuple[str, str]]] = {}
+    for target, found, missing, translated_pieces in zip(targets, resolved, pending, translated_by_target):
+        found = dict(found)
+        # Texts without a reusable translation: provider failures and mangled placeholders
+        unrecorded = set()
+        offset = 0
+        for text in missing:
+            chunks = _pieces(plan, text)
+            pieces = translated_pieces[offset:offset + len(chunks)]
+            offset += len(chunks)
+            translated = join_chunks(pieces, chunks)
+            found[text] = translated
+            # A translation that lost placeholders can't be reused for other values either
+            if any(isinstance(piece, Untranslated) for piece in pieces) or not _restorable(plan, text, translated):
+                unrecorded.add(text)
+            elif target.target_lang in memory_langs:
+                learned.setdefault(target.target_lang, []).append((text, translated))
+        out = list(texts)
+        for text, translated in found.items():
+            indexes = plan.unique[text]
+            if not _restorable(plan, text, translated):
+                unrecorded.add(text)
+                _translate_unmasked(target, plan, indexes, out)
+                continue
+            for i in indexes:
+                out[i] = segment_masks.unmask(translated, plan.masks[i])
+        _record_segments(target.record, plan, found, unrecorded)
+        results.append(out)
+    if learned:
+        try:
+            translation_memory.store_many(source_lang, learned)
+        except Exception as e:
+            log.warning(f"[Batch] Falha ao gravar memória de tradução: {e}")
+    return results
+
+
+def _restorable(plan: SegmentPlan, text: str, translated: str) -> bool:
+    """Whether a translation of a masked text still has each of its placeholders once."""
+    values = plan.masks[plan.unique[text][0]]
+    return not values or segment_masks.unmask(translated, values) is not None
+
+
+def _translate_unmasked(target: SegmentTarget, plan: SegmentPlan, indexes: Sequence[int], out: List[str]) -> None:
+    """Fallback for a masked translation whose placeholders the provider mangled: each instance is sent as is."""
+    log.warning(f"[Batch] Marcadores perdidos na tradução; traduzindo {len(indexes)} segmento(s) sem máscara")
+    for i in indexes:
+        chunks = split_chunks(plan.texts[i].strip(), plan.max_chars)
+        pieces = [piece for piece, _ in chunks]
+        if target.telemetry is None:
+            out[i] = join_chunks(translate_batch(target.translator, pieces), chunks)
+        else:
+            with translation_telemetry.collect(target.telemetry):
+                out[i] = join_chunks(translate_batch(target.translator, pieces), chunks)
+
+
+def _record_segments(record: Dict[str, str] | None, plan: SegmentPlan, found: Dict[str, str],
+                     unrecorded: Iterable[str] = ()) -> None:
+    """Fill record with segment hash -> (masked) translation, as reuse expects it on the next run."""
+    if record is None:
+        return
+    unrecorded = set(unrecorded)
+    for text, translated in found.items():
+        # Provider failures are left out so they are retried next time
+        if text not in unrecorded:
+            for i in plan.unique[text]:
+                record[plan.digests[i]] = translated
@@ -0,0 +1,153 @@
+"""
+Per-process pool of translator clients.
+
+deep_translator's GoogleTranslator calls requests.get for every request,
+so each provider call paid a new TCP connection and TLS handshake, and
+every job built its own clients. Here all clients of a process share one
+keep-alive requests.Session with a connection pool, and the translator
+of a language pair (a translation_backends.Router over the configured
+backends) is built once and reused by every task the (Celery) worker
+runs. Opening a connection is timed and reported to the current
+telemetry collector (connections_opened, connect_ms), so a warm pool
+shows up as calls without connections.
+"""
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import requests
+from bs4 import BeautifulSoup
+from deep_translator import GoogleTranslator
+from deep_translator.exceptions import RequestError, TooManyRequests, TranslationNotFound
+from deep_translator.validate import is_empty, is_input_valid, request_failed
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from . import translation_telemetry
+
+_lock = threading.Lock()
+_session: Optional[requests.Session] = None
+_session_pid: Optional[int] = None
+_translators: Dict[Tuple[str, str], object] = {}
+
+
+def _record_connect(started: float) -> None:
+    telemetry = translation_telemetry.current()
+    if telemetry:
+        telemetry.record_connection((time.monotonic() - started) * 1000)
+
+
+class _TimedHTTPConnection(HTTPConnection):
+    def connect(self):
+        started = time.monotonic()
+        super().connect()
+        _record_connect(started)
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        started = time.monotonic()
+        super().connect()
+        _record_connect(started)
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _TimedAdapter(HTTPAdapter):
+    """HTTPAdapter whose new connections report their setup time."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _TimedHTTPConnectionPool, 'https': _TimedHTTPSConnectionPool,
+        }
+
+
+def pool_size() -> int:
+    return getattr(settings, 'TRANSLATION_HTTP_POOL_SIZE', 16)
+
+
+def timeout() -> float:
+    return getattr(settings, 'TRANSLATION_HTTP_TIMEOUT', 30)
+
+
+def session() -> requests.Session:
+    """The keep-alive session of this process; rebuilt after a fork (Celery prefork children)."""
+    global _session, _session_pid
+    with _lock:
+        if _session is None or _session_pid != os.getpid():
+            new = requests.Session()
+            adapter = _TimedAdapter(pool_connections=4, pool_maxsize=pool_size())
+            new.mount('https://', adapter)
+            new.mount('http://', adapter)
+            _session, _session_pid = new, os.getpid()
+            _translators.clear()
+        return _session
+
+
+class PooledGoogleTranslator(GoogleTranslator):
+    """
+    GoogleTranslator sending its requests through the shared session, with a
+    timeout. Reimplements translate() on top of deep_translator internals
+    (_url_params, _base_url, element queries), hence the pinned version in
+    requirements.txt; check this class when upgrading it.
+    """
+
+    def translate(self, text: str, **kwargs) -> str:
+        if not is_input_valid(text, max_chars=5000):
+            return text
+        text = text.strip()
+        if self._same_source_target() or is_empty(text):
+            return text
+        self._url_params['tl'] = self._target
+        self._url_params['sl'] = self._source
+        if self.payload_key:
+            self._url_params[self.payload_key] = text
+
+        response = session().get(self._base_url, params=self._url_params, proxies=self.proxies, timeout=timeout())
+        try:
+            if response.status_code == 429:
+                raise TooManyRequests()
+            if request_failed(status_code=response.status_code):
+                raise RequestError()
+            soup = BeautifulSoup(response.text, 'html.parser')
+        finally:
+            # Hands the connection back to the pool
+            response.close()
+
+        element = soup.find(self._element_tag, self._element_query)
+        if not element:
+            element = soup.find(self._element_tag, self._alt_element_query)
+            if not element:
+                raise TranslationNotFound(text)
+        translated = element.get_text(strip=True)
+        if translated == text:
+            source_alpha = ''.join(ch for ch in text if ch.isalnum())
+            translated_alpha = ''.join(ch for ch in translated if ch.isalnum())
+            # Same text back: retry once without the interface language hint, like deep_translator does
+            if source_alpha and translated_alpha and source_alpha == translated_alpha and 'hl' in self._url_params:
+                del self._url_params['hl']
+                return self.translate(text)
+        return translated
+
+
+def get_translator(source_lang: str, target_lang: str):
+    """The translator (backend router) of a language pair, shared by every task of this process."""
+    from .translation_backends import Router
+
+    session()
+    key = (source_lang, target_lang)
+    with _lock:
+        translator = _translators.get(key)
+        if translator is None:
+            translator = _translators[key] = Router(source_lang, target_lang)
+        return translator
@@ -15,6 +15,8 @@ urlpatterns = [
     path('translations/<int:pk>/delete/', views.DeleteTranslationView.as_view(), name='delete-translation'),
     path('extract/<int:pk>/', views.ExtractEpubView.as_view(), name='extract-epub'),
     path('translate/<int:pk>/', views.TranslateEpubView.as_view(), name='translate-epub'),
+    path('translation-jobs/<int:pk>/', views.TranslationJobStatusView.as_view(), name='translation-job-status'),
+    path('translation-jobs/<int:pk>/telemetry/', views.TranslationJobTelemetryView.as_view(), name='translation-job-telemetry'),
     path('downloads/', views.DownloadsView.as_view(), name='downloads'),
     path('audit-logs/', views.AuditLogsView.as_view(), name='audit-logs'),
     path('download/original/<int:pk>/', views.DownloadOriginalView.as_view(), name='download-original'),
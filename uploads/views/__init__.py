@@ -45,6 +45,11 @@ from .import_views import (
     AO3ImportView,
 )
 
+from .jobs import (
+    TranslationJobStatusView,
+    TranslationJobTelemetryView,
+)
+
 # Keep all legacy imports available for backward compatibility
 __all__ = [
     # Authentication
@@ -85,4 +90,8 @@ __all__ = [
     
     # Import
     'AO3ImportView',
+
+    # Translation jobs
+    'TranslationJobStatusView',
+    'TranslationJobTelemetryView',
 ]
\ No newline at end of file
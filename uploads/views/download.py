@@ -12,6 +12,7 @@ import ebooklib
 
 from ..models import UploadedFile, ExtractedEpub, TranslatedEpub, AuditLog
 from ..serializers import UploadedFileSerializer, ExtractedEpubSerializer, TranslatedEpubSerializer
+from ..translated_chapters import chapter_map, rows_of
 
 
 class DownloadsView(generics.ListAPIView):
@@ -31,7 +32,7 @@ class DownloadsView(generics.ListAPIView):
             if extracted:
                 extracted_data = ExtractedEpubSerializer(extracted).data
                 translations = TranslatedEpub.objects.filter(extracted_epub=extracted)
-                translations_data = TranslatedEpubSerializer(translations, many=True).data
+                translations_data = TranslatedEpubSerializer(translations, many=True, context={'with_chapters': False}).data
             data.append({
                 'file': file_data,
                 'extracted': extracted_data,
@@ -77,19 +78,10 @@ class DownloadTranslatedView(generics.RetrieveAPIView):
         # Get document items
         doc_items = [item for item in original_book.get_items() if item.get_type() == ebooklib.ITEM_DOCUMENT]
         
-        # Replace content with translated
-        if translation.translated_chapters:
-            if translation.chapter_index is not None:
-                # Single-chapter translation: replace only that specific chapter
-                idx = translation.chapter_index
-                if 0 <= idx < len(doc_items) and len(translation.translated_chapters) > 0:
-                    doc_items[idx].set_content(translation.translated_chapters[0]['content'].encode('utf-8'))
-            else:
-                # Full translation: replace all chapters sequentially
-                for i, item in enumerate(doc_items):
-                    if i < len(translation.translated_chapters):
-                        translated_content = translation.translated_chapters[i]['content']
-                        item.set_content(translated_content.encode('utf-8'))
+        # Replace content with translated; a single-chapter translation only covers its chapter
+        for row in rows_of(translation).filter(status='done'):
+            if 0 <= row.chapter_index < len(doc_items):
+                doc_items[row.chapter_index].set_content(row.content.encode('utf-8'))
         
         # Update title if full translation
         if translation.chapter_index is None and translation.translated_title:
@@ -150,30 +142,16 @@ class DownloadMixedView(generics.GenericAPIView):
             else:
                 return Response({'error': 'target_lang is required'}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Prefer a full translation if exists
-        full_translation = translations_qs.filter(target_lang=target_lang, chapter_index__isnull=True).first()
-
         original_book = epub.read_epub(uploaded_file.file.path)
         doc_items = [item for item in original_book.get_items() if item.get_type() == ebooklib.ITEM_DOCUMENT]
 
-        if full_translation and full_translation.translated_chapters:
-            for i, item in enumerate(doc_items):
-                if i < len(full_translation.translated_chapters):
-                    item.set_content(full_translation.translated_chapters[i]['content'].encode('utf-8'))
-            if full_translation.translated_title:
-                original_book.set_title(full_translation.translated_title)
-        else:
-            # Merge partials for the selected target language
-            chapter_map = {}
-            partials = translations_qs.filter(target_lang=target_lang, chapter_index__isnull=False)
-            for t in partials:
-                if t.translated_chapters and len(t.translated_chapters) > 0 and t.chapter_index is not None:
-                    chapter_map[t.chapter_index] = t.translated_chapters[0]['content']
-
-            for idx, item in enumerate(doc_items):
-                if idx in chapter_map:
-                    item.set_content(chapter_map[idx].encode('utf-8'))
-                # else keep original content
+        # Full-book and single-chapter translations are the same per-chapter rows; missing ones keep the original
+        for idx, row in chapter_map(extracted, target_lang).items():
+            if 0 <= idx < len(doc_items):
+                doc_items[idx].set_content(row.content.encode('utf-8'))
+        full_translation = translations_qs.filter(target_lang=target_lang, chapter_index__isnull=True).first()
+        if full_translation and full_translation.translated_title:
+            original_book.set_title(full_translation.translated_title)
 
         # Write out epub
         with tempfile.NamedTemporaryFile(suffix='.epub', delete=False) as tmp_file:
@@ -1,19 +1,26 @@
 import logging
-import re
 import traceback
-from bs4 import BeautifulSoup
+from contextlib import ExitStack
 
 from rest_framework import generics, status
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from django.db.models import Count
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
 
 from ..models import (
-    UploadedFile, ExtractedEpub, TranslatedEpub, AuditLog, ReadingProgress
+    UploadedFile, ExtractedEpub, TranslatedEpub, AuditLog, ReadingProgress, TranslationJob
 )
 from ..serializers import (
     ExtractedEpubSerializer, TranslatedEpubSerializer, ReadingProgressSerializer
 )
+from ..langdetect_utils import SUPPORTED_LANGUAGES, resolve_source_lang, source_lang_candidates
+from ..chapters import PUBLIC_FIELDS, chapter_dicts, get_chapter
+from ..html_pipeline import chapter_html, sanitize_html
+from ..translated_chapters import chapter_map
+from ..idempotency import idempotent
+from ..single_flight import Busy, single_flight
 
 
 class ExtractEpubView(generics.RetrieveAPIView):
@@ -23,19 +30,22 @@ class ExtractEpubView(generics.RetrieveAPIView):
     def get_object(self):
         file_id = self.kwargs['pk']
         uploaded_file = get_object_or_404(UploadedFile, pk=file_id, user=self.request.user)
-        extracted, created = ExtractedEpub.objects.get_or_create(uploaded_file=uploaded_file)
-        if created:
-            self.extract_epub(extracted)
-        return extracted
+        from ..tasks import extract_once
+        # Requests arriving during the first extraction wait for it instead of extracting again
+        return extract_once(uploaded_file, self.extract_epub)
 
     def retrieve(self, request, *args, **kwargs):
-        instance = self.get_object()
+        try:
+            instance = self.get_object()
+        except Busy:
+            return Response({'error': 'Extraction still in progress'}, status=status.HTTP_409_CONFLICT)
         chapter_param = request.GET.get('chapter')
         if chapter_param is not None:
             try:
                 chapter_index = int(chapter_param)
-                if instance.chapters and isinstance(instance.chapters, list) and 0 <= chapter_index < len(instance.chapters):
-                    chapter = instance.chapters[chapter_index]
+                # One row read, whatever the size of the book
+                chapter = get_chapter(instance, chapter_index, fields=PUBLIC_FIELDS)
+                if chapter is not None:
                     data = {
                         'title': instance.title,
                         'chapter': chapter,
@@ -73,6 +83,7 @@ class ExtractEpubView(generics.RetrieveAPIView):
 class TranslateEpubView(generics.GenericAPIView):
     permission_classes = [IsAuthenticated]
 
+    @idempotent
     def post(self, request, *args, **kwargs):
         log = logging.getLogger(__name__)
         
@@ -93,12 +104,23 @@ class TranslateEpubView(generics.GenericAPIView):
         chapter_param = request.data.get('chapter')
         source_lang = (request.data.get('source_lang') or 'auto').strip()
         target_lang = (request.data.get('target_lang') or 'pt').strip()
-        
-        log.info(f"[Translation] Parâmetros: chapter={chapter_param}, source_lang={source_lang}, target_lang={target_lang}")
-        allowed_langs = {'auto','en','pt','es','fr','de','it','ja','ko','zh','ru','ar'}
-        if target_lang not in allowed_langs:
-            log.error(f"[Translation] Idioma de destino inválido: {target_lang}")
+        # Several target languages are translated together, each chapter segmented once for all of them
+        target_langs = request.data.get('target_langs') or [target_lang]
+        if isinstance(target_langs, str):
+            target_langs = target_langs.split(',')
+        if not isinstance(target_langs, (list, tuple)):
+            target_langs = []
+        target_langs = list(dict.fromkeys(str(lang).strip() for lang in target_langs if str(lang).strip()))
+        if not target_langs:
+            log.error(f"[Translation] Nenhum idioma de destino informado: {request.data.get('target_langs')!r}")
             return Response({'error': 'Invalid target language'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        log.info(f"[Translation] Parâmetros: chapter={chapter_param}, source_lang={source_lang}, target_langs={target_langs}")
+        allowed_langs = {'auto', *SUPPORTED_LANGUAGES}
+        for target_lang in target_langs:
+            if target_lang not in allowed_langs:
+                log.error(f"[Translation] Idioma de destino inválido: {target_lang}")
+                return Response({'error': 'Invalid target language'}, status=status.HTTP_400_BAD_REQUEST)
         if source_lang != 'auto' and source_lang not in allowed_langs:
             log.error(f"[Translation] Idioma de origem inválido: {source_lang}")
             return Response({'error': 'Invalid source language'}, status=status.HTTP_400_BAD_REQUEST)
@@ -107,7 +129,7 @@ class TranslateEpubView(generics.GenericAPIView):
         if chapter_param is not None:
             try:
                 chapter_index = int(chapter_param)
-                total_chapters = len(extracted.chapters or [])
+                total_chapters = extracted.chapters.count()
                 log.info(f"[Translation] Traduzindo capítulo {chapter_index} de {total_chapters} capítulos disponíveis")
                 if not (0 <= chapter_index < total_chapters):
                     log.error(f"[Translation] Índice de capítulo fora do range: {chapter_index} (0-{total_chapters-1})")
@@ -117,21 +139,99 @@ class TranslateEpubView(generics.GenericAPIView):
                 return Response({'error': 'Invalid chapter number'}, status=status.HTTP_400_BAD_REQUEST)
         else:
             log.info("[Translation] Traduzindo obra completa")
+        source_lang = resolve_source_lang(extracted, source_lang)
+        log.info(f"[Translation] Idioma de origem efetivo: {source_lang}")
+        from ..tasks import translation_flight_key
+        # Concurrent identical requests (double clicks, client retries) end up with one job and one task
         try:
-            log.info("[Translation] Iniciando translate_epub_sync...")
-            from ..tasks import translate_epub_sync
-            translation = translate_epub_sync(
-                extracted.pk, source_lang, target_lang, chapter_index, request.user.pk
-            )
-            log.info(f"[Translation] Tradução concluída: translation_id={translation.pk}")
-            
-            serializer = TranslatedEpubSerializer(translation)
-            log.info("[Translation] Retornando dados serializados")
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-        except Exception as e:
-            log.error(f"[Translation] Erro durante tradução: {str(e)}")
-            log.error(f"[Translation] Traceback: {traceback.format_exc()}")
-            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            with ExitStack() as locks:
+                for target_lang in sorted(target_langs):
+                    locks.enter_context(single_flight(
+                        translation_flight_key(extracted.pk, source_lang, target_lang, chapter_index)
+                    ))
+                if len(target_langs) > 1:
+                    return self.enqueue_multi_target(extracted, source_lang, target_langs, chapter_index, log)
+                return self.enqueue(extracted, source_lang, target_langs[0], chapter_index, log)
+        except Busy:
+            return Response({'error': 'Translation request already being processed'}, status=status.HTTP_409_CONFLICT)
+
+    def enqueue(self, extracted, source_lang, target_lang, chapter_index, log):
+        """Queue the request's job, or join the job already queued or running for it."""
+        request = self.request
+        from ..tasks import translate_epub_task
+        from ..translation_jobs import get_or_create_job, mark_failed
+        from ..translation_queues import task_options, PREFETCH, INTERACTIVE
+        job = get_or_create_job(extracted, source_lang, target_lang, chapter_index, request.user.pk)
+        if job.priority == PREFETCH and job.status == 'queued':
+            # The reader caught up with a prefetch still waiting in the low-priority queue
+            log.info(f"[Translation] Promovendo pré-tradução para interativa: job_id={job.pk}")
+            job.priority = INTERACTIVE
+            job.task_id = ''
+            job.save(update_fields=['priority', 'task_id', 'updated_at'])
+        if job.status in ('queued', 'running') and job.task_id:
+            log.info(f"[Translation] Job já em andamento: job_id={job.pk}")
+        else:
+            try:
+                options = task_options(job)
+                log.info(f"[Translation] Enfileirando translate_epub_task: job_id={job.pk}, fila={options['queue']}")
+                async_result = translate_epub_task.apply_async(
+                    args=(extracted.pk, source_lang, target_lang, chapter_index, request.user.pk, job.pk), **options
+                )
+                job.task_id = async_result.id or ''
+                job.save(update_fields=['task_id', 'updated_at'])
+            except Exception as e:
+                log.error(f"[Translation] Erro ao enfileirar tradução: {str(e)}")
+                log.error(f"[Translation] Traceback: {traceback.format_exc()}")
+                mark_failed(job, str(e))
+                return Response({'error': 'Translation queue unavailable'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+        job.refresh_from_db()
+        return Response({
+            'job_id': job.pk,
+            'status': job.status,
+            'status_url': reverse('translation-job-status', kwargs={'pk': job.pk}),
+        }, status=status.HTTP_202_ACCEPTED)
+
+
+    def enqueue_multi_target(self, extracted, source_lang, target_langs, chapter_index, log):
+        """One task for every target language; each keeps its own job for status and progress."""
+        from ..tasks import translate_epub_multi_task
+        from ..translation_jobs import get_or_create_job, mark_failed
+        from ..translation_queues import task_options
+        user = self.request.user
+        jobs = [get_or_create_job(extracted, source_lang, lang, chapter_index, user.pk) for lang in target_langs]
+        idle = [job for job in jobs if not (job.status in ('queued', 'running') and job.task_id)]
+        if len(idle) < len(jobs):
+            log.info(f"[Translation] Jobs já em andamento: {[job.pk for job in jobs if job not in idle]}")
+        if idle:
+            try:
+                options = task_options(idle[0])
+                log.info(f"[Translation] Enfileirando translate_epub_multi_task: jobs={[job.pk for job in idle]}, fila={options['queue']}")
+                async_result = translate_epub_multi_task.apply_async(
+                    args=(extracted.pk, source_lang, [job.target_lang for job in idle], chapter_index, user.pk,
+                          {job.target_lang: job.pk for job in idle}),
+                    **options
+                )
+                TranslationJob.objects.filter(pk__in=[job.pk for job in idle]).update(task_id=async_result.id or '')
+            except Exception as e:
+                log.error(f"[Translation] Erro ao enfileirar tradução: {str(e)}")
+                log.error(f"[Translation] Traceback: {traceback.format_exc()}")
+                for job in idle:
+                    mark_failed(job, str(e))
+                return Response({'error': 'Translation queue unavailable'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+        jobs = TranslationJob.objects.filter(pk__in=[job.pk for job in jobs]).order_by('pk')
+        return Response({
+            'jobs': [
+                {
+                    'job_id': job.pk,
+                    'target_lang': job.target_lang,
+                    'status': job.status,
+                    'status_url': reverse('translation-job-status', kwargs={'pk': job.pk}),
+                }
+                for job in jobs
+            ],
+        }, status=status.HTTP_202_ACCEPTED)
 
 
 class BooksListView(generics.ListAPIView):
@@ -142,7 +242,9 @@ class BooksListView(generics.ListAPIView):
     serializer_class = None
 
     def list(self, request, *args, **kwargs):
-        extracted_qs = ExtractedEpub.objects.filter(uploaded_file__user=request.user).order_by('-pk')
+        extracted_qs = ExtractedEpub.objects.filter(uploaded_file__user=request.user).annotate(
+            chapter_total=Count('chapters')
+        ).order_by('-pk')
         data = []
         progress_map = {rp.extracted_epub_id: rp for rp in ReadingProgress.objects.filter(
             user=request.user,
@@ -150,13 +252,12 @@ class BooksListView(generics.ListAPIView):
         )}
         for ext in extracted_qs:
             prog = progress_map.get(ext.pk)
-            chapters = ext.chapters if isinstance(ext.chapters, list) else []
             data.append({
                 'id': ext.pk,
                 'uploaded_file_id': ext.uploaded_file.pk,
                 'title': ext.title,
                 'metadata': ext.metadata or {},
-                'chapter_count': len(chapters),
+                'chapter_count': ext.chapter_total,
                 'cover_image': getattr(ext, 'cover_image', None),
                 'progress': {
                     'current_chapter': prog.current_chapter if prog else 0,
@@ -191,7 +292,7 @@ class EpubReaderView(generics.RetrieveAPIView):
         chapter_param = request.GET.get('chapter')
         log.info(f"[EpubReader] Parâmetros de tradução: source_lang={source_lang}, target_lang={target_lang}, chapter={chapter_param}")
         translations_qs = TranslatedEpub.objects.filter(extracted_epub=extracted)
-        translations_data = TranslatedEpubSerializer(translations_qs, many=True).data
+        translations_data = TranslatedEpubSerializer(translations_qs, many=True, context={'with_chapters': False}).data
         log.info(f"[EpubReader] Traduções disponíveis: {len(translations_data)}")
         for trans in translations_data:
             log.info(f"[EpubReader] - Tradução: {trans.get('source_lang')} -> {trans.get('target_lang')}, chapter_index={trans.get('chapter_index')}")
@@ -206,66 +307,20 @@ class EpubReaderView(generics.RetrieveAPIView):
                 'progress_percentage': 0.0,
             }
 
-        def sanitize_html(raw_html: str) -> str:
-            if not raw_html:
-                return ''
-            cleaned = re.sub(r'^\s*<\?xml[^>]*>\s*', '', raw_html, flags=re.IGNORECASE)
-            cleaned = re.sub(r'<!DOCTYPE[^>]*>\s*', '', cleaned, flags=re.IGNORECASE)
-            try:
-                soup = BeautifulSoup(cleaned, 'html.parser')
-                for tag in soup.find_all(['script', 'iframe', 'object', 'embed', 'style']):
-                    tag.decompose()
-                body = soup.body
-                if body:
-                    final_html = ''.join(str(c) for c in body.contents)
-                else:
-                    final_html = str(soup)
-                final_html = re.sub(r'^\s*<html[^>]*>\s*', '', final_html, flags=re.IGNORECASE)
-                final_html = re.sub(r'</html>\s*$', '', final_html, flags=re.IGNORECASE)
-                return final_html.strip()
-            except Exception:
-                return cleaned
-
         sanitized_chapters = []
-        chapters_obj = extracted.chapters if isinstance(extracted.chapters, list) else []
+        chapters_obj = chapter_dicts(extracted, fields=('index', 'title', 'content', 'skeleton'))
         
         log.info(f"[EpubReader] Preparando {len(chapters_obj)} capítulos")
         
         chapter_translations = {}
+        # Translations stored under the detected language and legacy 'auto' ones both match
+        source_langs = source_lang_candidates(extracted, source_lang)
         
         if target_lang != 'auto':
-            if chapter_param is not None:
-                try:
-                    chapter_index = int(chapter_param)
-                    specific_translation = TranslatedEpub.objects.filter(
-                        extracted_epub=extracted,
-                        source_lang=source_lang,
-                        target_lang=target_lang,
-                        chapter_index=chapter_index
-                    ).first()
-                    
-                    if specific_translation and specific_translation.translated_chapters:
-                        chapter_translations[chapter_index] = specific_translation.translated_chapters[0]['content']
-                        log.info(f"[EpubReader] Tradução específica encontrada para capítulo {chapter_index}")
-                except ValueError:
-                    pass
-
-            if not chapter_translations:
-                log.info(f"[EpubReader] Buscando tradução completa do livro")
-                full_translation = TranslatedEpub.objects.filter(
-                    extracted_epub=extracted,
-                    source_lang=source_lang,
-                    target_lang=target_lang,
-                    chapter_index__isnull=True
-                ).first()
-                
-                if full_translation and full_translation.translated_chapters:
-                    for i, trans_chapter in enumerate(full_translation.translated_chapters):
-                        if i < len(chapters_obj):
-                            chapter_translations[i] = trans_chapter['content']
-                    log.info(f"[EpubReader] Tradução completa encontrada com {len(chapter_translations)} capítulos")
-                else:
-                    log.info("[EpubReader] Nenhuma tradução completa encontrada")
+            # Full-book and single-chapter translations of the pair are the same per-chapter rows
+            rows = chapter_map(extracted, target_lang, source_langs)
+            chapter_translations = {idx: row.content for idx, row in rows.items() if idx < len(chapters_obj)}
+            log.info(f"[EpubReader] {len(chapter_translations)} capítulo(s) traduzido(s) encontrado(s)")
 
         for i, ch in enumerate(chapters_obj):
             if isinstance(ch, dict):
@@ -275,11 +330,11 @@ class EpubReaderView(generics.RetrieveAPIView):
                         'title': ch.get('title', f'Capítulo {i + 1}'),
                         'content': sanitized_content,
                         'translated': True,
-                        'original_content': sanitize_html(ch.get('content', ''))
+                        'original_content': chapter_html(ch)
                     })
                     log.info(f"[EpubReader] Capítulo {i} com tradução aplicada")
                 else:
-                    sanitized_content = sanitize_html(ch.get('content', ''))
+                    sanitized_content = chapter_html(ch)
                     sanitized_chapters.append({
                         'title': ch.get('title', f'Capítulo {i + 1}'),
                         'content': sanitized_content,
@@ -292,6 +347,7 @@ class EpubReaderView(generics.RetrieveAPIView):
             'id': extracted.pk,
             'title': extracted.title,
             'metadata': extracted.metadata,
+            'detected_lang': extracted.detected_lang,
             'chapters': sanitized_chapters,
             'images': extracted.images,
             'translations': translations_data,
@@ -3,8 +3,6 @@ import zipfile
 import mimetypes
 import hashlib
 from pathlib import Path
-import re
-from bs4 import BeautifulSoup
 
 from rest_framework import generics, status
 from rest_framework.response import Response
@@ -15,12 +13,19 @@ import ebooklib
 
 from ..models import UploadedFile, ExtractedEpub, AuditLog
 from ..serializers import UploadedFileSerializer
+from ..langdetect_utils import detect_book_language
+from ..content_hashes import annotate_book
+from ..html_pipeline import parse_document
+from ..chapters import replace_chapters
+from ..idempotency import idempotent
+from ..tasks import extract_once
 
 
 class UploadFileView(generics.CreateAPIView):
     serializer_class = UploadedFileSerializer
     permission_classes = [IsAuthenticated]
 
+    @idempotent
     def create(self, request, *args, **kwargs):
         file_obj = request.FILES.get('file')
         if file_obj:
@@ -58,12 +63,10 @@ class UploadFileView(generics.CreateAPIView):
                 'file_name': instance.file.name
             }
         )
-        extracted, created = ExtractedEpub.objects.get_or_create(uploaded_file=instance)
-        if created:
-            try:
-                self.extract_epub(extracted)
-            except Exception as e:
-                print(f"Erro ao extrair EPUB: {str(e)}")
+        try:
+            extract_once(instance, self.extract_epub)
+        except Exception as e:
+            print(f"Erro ao extrair EPUB: {str(e)}")
 
     def extract_epub(self, extracted):
         book = epub.read_epub(extracted.uploaded_file.file.path)
@@ -75,77 +78,19 @@ class UploadFileView(generics.CreateAPIView):
         extracted.title = metadata.get('title', '')
         extracted.metadata = metadata
 
-        from bs4 import BeautifulSoup as _BS
-        import re as _re
-        def _sanitize(raw_html: str) -> str:
-            if not raw_html:
-                return ''
-            tmp = _re.sub(r'^\s*<\?xml[^>]*?>', '', raw_html, flags=_re.IGNORECASE)
-            tmp = _re.sub(r'<!DOCTYPE[^>]*?>', '', tmp, flags=_re.IGNORECASE)
-            soup_local = _BS(tmp, 'html.parser')
-            for tag in soup_local.find_all(['script','iframe','object','embed','style']):
-                tag.decompose()
-            body = soup_local.body
-            if body:
-                inner = ''.join(str(c) for c in body.contents)
-            else:
-                inner = str(soup_local)
-            inner = _re.sub(r'^\s*<html[^>]*>','', inner, flags=_re.IGNORECASE)
-            inner = _re.sub(r'</html>\s*$','', inner, flags=_re.IGNORECASE)
-            return inner.strip()
-
-        def _extract_chapter_title(soup_doc, item, chapter_index):
-            """
-            Extrai o título do capítulo seguindo a prioridade:
-            1. Tags de título (h1, h2, h3, etc.)
-            2. Tag <title>
-            3. Primeira frase do conteúdo
-            4. Fallback para "Capítulo X"
-            """
-            for tag_name in ['h1', 'h2', 'h3', 'h4', 'h5', 'h6']:
-                title_element = soup_doc.find(tag_name)
-                if title_element:
-                    title_text = title_element.get_text().strip()
-                    if title_text and len(title_text) > 0:
-                        return title_text
-            
-            title_tag = soup_doc.find('title')
-            if title_tag:
-                title_text = title_tag.get_text().strip()
-                if title_text and not title_text.endswith('.html') and not title_text.endswith('.xhtml'):
-                    return title_text
-            
-            content_copy = soup_doc.__copy__()
-            for tag in content_copy.find_all(['script', 'style', 'meta', 'link']):
-                tag.decompose()
-            text_elements = content_copy.find_all(['p', 'div', 'span'], string=True)
-            for element in text_elements:
-                text = element.get_text().strip()
-                if text and len(text) > 5:
-                    first_sentence = re.split(r'[.!?]', text)[0].strip()
-                    if len(first_sentence) > 5 and len(first_sentence) <= 100:
-                        return first_sentence + ('...' if len(first_sentence) < len(text.split('.')[0]) else '')
-            
-            # Se ainda não encontrou nada, pega qualquer texto disponível
-            all_text = content_copy.get_text().strip()
-            if all_text:
-                words = all_text.split()[:10] 
-                if words:
-                    return ' '.join(words) + ('...' if len(all_text.split()) > 10 else '')
-
-            return f"Capítulo {chapter_index + 1}"
-
         chapters = []
         chapter_index = 0
         for item in book.get_items():
             if item.get_type() == ebooklib.ITEM_DOCUMENT:
-                soup_doc = _BS(item.get_content(), 'html.parser')
-                title_text = _extract_chapter_title(soup_doc, item, chapter_index)
-                raw_content = item.get_content().decode('utf-8')
-                cleaned = _sanitize(raw_content)
-                chapters.append({'title': title_text, 'content': cleaned})
+                # Sanitized body, title (headings, <title>, first sentence) and skeleton from a single parse
+                document = parse_document(item.get_content(), fallback_title=f"Capítulo {chapter_index + 1}")
+                chapters.append({
+                    'title': document.title, 'content': document.html,
+                    'skeleton': document.skeleton, 'texts': document.texts, 'skipped': document.skipped,
+                })
                 chapter_index += 1
-        extracted.chapters = chapters
+        annotate_book(extracted, chapters)
+        extracted.detected_lang = detect_book_language(extracted, chapters)
 
         def _generate_cover_for_ao3(title, author, extracted):
             """
@@ -293,6 +238,7 @@ class UploadFileView(generics.CreateAPIView):
         extracted.images = images
         extracted.cover_image = cover_image_path
         extracted.save()
+        replace_chapters(extracted, chapters)
 
 
 class FileListView(generics.ListAPIView):
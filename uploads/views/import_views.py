@@ -10,7 +10,7 @@ except ImportError:
     openapi = None
     
 from ..ao3_utils import extract_work_id, fetch_ao3_work, build_epub_from_ao3
-from ..tasks import extract_epub_sync
+from ..tasks import extract_once
 from django.core.files import File
 from django.core.files.temp import NamedTemporaryFile
 from django.conf import settings
@@ -72,7 +72,8 @@ class AO3ImportView(generics.GenericAPIView):
         
         try:
             debug_id = f'ao3_{work_id}'
-            existing_upload = UploadedFile.objects.filter(debug_id=debug_id).first()
+            # Each user gets their own copy; identical works share translations by content hash
+            existing_upload = UploadedFile.objects.filter(debug_id=debug_id, user=request.user).first()
             if existing_upload:
                 existing_extracted = ExtractedEpub.objects.filter(uploaded_file=existing_upload).first()
                 if existing_extracted:
@@ -111,7 +112,7 @@ class AO3ImportView(generics.GenericAPIView):
                     )
 
                 logger.info(f"Extracting EPUB for AO3 work {work_id}")
-                extracted_epub = extract_epub_sync(uploaded_file.id)
+                extracted_epub = extract_once(uploaded_file)
 
                 AuditLog.objects.create(
                     user=request.user,
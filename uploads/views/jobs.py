@@ -0,0 +1,32 @@
+from rest_framework import generics
+from rest_framework.response import Response
+from rest_framework.permissions import IsAuthenticated
+from django.shortcuts import get_object_or_404
+
+from ..models import TranslationJob
+from ..serializers import TranslationJobSerializer
+from ..translation_jobs import job_progress, telemetry_report
+from ..translation_scheduler import queue_status
+
+
+class TranslationJobStatusView(generics.GenericAPIView):
+    """Status de um job de tradução assíncrono: progresso por capítulo, ETA, erros e posição na fila."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk, *args, **kwargs):
+        job = get_object_or_404(TranslationJob, pk=pk, extracted_epub__uploaded_file__user=request.user)
+        data = TranslationJobSerializer(job).data
+        data['progress'] = job_progress(job)
+        data['queue'] = queue_status(job)
+        return Response(data)
+
+
+class TranslationJobTelemetryView(generics.GenericAPIView):
+    """Telemetria do provedor para um job: caracteres enviados, chamadas, retries, cache e latência."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk, *args, **kwargs):
+        job = get_object_or_404(TranslationJob, pk=pk, extracted_epub__uploaded_file__user=request.user)
+        data = {'id': job.pk, 'status': job.status}
+        data.update(telemetry_report(job))
+        return Response(data)
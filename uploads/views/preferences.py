@@ -5,6 +5,7 @@ from django.shortcuts import get_object_or_404
 
 from ..models import ReaderPreference, ReadingProgress, ExtractedEpub, AuditLog
 from ..serializers import ReaderPreferenceSerializer, ReadingProgressSerializer
+from ..prefetch import prefetch_after_progress
 
 
 class ReaderPreferenceView(generics.GenericAPIView):
@@ -50,6 +51,9 @@ class ReadingProgressView(generics.GenericAPIView):
         serializer = ReadingProgressSerializer(data={ 'extracted_epub': extracted.pk, **payload })
 
         if serializer.is_valid():
+            previous_chapter = ReadingProgress.objects.filter(
+                user=request.user, extracted_epub=extracted
+            ).values_list('current_chapter', flat=True).first()
             # upsert by user + extracted_epub
             obj, _created = ReadingProgress.objects.update_or_create(
                 user=request.user,
@@ -73,6 +77,10 @@ class ReadingProgressView(generics.GenericAPIView):
                 }
             )
 
+            prefetch_after_progress(
+                request.user, extracted, previous_chapter, obj.current_chapter, request.data.get('target_lang')
+            )
+
             return Response(ReadingProgressSerializer(obj).data)
         else:
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file